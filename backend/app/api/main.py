@@ -1,6 +1,15 @@
 from fastapi import APIRouter
 
-from app.api.routes import article, items, login, private, resources, users, utils
+from app.api.routes import (
+    article,
+    items,
+    llm,
+    login,
+    private,
+    resources,
+    users,
+    utils,
+)
 from app.core.config import settings
 
 api_router = APIRouter()
@@ -10,6 +19,7 @@ api_router.include_router(utils.router)
 api_router.include_router(items.router)
 api_router.include_router(resources.router)
 api_router.include_router(article.router)
+api_router.include_router(llm.router)
 
 
 if settings.ENVIRONMENT == "local":
@@ -0,0 +1,255 @@
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.services import audio
+
+router = APIRouter(prefix=f"/{settings.STATIC_PREFIX}/audio", tags=["audio"])
+
+# 内容寻址的音频永远不会变化，可以让浏览器和 CDN 长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# 压缩版本可以匹配的 Accept 类型
+RENDITION_ACCEPT = {
+    "opus": ("audio/ogg", "audio/opus"),
+    "m4a": ("audio/mp4", "audio/aac"),
+}
+# Accept 只有 */* 或 audio/* 时返回的版本，AAC 几乎所有播放器都支持
+PREFERRED_RENDITION = "m4a"
+
+
+class AudioFileResponse(Response):
+    """
+    发送文件的 [start, end] 字节区间；ASGI 服务器支持时交给 sendfile 零拷贝发送
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict[str, str],
+        send_body: bool = True,
+    ) -> None:
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        self.status_code = status_code
+        self.send_body = send_body
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if not self.send_body or self.length <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopy" in extensions:
+            with open(self.path, "rb") as f:
+                await send(
+                    {
+                        "type": "http.response.zerocopy",
+                        "file": f.fileno(),
+                        "offset": self.start,
+                        "count": self.length,
+                    }
+                )
+            return
+        if "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        remaining = self.length
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    }
+                )
+        if remaining > 0:
+            # 文件在发送过程中被截断
+            await send({"type": "http.response.body", "body": b""})
+
+
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    解析单个 bytes 区间，返回闭区间 (start, end)；多区间请求返回 None，按整个文件响应
+    """
+    match = RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        # bytes=-500 表示最后 500 个字节
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _parse_accept(accept: str) -> dict[str, float]:
+    qualities: dict[str, float] = {}
+    for item in accept.split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        qualities[media_type.lower()] = q
+    return qualities
+
+
+def _quality(qualities: dict[str, float], media_types: tuple[str, ...]) -> float:
+    """
+    返回最具体的匹配项的 q 值：先精确类型，再 audio/*，最后 */*
+    """
+    exact = [qualities[t] for t in media_types if t in qualities]
+    if exact:
+        return max(exact)
+    return qualities.get("audio/*", qualities.get("*/*", 0.0))
+
+
+def choose_rendition(accept: str, path: Path) -> str | None:
+    """
+    根据 Accept 的 q 值选择已经转码生成的压缩版本；原始 mp3 的 q 值更高时返回 None。
+    只用通配符匹配时选择兼容性最好的 PREFERRED_RENDITION
+    """
+    qualities = _parse_accept(accept or "*/*")
+    original_q = _quality(qualities, ("audio/mpeg", "audio/mp3"))
+    best, best_key = None, (0.0, False)
+    for name, media_types in RENDITION_ACCEPT.items():
+        if not audio.rendition_path(path, name).exists():
+            continue
+        explicit = any(t in qualities for t in media_types)
+        if not explicit and name != PREFERRED_RENDITION:
+            continue
+        key = (_quality(qualities, media_types), explicit)
+        if key[0] > 0 and key[0] >= original_q and key > best_key:
+            best, best_key = name, key
+    return best
+
+
+def _audio_path(filename: str) -> Path:
+    path = audio.AUDIO_DIR / filename
+    if filename.startswith(".") or path.parent != audio.AUDIO_DIR:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return path
+
+
+def _etag(path: Path, stat: os.stat_result, rendition: str | None) -> str:
+    if rendition:
+        return f'"{path.stem}-{rendition}"'
+    if audio.is_cache_file(path):
+        return f'"{path.stem}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+def read_audio(filename: str, request: Request) -> Response:
+    """
+    Serve generated audio with Range, ETag and long-lived caching support.
+    """
+    path = _audio_path(filename)
+    immutable = audio.is_cache_file(path)
+    rendition = None
+    if immutable:
+        rendition = choose_rendition(request.headers.get("accept", ""), path)
+        if rendition:
+            path = audio.rendition_path(path, rendition)
+            filename = path.name
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    if immutable:
+        # 播放也算一次访问，压缩版本和原始音频一起按 mp3 的 mtime 淘汰
+        audio.touch_audio(path.with_suffix(audio.AUDIO_EXTENSION))
+
+    etag = _etag(path, stat, rendition)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL
+        if immutable
+        else DEFAULT_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if immutable:
+        headers["Vary"] = "Accept"
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if settings.AUDIO_DELIVERY_MODE == "x-accel-redirect":
+        # 由 nginx 等反向代理直接发送文件，Range 也由代理处理
+        headers["X-Accel-Redirect"] = settings.AUDIO_ACCEL_REDIRECT_PREFIX + filename
+        return Response(status_code=200, headers=headers)
+    if settings.AUDIO_DELIVERY_MODE == "x-sendfile":
+        headers["X-Sendfile"] = str(path.resolve())
+        return Response(status_code=200, headers=headers)
+
+    if rendition:
+        headers["Content-Type"] = audio.RENDITIONS[rendition][1]
+    else:
+        headers["Content-Type"] = mimetypes.guess_type(filename)[0] or "audio/mpeg"
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return AudioFileResponse(
+        path,
+        start=start,
+        end=end,
+        status_code=status_code,
+        headers=headers,
+        send_body=request.method != "HEAD",
+    )
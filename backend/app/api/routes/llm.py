@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.api.deps import SessionDep, get_current_active_superuser
+from app.models import LLMCallSummary
+from app.services.llm_usage import get_llm_call_summary
+
+router = APIRouter(prefix="/llm", tags=["llm"])
+
+
+@router.get(
+    "/calls/summary",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=LLMCallSummary,
+)
+def read_llm_call_summary(
+    session: SessionDep, days: int = Query(default=7, ge=1, le=90)
+) -> LLMCallSummary:
+    """
+    LLM latency percentiles by model and stage, and token usage per day.
+    """
+    return get_llm_call_summary(session=session, days=days)
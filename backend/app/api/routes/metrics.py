@@ -0,0 +1,23 @@
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics(request: Request) -> Response:
+    """
+    Prometheus metrics of this process.
+    """
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if not secrets.compare_digest(
+            authorization, f"Bearer {settings.METRICS_TOKEN}"
+        ):
+            raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+
+from app.api.deps import get_current_active_superuser
+from app.core.profiling import list_reports, profiling_rules, read_report
+from app.models import Message, ProfilingReport, ProfilingRule, ProfilingRuleCreate
+
+router = APIRouter(
+    prefix="/profiling",
+    tags=["profiling"],
+    dependencies=[Depends(get_current_active_superuser)],
+)
+
+
+@router.get("/rules", response_model=list[ProfilingRule])
+def read_profiling_rules() -> list[ProfilingRule]:
+    """
+    Active sampling rules.
+    """
+    return profiling_rules.list_rules()
+
+
+@router.put("/rules", response_model=ProfilingRule)
+def set_profiling_rule(rule_in: ProfilingRuleCreate) -> ProfilingRule:
+    """
+    Profile percent% of the requests to an operation for duration_seconds.
+    """
+    return profiling_rules.set_rule(
+        rule_in.operation, rule_in.percent, rule_in.duration_seconds
+    )
+
+
+@router.delete("/rules/{operation}")
+def delete_profiling_rule(operation: str) -> Message:
+    """
+    Stop sampling an operation.
+    """
+    if not profiling_rules.delete_rule(operation):
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return Message(message="Rule deleted successfully")
+
+
+@router.get("/reports", response_model=list[ProfilingReport])
+def read_profiling_reports() -> list[ProfilingReport]:
+    """
+    Stored profile reports, newest first.
+    """
+    return list_reports()
+
+
+@router.get("/reports/{name}")
+def read_profiling_report(name: str) -> Response:
+    """
+    Download a stored profile report.
+    """
+    report = read_report(name)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    content, media_type = report
+    return Response(content, media_type=media_type)
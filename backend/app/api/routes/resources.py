@@ -1,8 +1,8 @@
 import uuid
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import SessionDep, get_current_user
 from app.models import Resource, ResourceCreate, Resources, ResourceUpdate
 from app.services.resource import (
     check_resource,
@@ -22,19 +22,15 @@ def read_resources(session: SessionDep, skip: int = 0, limit: int = 100) -> any:
     return get_resources(session=session, skip=skip, limit=limit)
 
 
-@router.post("/add", response_model=Resource)
-def add_resources(
-    *, session: SessionDep, current_user: CurrentUser, resource_in: ResourceCreate
-) -> any:
+@router.post("/add", dependencies=[Depends(get_current_user)], response_model=Resource)
+def add_resources(*, session: SessionDep, resource_in: ResourceCreate) -> any:
     """
     Create new resource.
     """
     exists = check_resource(session=session, url=resource_in.url)
     if exists:
         raise HTTPException(status_code=400, detail="资源已经存在")
-    return create_resource(
-        session=session, current_user=current_user, resource_in=resource_in
-    )
+    return create_resource(session=session, resource_in=resource_in)
 
 
 @router.post("/update/{id}", response_model=ResourceUpdate)
@@ -1,7 +1,11 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.breaker import all_breakers
+from app.core.loop_monitor import loop_monitor
 from app.models import Message
 from app.utils import generate_test_email, send_email
 
@@ -29,3 +33,25 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/circuit-breakers/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_circuit_breakers() -> list[dict[str, Any]]:
+    """
+    State of the circuit breakers around LLM, TTS and crawler dependencies.
+    """
+    return [breaker.snapshot() for breaker in all_breakers()]
+
+
+@router.get(
+    "/loop-lag/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_loop_lag() -> dict[str, Any]:
+    """
+    Event loop stalls detected in this process, with the blocking stack.
+    """
+    return loop_monitor.stats()
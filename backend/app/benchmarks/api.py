@@ -0,0 +1,632 @@
+"""
+HTTP API 的压测和热点函数的微基准。
+
+    python -m app.benchmarks.api seed --users 1000 --items 100000 --articles 100000
+    python -m app.benchmarks.api load --concurrency 20 --duration 30 --output api.json
+    python -m app.benchmarks.api micro --baseline micro.json
+    python -m app.benchmarks.api cleanup
+
+seed 批量写入压测用的用户、item、资源和文章（之前写入的会先删除），load 用并发的客户端
+请求各个场景，报告吞吐量和延迟的 p50/p90/p99；之后在进程内依次执行每个场景，统计每个请求
+的数据库查询数和峰值内存分配。不指定 --base-url 时 load 也在进程内通过 ASGI 调用接口，
+不经过网络和 uvicorn。
+
+请使用单独的数据库，例如 POSTGRES_DB=app_bench（需要先执行 alembic upgrade head）。
+load 和 micro 指定 --baseline 时有指标变差超过 --max-regression 则以状态 1 退出。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+import uuid
+from collections.abc import Awaitable, Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from app.benchmarks.fakes import (
+    FEEDS_PREFIX,
+    PAGES_PREFIX,
+    FakeBehavior,
+    FakeServers,
+    feed_xml,
+)
+from app.benchmarks.report import check_baseline, environment, percentile
+
+BENCH_DOMAIN = "bench.example.com"
+BENCH_PASSWORD = "bench-password"
+SCENARIOS = (
+    "login",
+    "users_me",
+    "items_list",
+    "items_crud",
+    "articles_list",
+    "resources_add",
+)
+BATCH = 5000
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test the HTTP API and micro-benchmark hot functions."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="insert benchmark rows")
+    seed.add_argument("--users", type=int, default=100)
+    seed.add_argument("--items", type=int, default=10_000)
+    seed.add_argument("--resources", type=int, default=1_000)
+    seed.add_argument("--articles", type=int, default=10_000)
+
+    commands.add_parser("cleanup", help="delete benchmark rows")
+
+    load = commands.add_parser("load", help="run concurrent API scenarios")
+    load.add_argument("--base-url", help="test a running server instead of in-process")
+    load.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    load.add_argument("--concurrency", type=int, default=10)
+    load.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    load.add_argument(
+        "--profile-requests",
+        type=int,
+        default=20,
+        help="sequential in-process requests per scenario for queries/allocations",
+    )
+    load.add_argument("--seed", type=int, default=0)
+
+    micro = commands.add_parser("micro", help="run micro-benchmarks")
+    micro.add_argument("--repeat", type=int, default=5)
+
+    for command in (load, micro):
+        command.add_argument("--output", type=Path, help="write the report as JSON")
+        command.add_argument(
+            "--baseline", type=Path, help="compare with a saved report"
+        )
+        command.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.1,
+            help="exit with status 1 when a metric is this much worse than the baseline",
+        )
+    return parser.parse_args(argv)
+
+
+def _batched(rows: Iterator[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def cleanup() -> dict[str, int]:
+    """
+    删除 seed 和 load 写入的数据，返回每张表删除的行数
+    """
+    from sqlmodel import Session, col, delete, or_, select
+
+    from app.core.db import engine
+    from app.models import Article, Item, Resource, User
+
+    removed = {}
+    with Session(engine) as session:
+        users = select(User.id).where(col(User.email).endswith(f"@{BENCH_DOMAIN}"))
+        removed["items"] = session.exec(
+            delete(Item).where(col(Item.owner_id).in_(users))
+        ).rowcount
+        removed["users"] = session.exec(
+            delete(User).where(col(User.email).endswith(f"@{BENCH_DOMAIN}"))
+        ).rowcount
+        removed["resources"] = session.exec(
+            delete(Resource).where(
+                or_(
+                    col(Resource.url).startswith(f"https://{BENCH_DOMAIN}/"),
+                    col(Resource.url).contains(FEEDS_PREFIX + "/"),
+                )
+            )
+        ).rowcount
+        removed["articles"] = session.exec(
+            delete(Article).where(
+                or_(
+                    col(Article.url).startswith(f"https://{BENCH_DOMAIN}/"),
+                    col(Article.url).contains(PAGES_PREFIX + "/"),
+                )
+            )
+        ).rowcount
+        session.commit()
+    return removed
+
+
+def seed(args: argparse.Namespace) -> dict[str, int]:
+    from sqlmodel import Session, insert
+
+    from app.core.db import engine
+    from app.core.security import get_password_hash
+    from app.models import Article, Item, Resource, User
+
+    cleanup()
+    # 哈希很慢，所有压测用户共用同一个密码哈希
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    user_ids = [uuid.uuid4() for _ in range(args.users)]
+    users = (
+        User(
+            id=user_id,
+            email=f"user{number}@{BENCH_DOMAIN}",
+            full_name=f"Bench User {number}",
+            hashed_password=hashed_password,
+        ).model_dump()
+        for number, user_id in enumerate(user_ids)
+    )
+    item = Item(title="", description="benchmark item", owner_id=uuid.uuid4())
+    items = (
+        {
+            **item.model_dump(),
+            "id": uuid.uuid4(),
+            "title": f"Bench item {number}",
+            "owner_id": user_ids[number % len(user_ids)],
+        }
+        for number in range(args.items if user_ids else 0)
+    )
+    resource = Resource(
+        url="", title="", description="benchmark feed", resource_type="rss"
+    )
+    resources = (
+        {
+            **resource.model_dump(),
+            "id": uuid.uuid4(),
+            "url": f"https://{BENCH_DOMAIN}/feeds/{number}.xml",
+            "title": f"Bench feed {number}",
+        }
+        for number in range(args.resources)
+    )
+    article = Article(
+        resoure_id="",
+        url="",
+        title="",
+        abstract="benchmark article",
+        tags=["bench"],
+        is_active=False,
+    )
+    articles = (
+        {
+            **article.model_dump(),
+            "id": uuid.uuid4(),
+            "url": f"https://{BENCH_DOMAIN}/articles/{number}",
+            "title": f"Bench article {number}",
+        }
+        for number in range(args.articles)
+    )
+    counts = {}
+    with Session(engine) as session:
+        for name, model, rows in (
+            ("users", User, users),
+            ("items", Item, items),
+            ("resources", Resource, resources),
+            ("articles", Article, articles),
+        ):
+            counts[name] = 0
+            for batch in _batched(rows):
+                session.execute(insert(model), batch)
+                counts[name] += len(batch)
+            session.commit()
+    return counts
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    async def request(
+        self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs: Any
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        self.errors.setdefault(name, 0)
+        if response is None or response.is_error:
+            self.errors[name] += 1
+        return response
+
+
+class _ProfilingRecorder(_Recorder):
+    """
+    同时记录每个请求的数据库查询数和峰值内存分配，只能依次执行请求；
+    分配包括客户端构造和解析请求的部分
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.queries: dict[str, list[float]] = {}
+        self.allocated: dict[str, list[float]] = {}
+
+    async def request(
+        self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs: Any
+    ) -> httpx.Response | None:
+        from app.core.queries import track_queries
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        with track_queries(all_threads=True) as stats:
+            response = await super().request(client, name, method, url, **kwargs)
+        self.queries.setdefault(name, []).append(stats.count)
+        self.allocated.setdefault(name, []).append(
+            tracemalloc.get_traced_memory()[1] - before
+        )
+        return response
+
+
+Scenario = Callable[
+    [httpx.AsyncClient, _Recorder, dict[str, str], random.Random], Awaitable[None]
+]
+
+
+class _Scenarios:
+    """
+    每个场景执行一次用户操作，可能包含多个请求；请求按名称分别统计
+    """
+
+    def __init__(self, users: int, feeds_url: str | None) -> None:
+        self.users = users
+        self.feeds_url = feeds_url
+
+    async def login(
+        self,
+        client: httpx.AsyncClient,
+        recorder: _Recorder,
+        _headers: dict[str, str],
+        rng: random.Random,
+    ) -> None:
+        await recorder.request(
+            client,
+            "login",
+            "POST",
+            "/login/access-token",
+            data={
+                "username": f"user{rng.randrange(self.users)}@{BENCH_DOMAIN}",
+                "password": BENCH_PASSWORD,
+            },
+        )
+
+    async def users_me(
+        self,
+        client: httpx.AsyncClient,
+        recorder: _Recorder,
+        headers: dict[str, str],
+        _rng: random.Random,
+    ) -> None:
+        await recorder.request(client, "users_me", "GET", "/users/me", headers=headers)
+
+    async def items_list(
+        self,
+        client: httpx.AsyncClient,
+        recorder: _Recorder,
+        headers: dict[str, str],
+        _rng: random.Random,
+    ) -> None:
+        await recorder.request(client, "items_list", "GET", "/items/", headers=headers)
+
+    async def items_crud(
+        self,
+        client: httpx.AsyncClient,
+        recorder: _Recorder,
+        headers: dict[str, str],
+        rng: random.Random,
+    ) -> None:
+        response = await recorder.request(
+            client,
+            "items_crud.create",
+            "POST",
+            "/items/",
+            headers=headers,
+            json={"title": f"Bench item {rng.random()}", "description": "crud"},
+        )
+        if response is None or response.is_error:
+            return
+        url = f"/items/{response.json()['id']}"
+        await recorder.request(client, "items_crud.get", "GET", url, headers=headers)
+        await recorder.request(
+            client,
+            "items_crud.update",
+            "PUT",
+            url,
+            headers=headers,
+            json={"title": "Bench item updated"},
+        )
+        await recorder.request(
+            client, "items_crud.delete", "DELETE", url, headers=headers
+        )
+
+    async def articles_list(
+        self,
+        client: httpx.AsyncClient,
+        recorder: _Recorder,
+        _headers: dict[str, str],
+        rng: random.Random,
+    ) -> None:
+        await recorder.request(
+            client,
+            "articles_list",
+            "GET",
+            "/articles/",
+            params={"skip": rng.randrange(10) * 100, "limit": 100},
+        )
+
+    async def resources_add(
+        self,
+        client: httpx.AsyncClient,
+        recorder: _Recorder,
+        headers: dict[str, str],
+        _rng: random.Random,
+    ) -> None:
+        name = uuid.uuid4().hex
+        await recorder.request(
+            client,
+            "resources_add",
+            "POST",
+            "/resources/add",
+            headers=headers,
+            json={
+                "url": f"{self.feeds_url}{FEEDS_PREFIX}/{name}.xml",
+                "title": "",
+                "resource_type": "rss",
+            },
+        )
+
+
+async def _tokens(client: httpx.AsyncClient, count: int) -> list[dict[str, str]]:
+    headers = []
+    for number in range(count):
+        response = await client.post(
+            "/login/access-token",
+            data={
+                "username": f"user{number}@{BENCH_DOMAIN}",
+                "password": BENCH_PASSWORD,
+            },
+        )
+        response.raise_for_status()
+        headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+    return headers
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    headers: list[dict[str, str]],
+    args: argparse.Namespace,
+) -> _Recorder:
+    recorder = _Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(number: int) -> None:
+        rng = random.Random(args.seed * 1000 + number)
+        while time.perf_counter() < deadline:
+            await scenario(client, recorder, headers[number % len(headers)], rng)
+
+    await asyncio.gather(*(worker(number) for number in range(args.concurrency)))
+    return recorder
+
+
+async def _profile(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int
+) -> dict[str, dict[str, float]]:
+    """
+    依次执行场景，返回每个请求查询数和峰值分配的中位数
+    """
+    (headers,) = await _tokens(client, 1)
+    recorder = _ProfilingRecorder()
+    tracemalloc.start()
+    try:
+        rng = random.Random(0)
+        for _ in range(requests):
+            await scenario(client, recorder, headers, rng)
+    finally:
+        tracemalloc.stop()
+    return {
+        name: {
+            "queries_per_request": percentile(queries, 0.5),
+            "peak_alloc_kb": round(percentile(recorder.allocated[name], 0.5) / 1024, 1),
+        }
+        for name, queries in recorder.queries.items()
+    }
+
+
+def _client(base_url: str | None) -> httpx.AsyncClient:
+    from app.core.config import settings
+
+    if base_url:
+        return httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + settings.API_V1_STR, timeout=60
+        )
+    from app.main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench" + settings.API_V1_STR,
+        timeout=60,
+    )
+
+
+async def load(args: argparse.Namespace, feeds_url: str | None) -> dict[str, Any]:
+    from sqlmodel import Session, col, func, select
+
+    from app.core.db import engine
+    from app.models import User
+
+    with Session(engine) as session:
+        users = session.exec(
+            select(func.count())
+            .select_from(User)
+            .where(col(User.email).endswith(f"@{BENCH_DOMAIN}"))
+        ).one()
+    if not users:
+        raise SystemExit("no benchmark users, run the seed command first")
+    scenarios = _Scenarios(users, feeds_url)
+    results: dict[str, Any] = {}
+    async with _client(args.base_url) as client:
+        headers = await _tokens(client, min(users, args.concurrency))
+        for name in args.scenarios:
+            recorder = await _drive(client, getattr(scenarios, name), headers, args)
+            for request, latencies in recorder.latencies.items():
+                results[request] = {
+                    "requests": len(latencies),
+                    "errors": recorder.errors[request],
+                    "requests_per_second": round(len(latencies) / args.duration, 1),
+                    "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+                    "p90_ms": round(percentile(latencies, 0.9) * 1000, 2),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+                }
+    if args.profile_requests:
+        async with _client(None) as client:
+            for name in args.scenarios:
+                profiled = await _profile(
+                    client, getattr(scenarios, name), args.profile_requests
+                )
+                for request, stats in profiled.items():
+                    results.setdefault(request, {}).update(stats)
+    return results
+
+
+def micro_case(func: Callable[[], Any], repeat: int = 5) -> dict[str, float]:
+    """
+    timeit 自动选择每轮的次数，取最快一轮的每次耗时；再单独执行一次统计峰值分配
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number)) / number
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"ns_per_op": round(best * 1e9), "peak_alloc_bytes": peak}
+
+
+def micro(args: argparse.Namespace) -> dict[str, Any]:
+    from app.models import (
+        Article,
+        ArticleCreate,
+        ArticlePublic,
+        Articles,
+        ItemsPublic,
+    )
+    from app.services.llm import deal_content_parse_ret
+    from app.services.resource import parse_rss
+
+    answer = (
+        "```json\n"
+        + json.dumps(
+            {
+                "tags": ["benchmark", "latency"],
+                "abstract": "benchmark " * 20,
+                "content": "pipeline latency throughput " * 140,
+            }
+        )
+        + "\n```"
+    )
+    feed = feed_xml("micro", f"https://{BENCH_DOMAIN}", 20)
+    article: dict[str, Any] = {
+        "resoure_id": str(uuid.uuid4()),
+        "url": f"https://{BENCH_DOMAIN}/articles/0",
+        "title": "Bench article",
+        "abstract": "benchmark article",
+        "content": "benchmark " * 400,
+        "tags": ["bench", "latency"],
+    }
+    # 与 GET /articles/ 一样，从表模型转换成公开的字段
+    articles = Articles(
+        data=[
+            ArticlePublic.model_validate(Article(id=uuid.uuid4(), **article))
+            for _ in range(100)
+        ],
+        count=100,
+    )
+    items = {
+        "data": [
+            {
+                "id": str(uuid.uuid4()),
+                "owner_id": str(uuid.uuid4()),
+                "title": f"Bench item {number}",
+                "description": "benchmark item",
+            }
+            for number in range(100)
+        ],
+        "count": 100,
+    }
+    cases = {
+        "deal_content_parse_ret": lambda: deal_content_parse_ret(answer),
+        "parse_rss": lambda: parse_rss(feed),
+        "article_validate": lambda: ArticleCreate.model_validate(article),
+        "articles_dump_json": lambda: articles.model_dump_json(),
+        "items_public_validate": lambda: ItemsPublic.model_validate(items),
+    }
+    return {name: micro_case(func, args.repeat) for name, func in cases.items()}
+
+
+def _metrics(results: dict[str, dict[str, float]]) -> dict[str, float]:
+    return {
+        f"{name}.{key}": value
+        for name, stats in results.items()
+        for key, value in stats.items()
+        if key not in ("requests", "errors")
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.command == "seed":
+        print(json.dumps(seed(args)))
+        return
+    if args.command == "cleanup":
+        print(json.dumps(cleanup()))
+        return
+    if args.command == "micro":
+        results = micro(args)
+    elif "resources_add" in args.scenarios:
+        # 添加 RSS 资源时服务端会请求 feed，由本地的假站点提供
+        specs = {"site": {"kind": "site", "behavior": FakeBehavior(), "options": {}}}
+        with FakeServers(specs) as servers:
+            results = asyncio.run(load(args, servers.urls["site"]))
+    else:
+        results = asyncio.run(load(args, None))
+    report = {
+        **environment(),
+        "command": args.command,
+        "params": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("command", "output", "baseline", "max_regression")
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("params") != report["params"]:
+            print(
+                "warning: baseline was run with different parameters", file=sys.stderr
+            )
+        if not check_baseline(
+            _metrics(results), _metrics(baseline["results"]), args.max_regression
+        ):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+本地的假服务，替代压测时的外部依赖：OpenAI 兼容的 chat 接口、CosyVoice TTS 接口和
+提供文章页面的静态站点。每个服务都可以配置延迟、错误率和返回内容的大小。
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import socket
+import struct
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+
+PAGES_PREFIX = "/bench-pages"
+FEEDS_PREFIX = "/bench-feeds"
+# 假 LLM 返回的标签，聚合阶段按标签分组
+TAG_PREFIX = "bench-"
+
+_WORDS = (
+    "pipeline latency throughput article crawler parser summary audio "
+    "queue worker database index cache request response benchmark"
+).split()
+
+
+@dataclass
+class FakeBehavior:
+    latency_ms: float = 0.0
+    # 延迟在 [latency_ms, latency_ms + jitter_ms] 之间均匀分布
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    payload_bytes: int = 4096
+
+
+class _Behaving:
+    def __init__(self, behavior: FakeBehavior, seed: int) -> None:
+        self.behavior = behavior
+        # 固定种子，同样的参数每次运行注入的错误和延迟序列相同
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def delay(self) -> bool:
+        """
+        等待配置的延迟，返回这次请求是否应该失败
+        """
+        self.requests += 1
+        behavior = self.behavior
+        seconds = (
+            behavior.latency_ms + self.random.random() * behavior.jitter_ms
+        ) / 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        failed = self.random.random() < behavior.error_rate
+        if failed:
+            self.errors += 1
+        return failed
+
+
+def _new_app(behavior: FakeBehavior, seed: int) -> tuple[FastAPI, _Behaving]:
+    app = FastAPI()
+    state = _Behaving(behavior, seed)
+
+    @app.get("/_stats")
+    async def stats() -> dict[str, int]:
+        return {"requests": state.requests, "errors": state.errors}
+
+    return app, state
+
+
+def _text(size: int, seed: str) -> str:
+    rng = random.Random(seed)
+    words: list[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def fake_llm_app(behavior: FakeBehavior, *, tags: int = 10, seed: int = 0) -> FastAPI:
+    """
+    OpenAI 兼容的 /v1/chat/completions，返回 deal_content_parse_ret 能解析的 JSON；
+    标签由请求内容决定，同一篇文章总是得到同一个标签
+    """
+    app, state = _new_app(behavior, seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        if await state.delay():
+            return JSONResponse(
+                {"error": {"message": "injected error"}}, status_code=503
+            )
+        query = body["messages"][-1]["content"]
+        digest = zlib.crc32(query.encode())
+        tag = f"{TAG_PREFIX}{digest % max(tags, 1)}"
+        size = behavior.payload_bytes
+        answer = json.dumps(
+            {
+                "tags": [tag],
+                "abstract": f"{digest:x} " + _text(max(size // 8, 16), query[:64]),
+                "content": _text(size, query[-64:]),
+            },
+            ensure_ascii=False,
+        )
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        return JSONResponse(
+            {
+                "id": f"chatcmpl-{digest:x}",
+                "object": "chat.completion",
+                "model": body.get("model", ""),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(answer) // 4,
+                    "total_tokens": prompt_tokens + len(answer) // 4,
+                },
+            }
+        )
+
+    return app
+
+
+def _wav(size: int) -> bytes:
+    # 16kHz 单声道 16 位静音
+    data = b"\x00" * max(size - 44, 0)
+    header = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16)
+    return header + b"data" + struct.pack("<I", len(data)) + data
+
+
+def fake_tts_app(behavior: FakeBehavior, *, seed: int = 0) -> FastAPI:
+    """
+    与 CosyVoice 的 /generate_audio 参数相同，直接返回 WAV 数据
+    """
+    app, state = _new_app(behavior, seed)
+    audio = _wav(behavior.payload_bytes)
+
+    @app.post("/generate_audio")
+    async def generate_audio(request: Request) -> Response:
+        await request.json()
+        if await state.delay():
+            return JSONResponse({"error": "injected error"}, status_code=500)
+        return Response(audio, media_type="audio/wav")
+
+    return app
+
+
+def page_html(number: int, size: int) -> str:
+    paragraphs: list[str] = []
+    length = 0
+    while length < size:
+        paragraph = _text(400, f"{number}-{len(paragraphs)}")
+        paragraphs.append(f"<p>{paragraph}</p>")
+        length += len(paragraph)
+    return (
+        f"<html><head><title>Benchmark article {number}</title></head><body>"
+        f"<nav><a href='/'>Home</a></nav><article><h1>Benchmark article {number}</h1>"
+        + "".join(paragraphs)
+        + "</article><footer>footer</footer></body></html>"
+    )
+
+
+def feed_xml(name: str, base_url: str, entries: int) -> str:
+    first = zlib.crc32(name.encode()) * entries
+    items = "".join(
+        f"<item><title>Benchmark entry {first + i}</title>"
+        f"<link>{base_url}{PAGES_PREFIX}/{first + i}.html</link>"
+        f"<description>{_text(200, f'{name}-{i}')}</description>"
+        "<pubDate>Mon, 06 Jan 2025 08:00:00 GMT</pubDate></item>"
+        for i in range(entries)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Benchmark feed {name}</title><link>{base_url}</link>"
+        f"<description>Benchmark feed</description>{items}</channel></rss>"
+    )
+
+
+def fake_site_app(
+    behavior: FakeBehavior,
+    *,
+    pages_dir: Path | None = None,
+    feed_entries: int = 5,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    /bench-pages/{number}.html 返回文章页面；指定 pages_dir 时依次返回其中录制的
+    HTML 文件，否则按 payload_bytes 生成。
+    /bench-feeds/{name}.xml 返回 feed_entries 篇文章的 RSS，每个 name 的文章不同
+    """
+    app, state = _new_app(behavior, seed)
+    recorded = sorted(pages_dir.glob("*.html")) if pages_dir else []
+
+    @app.get(PAGES_PREFIX + "/{number}.html")
+    async def page(number: int) -> Response:
+        if await state.delay():
+            return Response("injected error", status_code=500)
+        if recorded:
+            html = recorded[number % len(recorded)].read_text(errors="replace")
+        else:
+            html = page_html(number, behavior.payload_bytes)
+        return HTMLResponse(html)
+
+    @app.get(FEEDS_PREFIX + "/{name}.xml")
+    async def feed(name: str, request: Request) -> Response:
+        if await state.delay():
+            return Response("injected error", status_code=500)
+        base_url = str(request.base_url).rstrip("/")
+        return Response(
+            feed_xml(name, base_url, feed_entries), media_type="application/rss+xml"
+        )
+
+    return app
+
+
+class HttpTTSClient:
+    """
+    代替 gradio_client.Client：把 predict 的参数发给假 TTS 服务，
+    与 Client.predict 一样把音频保存到临时文件并返回本地路径
+    """
+
+    def __init__(self, src: str) -> None:
+        self.src = src.rstrip("/")
+
+    def predict(self, *, api_name: str, **kwargs: Any) -> str:
+        response = httpx.post(self.src + api_name, json=kwargs, timeout=60)
+        response.raise_for_status()
+        digest = hashlib.sha256(response.content).hexdigest()[:16]
+        with tempfile.NamedTemporaryFile(
+            suffix=".wav", prefix=f"bench-{digest}-", delete=False
+        ) as f:
+            f.write(response.content)
+        return f.name
+
+
+FACTORIES = {"llm": fake_llm_app, "tts": fake_tts_app, "site": fake_site_app}
+
+
+def _serve(specs: dict[str, dict[str, Any]], sockets: dict[str, socket.socket]) -> None:
+    servers = {
+        name: uvicorn.Server(
+            uvicorn.Config(
+                FACTORIES[spec["kind"]](spec["behavior"], **spec["options"]),
+                log_level="warning",
+                access_log=False,
+                lifespan="off",
+            )
+        )
+        for name, spec in specs.items()
+    }
+
+    async def serve() -> None:
+        await asyncio.gather(
+            *(server.serve(sockets=[sockets[name]]) for name, server in servers.items())
+        )
+
+    asyncio.run(serve())
+
+
+class FakeServers:
+    """
+    在单独的进程中运行假服务，不和被压测的代码争抢 GIL，也不计入它的内存；
+    端口由系统分配，specs 为 {名称: {"kind": llm/tts/site, "behavior": ..., "options": {...}}}
+    """
+
+    def __init__(self, specs: dict[str, dict[str, Any]]) -> None:
+        self.specs = specs
+        self.urls: dict[str, str] = {}
+        self._sockets: dict[str, socket.socket] = {}
+        self._process: multiprocessing.process.BaseProcess | None = None
+        for name in specs:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("127.0.0.1", 0))
+            self._sockets[name] = sock
+            self.urls[name] = f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            name: httpx.get(url + "/_stats", timeout=5).json()
+            for name, url in self.urls.items()
+        }
+
+    def start(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        self._process = context.Process(
+            target=_serve, args=(self.specs, self._sockets), name="fake-servers"
+        )
+        self._process.start()
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.stats()
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or not self._process.is_alive():
+                    self.stop()
+                    raise RuntimeError("fake servers did not start")
+                time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(10)
+            if self._process.is_alive():
+                self._process.kill()
+            self._process = None
+        for sock in self._sockets.values():
+            sock.close()
+
+    def __enter__(self) -> "FakeServers":
+        self.start()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.stop()
@@ -0,0 +1,141 @@
+"""
+导入耗时的基准：在新的解释器中用 python -X importtime 导入模块，报告总耗时、
+导入后的 RSS 和耗时最多的顶层包。
+
+    python -m app.benchmarks.imports --output imports.json
+    python -m app.benchmarks.imports --budget-ms 2000 --baseline imports.json
+
+只处理 API 请求的进程不应该导入抓取和 TTS 用的重依赖，导入了 HEAVY 中的模块、
+总耗时超过 --budget-ms 或比基线变差超过 --max-regression 时以状态 1 退出。
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from app.benchmarks.report import check_baseline, environment
+
+# 只在抓取、合成音频或添加 RSS 资源时才需要
+HEAVY = ("crawl4ai", "playwright", "gradio_client", "feedparser", "emails")
+
+_PROBE = """
+import json, resource, sys
+import {module}
+print(json.dumps({{
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure import time of the app.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5, help="keep the fastest run")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, help="maximum total import time")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare with a saved report")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.1,
+        help="exit with status 1 when a metric is this much worse than the baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def parse_importtime(text: str) -> dict[str, tuple[int, int]]:
+    """
+    解析 -X importtime 的输出，返回 {模块: (自身耗时, 累计耗时)}，单位微秒
+    """
+    modules = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # 表头
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def by_package(modules: dict[str, tuple[int, int]]) -> Counter[str]:
+    """
+    按顶层包汇总自身耗时
+    """
+    packages: Counter[str] = Counter()
+    for name, (self_us, _) in modules.items():
+        packages[name.split(".")[0]] += self_us
+    return packages
+
+
+def measure(module: str) -> dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    probe = json.loads(result.stdout.splitlines()[-1])
+    modules = parse_importtime(result.stderr)
+    return {
+        "total_ms": modules[module][1] / 1000,
+        "rss_mb": probe["rss_mb"],
+        "packages": by_package(modules),
+        "heavy": sorted({name.split(".")[0] for name in probe["modules"]} & set(HEAVY)),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    fastest = min(runs, key=lambda run: run["total_ms"])
+    report = {
+        **environment(),
+        "module": args.module,
+        "total_ms": round(fastest["total_ms"], 1),
+        "rss_mb": round(min(run["rss_mb"] for run in runs), 1),
+        "heavy_modules": fastest["heavy"],
+        "packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in fastest["packages"].most_common(args.top)
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    failed = False
+    if report["heavy_modules"]:
+        print(
+            f"{args.module} imports {', '.join(report['heavy_modules'])}",
+            file=sys.stderr,
+        )
+        failed = True
+    if args.budget_ms and report["total_ms"] > args.budget_ms:
+        print(
+            f"import took {report['total_ms']}ms, budget is {args.budget_ms}ms",
+            file=sys.stderr,
+        )
+        failed = True
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        metrics = ("total_ms", "rss_mb")
+        if not check_baseline(
+            {name: report[name] for name in metrics},
+            {name: baseline[name] for name in metrics},
+            args.max_regression,
+        ):
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
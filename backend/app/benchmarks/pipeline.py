@@ -0,0 +1,311 @@
+"""
+离线的流水线压测：启动本地的假 LLM、TTS 和文章站点，向数据库写入一批文章，
+依次运行 crawl_content、ai_parse_content、aggregate_by_tag 和 generate_audio，
+报告每秒处理的文章数、各阶段每次运行耗时的 p50/p95 和进程的峰值 RSS。
+
+    python -m app.benchmarks.pipeline --articles 200 --output bench.json
+    python -m app.benchmarks.pipeline --articles 200 --baseline bench.json
+
+聚合阶段会处理数据库中最近一小时所有已解析的文章，请使用单独的数据库，
+例如 POSTGRES_DB=app_bench（需要先执行 alembic upgrade head）。
+
+同样的参数和 --seed 下，假服务注入的延迟和错误序列相同，不同提交的结果可以直接比较；
+指定 --baseline 时有指标变差超过 --max-regression 则以状态 1 退出。
+TTS 的假服务不实现 Gradio 的队列协议，压测时 tts.new_client 被替换为
+HttpTTSClient，因此不包含 gradio_client 本身的开销。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from app.benchmarks.fakes import (
+    PAGES_PREFIX,
+    TAG_PREFIX,
+    FakeBehavior,
+    FakeServers,
+    HttpTTSClient,
+)
+from app.benchmarks.report import check_baseline, environment, percentile
+
+STAGES = ("crawl_content", "parse_content", "tag_aggregate", "generate_audio")
+# (延迟, 返回内容大小) 的默认值
+DEFAULTS = {
+    "llm": (200.0, 4096),
+    "tts": (300.0, 256 * 1024),
+    "site": (20.0, 16 * 1024),
+}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the article pipeline against local fake services."
+    )
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=10, help="distinct tags")
+    parser.add_argument(
+        "--batch", type=int, default=10, help="articles per crawl/parse run"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    for name, (latency, size) in DEFAULTS.items():
+        parser.add_argument(f"--{name}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{name}-jitter-ms", type=float, default=latency / 2)
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+        parser.add_argument(f"--{name}-payload-bytes", type=int, default=size)
+    parser.add_argument(
+        "--pages-dir", type=Path, help="serve recorded *.html pages from here"
+    )
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare with a saved report")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.1,
+        help="exit with status 1 when a metric is this much worse than the baseline",
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="keep benchmark rows afterwards"
+    )
+    return parser.parse_args(argv)
+
+
+def _behavior(args: argparse.Namespace, name: str) -> FakeBehavior:
+    return FakeBehavior(
+        latency_ms=getattr(args, f"{name}_latency_ms"),
+        jitter_ms=getattr(args, f"{name}_jitter_ms"),
+        error_rate=getattr(args, f"{name}_error_rate"),
+        payload_bytes=getattr(args, f"{name}_payload_bytes"),
+    )
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class _Run:
+    def __init__(self) -> None:
+        from app.core.metrics import pipeline_items_total
+
+        self._items = pipeline_items_total
+        self.durations: dict[str, list[float]] = {stage: [] for stage in STAGES}
+
+    def items(self, stage: str, result: str) -> int:
+        for _, labels, value in self._items.samples():
+            if labels == {"stage": stage, "result": result}:
+                return int(value)
+        return 0
+
+    async def stage(
+        self,
+        stage: str,
+        func: Callable[[], Awaitable[Any] | Any],
+        max_runs: int,
+    ) -> None:
+        """
+        重复运行一个阶段，直到没有可处理的文章或达到 max_runs 次；
+        失败的文章下一次还会被选中，所以需要上限
+        """
+        for _ in range(max_runs):
+            picked = self.items(stage, "picked")
+            start = time.perf_counter()
+            result = func()
+            if asyncio.iscoroutine(result):
+                await result
+            self.durations[stage].append(time.perf_counter() - start)
+            if self.items(stage, "picked") == picked:
+                # 最后一次没有选中文章，不计入耗时
+                self.durations[stage].pop()
+                break
+
+    def report(self, seconds: float) -> dict[str, Any]:
+        stages = {}
+        for stage in STAGES:
+            durations = self.durations[stage]
+            succeeded = self.items(stage, "succeeded")
+            total = sum(durations)
+            stages[stage] = {
+                "runs": len(durations),
+                "picked": self.items(stage, "picked"),
+                "succeeded": succeeded,
+                "failed": self.items(stage, "failed"),
+                "seconds": round(total, 3),
+                "items_per_second": round(succeeded / total, 3) if total else 0.0,
+                "p50_seconds": round(percentile(durations, 0.5), 4),
+                "p95_seconds": round(percentile(durations, 0.95), 4),
+            }
+        return {"seconds": round(seconds, 3), "stages": stages}
+
+
+def _cleanup() -> int:
+    """
+    删除压测写入的文章、聚合文章、调用记录和音频文件，返回删除的文章数
+    """
+    from sqlmodel import Session, col, delete, or_, select
+
+    from app.core.db import engine
+    from app.models import Article, LLMCall
+    from app.services.audio import AUDIO_DIR
+
+    with Session(engine) as session:
+        stmt = select(Article.id, Article.audio).where(
+            or_(
+                col(Article.url).contains(PAGES_PREFIX + "/"),
+                col(Article.title).startswith(TAG_PREFIX),
+            )
+        )
+        rows = session.exec(stmt).all()
+        ids = [article_id for article_id, _ in rows]
+        for _, audio in rows:
+            if audio:
+                (AUDIO_DIR / audio.rsplit("/", 1)[-1]).unlink(missing_ok=True)
+        if ids:
+            session.execute(delete(LLMCall).where(col(LLMCall.article_id).in_(ids)))
+            session.execute(delete(Article).where(col(Article.id).in_(ids)))
+        session.commit()
+    return len(ids)
+
+
+def _seed(count: int, site_url: str) -> None:
+    from sqlmodel import Session
+
+    from app.core.db import engine
+    from app.models import Article
+
+    with Session(engine) as session:
+        session.add_all(
+            Article(
+                id=uuid.uuid4(),
+                url=f"{site_url}{PAGES_PREFIX}/{number}.html",
+                title=f"Benchmark article {number}",
+                resoure_id="",
+                is_active=False,
+            )
+            for number in range(count)
+        )
+        session.commit()
+
+
+def _new_tts_client(endpoint: str) -> Any:
+    return HttpTTSClient(endpoint)
+
+
+async def run(args: argparse.Namespace, site_url: str) -> dict[str, Any]:
+    from app.core.log import setup_logging
+    from app.services import article as pipeline
+    from app.services import tts
+    from app.services.llm_usage import llm_call_recorder
+
+    setup_logging()
+    # 假 TTS 服务不实现 Gradio 协议，见模块说明
+    tts.new_client = _new_tts_client
+    if removed := _cleanup():
+        print(f"removed {removed} leftover benchmark articles", file=sys.stderr)
+    _seed(args.articles, site_url)
+    llm_call_recorder.start()
+    bench = _Run()
+    runs = math.ceil(args.articles / args.batch) * 2 + 1
+    start = time.perf_counter()
+    try:
+        await bench.stage(
+            "crawl_content", lambda: pipeline.crawl_content(limit=args.batch), runs
+        )
+        await bench.stage(
+            "parse_content", lambda: pipeline.ai_parse_content(limit=args.batch), runs
+        )
+        await bench.stage("tag_aggregate", pipeline.aggregate_by_tag, 2)
+        await bench.stage(
+            "generate_audio", pipeline.generate_audio, math.ceil(args.tags / 10) * 2 + 1
+        )
+        seconds = time.perf_counter() - start
+    finally:
+        llm_call_recorder.stop()
+        if not args.keep:
+            _cleanup()
+    return bench.report(seconds)
+
+
+def _metrics(report: dict[str, Any]) -> dict[str, float]:
+    metrics = {
+        "articles_per_second": report["articles_per_second"],
+        "peak_rss_mb": report["peak_rss_mb"],
+    }
+    for stage, stats in report["stages"].items():
+        for key in ("items_per_second", "p50_seconds", "p95_seconds"):
+            metrics[f"{stage}.{key}"] = stats[key]
+    return metrics
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    specs = {
+        "llm": {
+            "kind": "llm",
+            "behavior": _behavior(args, "llm"),
+            "options": {"tags": args.tags, "seed": args.seed},
+        },
+        "tts": {
+            "kind": "tts",
+            "behavior": _behavior(args, "tts"),
+            "options": {"seed": args.seed},
+        },
+        "site": {
+            "kind": "site",
+            "behavior": _behavior(args, "site"),
+            "options": {"pages_dir": args.pages_dir, "seed": args.seed},
+        },
+    }
+    with FakeServers(specs) as servers:
+        # settings 在导入时读取环境变量，必须在导入 app 的其他模块之前设置
+        os.environ.update(
+            {
+                "ONE_API_BASE_URL": servers.urls["llm"] + "/v1",
+                "ONE_TOKEN": "benchmark",
+                "TTS_ENDPOINT": servers.urls["tts"],
+                "LLM_FALLBACKS": "[]",
+                "LLM_HEDGE_ENABLED": "false",
+            }
+        )
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("TRACING_ENABLED", "false")
+        result = asyncio.run(run(args, servers.urls["site"]))
+        fakes = servers.stats()
+    report = {
+        **environment(),
+        "params": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline", "max_regression", "keep")
+        },
+        "articles_per_second": round(args.articles / result["seconds"], 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        **result,
+        "fakes": fakes,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("params") != report["params"]:
+            print(
+                "warning: baseline was run with different parameters", file=sys.stderr
+            )
+        if not check_baseline(
+            _metrics(report), _metrics(baseline), args.max_regression
+        ):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+压测报告的公共部分：分位数、运行环境，以及与保存的基线比较
+"""
+
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q * 100) - 1]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def higher_is_better(name: str) -> bool:
+    # 吞吐量类的指标越大越好，耗时、查询数、内存越小越好
+    return name.endswith("per_second")
+
+
+def delta_line(name: str, value: float, base: float | None) -> str:
+    if not base:
+        return f"{name:48} {value:>12}"
+    change = (value - base) / base * 100
+    return f"{name:48} {value:>12} {base:>12} {change:+7.1f}%"
+
+
+def compare(
+    current: dict[str, float], baseline: dict[str, float], threshold: float
+) -> tuple[list[str], list[str]]:
+    """
+    比较两组扁平的指标，返回 (每个指标的对比行, 变差超过 threshold 的指标)
+    """
+    lines = []
+    regressions = []
+    for name, value in current.items():
+        base = baseline.get(name)
+        lines.append(delta_line(name, value, base))
+        if not base:
+            continue
+        change = (value - base) / base
+        if higher_is_better(name):
+            change = -change
+        if change > threshold:
+            regressions.append(name)
+    return lines, regressions
+
+
+def check_baseline(
+    current: dict[str, float], baseline: dict[str, float], threshold: float
+) -> bool:
+    """
+    打印与基线的对比，有指标变差超过 threshold 时返回 False
+    """
+    lines, regressions = compare(current, baseline, threshold)
+    print(f"\n{'metric':48} {'current':>12} {'baseline':>12} {'change':>8}")
+    print("\n".join(lines))
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}", file=sys.stderr)
+        return False
+    return True
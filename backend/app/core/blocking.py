@@ -0,0 +1,30 @@
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+import anyio
+import anyio.to_thread
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_limiter: anyio.CapacityLimiter | None = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    # CapacityLimiter 需要在事件循环中创建
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.BLOCKING_IO_THREADS)
+    return _limiter
+
+
+async def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """
+    在线程中执行阻塞调用（同步数据库操作、requests、CPU 较重的解析），
+    不阻塞事件循环。
+
+    使用单独的容量限制，后台任务最多占用 BLOCKING_IO_THREADS 个线程，
+    不会挤占 FastAPI 处理同步路由的线程池。
+    """
+    return await anyio.to_thread.run_sync(func, *args, limiter=_get_limiter())
@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, MetricFamily
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str) -> None:
+        super().__init__(f"circuit {name} is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    依赖持续失败或变慢时断开，在 open_seconds 内直接拒绝调用；
+    之后进入 half_open，放行少量试探请求，成功则恢复，失败则再次断开。
+
+    最近 window 次调用中失败（含超过 slow_call_seconds 的慢调用）的比例
+    达到 failure_rate，且调用次数不少于 min_calls 时断开。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float,
+        min_calls: int,
+        window: int,
+        open_seconds: float,
+        slow_call_seconds: float,
+        half_open_max_calls: int = 1,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if (
+            self._state == OPEN
+            and time.monotonic() - self._opened_at >= self.open_seconds
+        ):
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened_total += 1
+
+    def allow(self) -> bool:
+        """
+        是否放行这次调用；half_open 状态下只放行 half_open_max_calls 次试探
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected_total += 1
+            return False
+
+    def record(self, success: bool, seconds: float = 0.0) -> None:
+        success = success and seconds <= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                if success:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (
+                state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def release(self) -> None:
+        """
+        放行的调用被取消、没有结果时调用，归还 half_open 的试探名额
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    @contextmanager
+    def protect(self) -> Iterator[None]:
+        """
+        包住一次调用：断开时抛出 CircuitOpenError，调用抛出异常时记为失败；
+        调用被取消时不计入统计，只归还试探名额
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        except BaseException:
+            # asyncio.CancelledError、KeyboardInterrupt 等
+            self.release()
+            raise
+        self.record(True, time.monotonic() - start)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            outcomes = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            return {
+                "name": self.name,
+                "state": self._current_state(),
+                "calls": outcomes,
+                "failure_rate": failures / outcomes if outcomes else 0.0,
+                "opened_total": self.opened_total,
+                "rejected_total": self.rejected_total,
+            }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, slow_call_seconds: float) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_rate=settings.BREAKER_FAILURE_RATE,
+                min_calls=settings.BREAKER_MIN_CALLS,
+                window=settings.BREAKER_WINDOW,
+                open_seconds=settings.BREAKER_OPEN_SECONDS,
+                slow_call_seconds=slow_call_seconds,
+            )
+        return breaker
+
+
+def all_breakers() -> list[CircuitBreaker]:
+    with _breakers_lock:
+        return list(_breakers.values())
+
+
+def llm_breaker(model: str) -> CircuitBreaker:
+    return get_breaker(f"llm:{model}", settings.BREAKER_LLM_SLOW_SECONDS)
+
+
+def tts_breaker() -> CircuitBreaker:
+    return get_breaker("tts", settings.BREAKER_TTS_SLOW_SECONDS)
+
+
+def crawler_breaker() -> CircuitBreaker:
+    return get_breaker("crawler", settings.BREAKER_CRAWLER_SLOW_SECONDS)
+
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _collect_breakers() -> Iterator[MetricFamily]:
+    snapshots = [breaker.snapshot() for breaker in all_breakers()]
+    yield (
+        "circuit_breaker_state",
+        "gauge",
+        "Circuit breaker state: 0 closed, 1 half open, 2 open.",
+        [("", {"name": s["name"]}, STATE_VALUES[s["state"]]) for s in snapshots],
+    )
+    yield (
+        "circuit_breaker_opened_total",
+        "counter",
+        "Times the circuit breaker opened.",
+        [("", {"name": s["name"]}, s["opened_total"]) for s in snapshots],
+    )
+    yield (
+        "circuit_breaker_rejected_total",
+        "counter",
+        "Calls rejected while the circuit breaker was open.",
+        [("", {"name": s["name"]}, s["rejected_total"]) for s in snapshots],
+    )
+
+
+REGISTRY.register_collector(_collect_breakers)
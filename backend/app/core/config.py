@@ -4,6 +4,7 @@ from typing import Annotated, Any, Literal
 
 from pydantic import (
     AnyUrl,
+    BaseModel,
     BeforeValidator,
     EmailStr,
     HttpUrl,
@@ -24,6 +25,13 @@ def parse_cors(v: Any) -> list[str] | str:
     raise ValueError(v)
 
 
+class LLMEndpoint(BaseModel):
+    model: str
+    # 为空时使用 ONE_API_BASE_URL / ONE_TOKEN
+    base_url: str | None = None
+    token: str | None = None
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         # Use top level .env file (one level above ./backend/)
@@ -44,8 +52,76 @@ class Settings(BaseSettings):
     # 结尾不要加/
     ONE_API_BASE_URL: str = "http://127.0.0.1:3000/v1"
     ONE_TOKEN: str = ""
+    # 单次 LLM 请求的超时时间（秒）
+    LLM_TIMEOUT_SECONDS: float = 120.0
+    # 超过这个 token 数的文章分段处理，每段不超过 LLM_CHUNK_TOKENS
+    LLM_MAX_PROMPT_TOKENS: int = 6000
+    LLM_CHUNK_TOKENS: int = 3000
+    # 最多处理的分段数，超出的部分丢弃，保证每篇文章的耗时有上限
+    LLM_MAX_CHUNKS: int = 8
+    LLM_CHUNK_CONCURRENCY: int = 4
+    # 单篇文章解析的总超时时间（秒）
+    LLM_ARTICLE_TIMEOUT_SECONDS: float = 600.0
+    # 主模型返回 429/5xx 时依次尝试的备用模型，json 格式，
+    # 如 [{"model": "deepseek-chat"}, {"model": "gpt-4o-mini", "base_url": "..."}]
+    LLM_FALLBACKS: list[LLMEndpoint] = []
+    # 请求超过主模型近期的 p90 耗时后，同时向第一个备用模型发出请求
+    LLM_HEDGE_ENABLED: bool = False
+    # 至少有这么多次成功请求的耗时后才开始对冲
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+
+    # LLM 调用记录：后台线程每 LLM_USAGE_FLUSH_SECONDS 秒或攒够一批时写入 llmcall 表
+    LLM_USAGE_ENABLED: bool = True
+    LLM_USAGE_BATCH_SIZE: int = 100
+    LLM_USAGE_FLUSH_SECONDS: float = 5.0
+    LLM_USAGE_MAX_QUEUE: int = 10000
+
+    # 熔断：最近 BREAKER_WINDOW 次调用中失败比例达到 BREAKER_FAILURE_RATE 时断开
+    # BREAKER_OPEN_SECONDS 秒，超过 *_SLOW_SECONDS 的慢调用也算失败
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_MIN_CALLS: int = 5
+    BREAKER_WINDOW: int = 20
+    BREAKER_OPEN_SECONDS: float = 60.0
+    BREAKER_LLM_SLOW_SECONDS: float = 90.0
+    BREAKER_TTS_SLOW_SECONDS: float = 60.0
+    BREAKER_CRAWLER_SLOW_SECONDS: float = 30.0
     # 最后一个/不要漏掉
     TTS_ENDPOINT: str = ""
+    # 参与音频缓存 key 的计算，更换 TTS 模型时修改它，避免复用旧模型生成的音频
+    TTS_MODEL: str = "cosyvoice"
+
+    # static/audio 目录的容量上限，超过后按最近访问时间淘汰未被 Article 引用的音频
+    AUDIO_CACHE_MAX_BYTES: int = 5 * 1024 * 1024 * 1024
+    # 未被 Article 引用的音频至少保留这么久才会被回收，避免误删正在入库的音频
+    AUDIO_GC_GRACE_SECONDS: int = 60 * 60
+    # 音频落盘后是否 fsync，关闭时由操作系统决定何时刷盘
+    AUDIO_FSYNC: bool = False
+    # app: 由应用进程发送音频；x-accel-redirect/x-sendfile: 交给反向代理发送
+    AUDIO_DELIVERY_MODE: Literal["app", "x-accel-redirect", "x-sendfile"] = "app"
+    # nginx 中对应 static/audio 目录的 internal location
+    AUDIO_ACCEL_REDIRECT_PREFIX: str = "/protected-audio/"
+    # 生成音频后转码出低码率的 opus、aac 版本，需要安装 ffmpeg
+    AUDIO_TRANSCODE_ENABLED: bool = True
+    AUDIO_TRANSCODE_WORKERS: int = 2
+    AUDIO_OPUS_BITRATE: str = "24k"
+    AUDIO_AAC_BITRATE: str = "48k"
+
+    # 常驻浏览器池：浏览器数量、每个浏览器最多抓取的页面数、浏览器进程内存上限
+    CRAWLER_POOL_SIZE: int = 2
+    CRAWLER_MAX_PAGES: int = 100
+    CRAWLER_MAX_MEMORY_MB: int = 1024
+    # 启动时预热浏览器池，关闭后在第一次抓取时才启动浏览器
+    CRAWLER_POOL_WARMUP: bool = True
+    # 先用 HTTP 请求抓取，正文太短时才使用浏览器；记住每个域名可用的方式
+    CRAWLER_HTTP_TIMEOUT: float = 10.0
+    CRAWLER_MIN_CONTENT_CHARS: int = 200
+    CRAWLER_TIER_TTL_SECONDS: int = 24 * 60 * 60
+    # 同一域名连续这么多个页面需要 JavaScript 后，才直接使用浏览器抓取
+    CRAWLER_TIER_BROWSER_AFTER: int = 3
+    CRAWLER_USER_AGENT: str = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    )
 
     BACKEND_CORS_ORIGINS: Annotated[
         list[AnyUrl] | str, BeforeValidator(parse_cors)
@@ -59,7 +135,65 @@ class Settings(BaseSettings):
         ]
 
     PROJECT_NAME: str
+    # 日志统一经过队列由后台线程输出；json 为每行一个 JSON 对象，text 用于本地开发
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # 同一位置的 INFO 及以下日志，每 LOG_SAMPLE_WINDOW_SECONDS 秒内前 LOG_SAMPLE_BURST 条
+    # 全部输出，之后每 LOG_SAMPLE_RATE 条输出一条；LOG_SAMPLE_RATE 为 1 时不采样
+    LOG_SAMPLE_BURST: int = 20
+    LOG_SAMPLE_WINDOW_SECONDS: float = 60.0
+    LOG_SAMPLE_RATE: int = 10
+
     SENTRY_DSN: HttpUrl | None = None
+    SENTRY_TRACES_SAMPLE_RATE: float = 0.1
+
+    # OpenTelemetry 链路追踪，需要安装 opentelemetry-sdk；
+    # file 导出到本地 JSON Lines 文件，otlp 导出到 collector
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: Literal["file", "otlp"] = "file"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    # 头部采样：记录的 trace 比例；尾部采样：记录的 trace 中导出的比例，
+    # 出错或耗时超过 TRACING_TAIL_SLOW_SECONDS 的 trace 总是导出
+    TRACING_HEAD_SAMPLE_RATIO: float = 1.0
+    TRACING_TAIL_SAMPLE_RATIO: float = 0.1
+    TRACING_TAIL_SLOW_SECONDS: float = 30.0
+
+    # API 进程是否运行定时任务；多进程或多副本部署时关闭，由 app.worker 运行
+    SCHEDULER_ENABLED: bool = True
+    # app.worker 中同步任务使用的线程数
+    WORKER_THREADS: int = 4
+    # Prometheus 指标：API 在 /metrics 提供，worker 在 WORKER_METRICS_PORT 端口提供；
+    # 设置 METRICS_TOKEN 后需要 Authorization: Bearer <token>
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str | None = None
+    WORKER_METRICS_PORT: int = 9100
+
+    # 异步任务中的阻塞调用（同步数据库操作、CPU 较重的解析）使用的线程数
+    BLOCKING_IO_THREADS: int = 8
+    # 事件循环被阻塞超过 LOOP_LAG_THRESHOLD_SECONDS 秒时记录日志和调用栈
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_THRESHOLD_SECONDS: float = 0.25
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.1
+
+    # 每个请求的 SQL 语句数和数据库耗时，通过 Server-Timing 响应头和指标提供；
+    # 同一条语句在一个请求中执行 DB_REPEATED_QUERY_THRESHOLD 次以上时记录警告
+    DB_QUERY_STATS_ENABLED: bool = True
+    DB_REPEATED_QUERY_THRESHOLD: int = 5
+
+    # 按需性能分析：开启后超级用户可以用 X-Profile 请求头或 profile 查询参数分析单个请求，
+    # 也可以在一段时间内按比例采样某个路由；报告保存在 PROFILING_DIR，只保留最近的
+    # PROFILING_MAX_REPORTS 个。关闭时不注册中间件，没有额外开销
+    PROFILING_ENABLED: bool = False
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_REPORTS: int = 200
+
+    # 多个进程运行调度器时，用 Postgres advisory lock 选出 leader 执行单例任务；
+    # leader 每 SCHEDULER_RENEW_SECONDS 秒续期，超过 SCHEDULER_LEASE_SECONDS 没有续期即失效
+    SCHEDULER_LEADER_ELECTION: bool = True
+    SCHEDULER_LOCK_ID: int = 720_901_541
+    SCHEDULER_RENEW_SECONDS: float = 5.0
+    SCHEDULER_LEASE_SECONDS: float = 15.0
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str
@@ -94,6 +228,18 @@ class Settings(BaseSettings):
         return self
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
+    # 邮件模板编译后的字节码缓存目录，为空时使用系统临时目录；
+    # 本地修改模板时打开 EMAIL_TEMPLATES_AUTO_RELOAD
+    EMAIL_TEMPLATES_CACHE_DIR: str = ""
+    EMAIL_TEMPLATES_AUTO_RELOAD: bool = False
+    # 邮件先放进发件队列，由后台线程按批发送；失败时间隔 EMAIL_OUTBOX_RETRY_SECONDS
+    # 秒（每次翻倍）重试，最多 EMAIL_OUTBOX_MAX_ATTEMPTS 次。SMTP 连接空闲
+    # SMTP_IDLE_SECONDS 秒后断开
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20
+    EMAIL_OUTBOX_MAX_QUEUE: int = 1000
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_RETRY_SECONDS: float = 5.0
+    SMTP_IDLE_SECONDS: float = 30.0
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -1,10 +1,40 @@
+from collections.abc import Iterator
+from typing import cast
+
+from sqlalchemy import QueuePool
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.metrics import REGISTRY, MetricFamily
+from app.core.queries import instrument_engine
 from app.models import User, UserCreate
 
 engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+# 关闭时不注册事件监听，执行语句没有额外开销
+if settings.DB_QUERY_STATS_ENABLED:
+    instrument_engine(engine)
+
+
+def _collect_pool() -> Iterator[MetricFamily]:
+    pool = cast(QueuePool, engine.pool)
+    # QueuePool 才有这些统计
+    if not hasattr(pool, "checkedout"):
+        return
+    yield (
+        "db_pool_connections",
+        "gauge",
+        "Database connections in the pool by state.",
+        [
+            ("", {"state": "checked_out"}, pool.checkedout()),
+            ("", {"state": "checked_in"}, pool.checkedin()),
+            ("", {"state": "overflow"}, max(pool.overflow(), 0)),
+        ],
+    )
+    yield ("db_pool_size", "gauge", "Configured pool size.", [("", {}, pool.size())])
+
+
+REGISTRY.register_collector(_collect_pool)
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -0,0 +1,224 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import Connection, Engine, NullPool, create_engine, text
+
+from app.core.blocking import run_blocking
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def _engine() -> Engine:
+    # 单独的连接，不占用连接池；开启 TCP keepalive，进程或网络异常断开后
+    # 数据库能尽快释放 advisory lock，其他节点可以接管。
+    # 重连时复用同一个 engine，NullPool 下每次 connect 都是新的连接
+    return create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=NullPool,
+        connect_args={
+            "keepalives": 1,
+            "keepalives_idle": 5,
+            "keepalives_interval": 2,
+            "keepalives_count": 3,
+            "options": "-c tcp_keepalives_idle=5 -c tcp_keepalives_interval=2 "
+            "-c tcp_keepalives_count=3",
+        },
+    )
+
+
+def _connect() -> Connection:
+    return _engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _job_key(func: Callable[..., Any]) -> int:
+    # 任务锁的第二个键，(int, int) 与 bigint 两种 advisory lock 的键互不冲突
+    name = f"{func.__module__}.{func.__qualname__}"
+    return zlib.crc32(name.encode()) & 0x7FFFFFFF
+
+
+class LeaderElector:
+    """
+    用 Postgres 会话级 advisory lock 选出唯一的 leader。
+
+    后台线程每 renew_seconds 秒检查一次：没有锁时尝试 pg_try_advisory_lock，
+    持有锁时检查连接是否存活。最近一次成功检查超过 lease_seconds 时不再认为
+    自己是 leader；leader 进程退出或连接断开后锁被释放，其他节点在下一次检查时接管。
+    """
+
+    def __init__(
+        self,
+        lock_id: int,
+        *,
+        renew_seconds: float,
+        lease_seconds: float,
+        connect: Callable[[], Connection] = _connect,
+    ) -> None:
+        self.lock_id = lock_id
+        self.renew_seconds = renew_seconds
+        self.lease_seconds = lease_seconds
+        self.connect = connect
+        self._conn: Connection | None = None
+        self._leader = False
+        self._renewed_at = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader and time.monotonic() - self._renewed_at < self.lease_seconds
+
+    def _set_leader(self, leader: bool) -> None:
+        if leader != self._leader:
+            logger.info(f"scheduler leader {'acquired' if leader else 'lost'}")
+        self._leader = leader
+
+    def _close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.close()
+        except Exception as err:
+            logger.warning(f"close leader connection error: {err!r}")
+        self._conn = None
+
+    def tick(self) -> None:
+        try:
+            if self._conn is None:
+                self._conn = self.connect()
+            if self._leader:
+                # 连接还在，会话级的锁就还在
+                self._conn.execute(text("SELECT 1"))
+                acquired = True
+            else:
+                acquired = bool(
+                    self._conn.execute(
+                        text("SELECT pg_try_advisory_lock(:lock_id)"),
+                        {"lock_id": self.lock_id},
+                    ).scalar()
+                )
+        except Exception as err:
+            logger.error(f"leader election error: {err!r}")
+            self._set_leader(False)
+            self._close()
+            return
+        if acquired:
+            self._renewed_at = time.monotonic()
+        self._set_leader(acquired)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.renew_seconds)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="scheduler-leader", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        停止选举并释放锁，其他节点可以立即接管
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._conn is not None and self._leader:
+            try:
+                self._conn.execute(
+                    text("SELECT pg_advisory_unlock(:lock_id)"),
+                    {"lock_id": self.lock_id},
+                )
+            except Exception as err:
+                logger.warning(f"release leader lock error: {err!r}")
+        self._set_leader(False)
+        self._close()
+
+    def _lock_job(self, job_key: int) -> Connection | None:
+        """
+        在单独的连接上获取任务锁，拿到时返回这个连接，任务运行期间一直持有
+        """
+        try:
+            conn = self.connect()
+        except Exception as err:
+            logger.error(f"job lock connect error: {err!r}")
+            return None
+        try:
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:lock_id, :job_key)"),
+                {"lock_id": self.lock_id, "job_key": job_key},
+            ).scalar()
+        except Exception as err:
+            logger.error(f"job lock error: {err!r}")
+            acquired = False
+        if not acquired:
+            conn.close()
+            return None
+        return conn
+
+    def _unlock_job(self, conn: Connection, job_key: int) -> None:
+        try:
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:lock_id, :job_key)"),
+                {"lock_id": self.lock_id, "job_key": job_key},
+            )
+        except Exception as err:
+            logger.warning(f"release job lock error: {err!r}")
+        finally:
+            conn.close()
+
+    def guard(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        包装任务函数，只在 leader 上执行，其他节点直接跳过。
+
+        leader 只在任务开始时检查，任务运行期间 leader 可能已经切换到其他节点，
+        所以任务运行时还在单独的连接上持有这个任务的 advisory lock，新 leader
+        拿不到锁就跳过，同一个任务不会在两个节点上同时运行。
+        剩下的窗口：任务锁的连接本身断开时，数据库在 keepalive 超时后释放锁，
+        而旧节点上的任务并不知道，仍会继续运行到结束
+        """
+        job_key = _job_key(func)
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.is_leader:
+                    return None
+                conn = await run_blocking(self._lock_job, job_key)
+                if conn is None:
+                    logger.info(f"{func.__name__} is running on another node, skip")
+                    return None
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    await run_blocking(self._unlock_job, conn, job_key)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not self.is_leader:
+                return None
+            conn = self._lock_job(job_key)
+            if conn is None:
+                logger.info(f"{func.__name__} is running on another node, skip")
+                return None
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._unlock_job(conn, job_key)
+
+        return wrapper
@@ -0,0 +1,208 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from app.core.config import settings
+
+# 当前的处理阶段和文章，由 log_context 设置，所有日志都会带上
+_stage: ContextVar[str | None] = ContextVar("log_stage", default=None)
+_article_id: ContextVar[uuid.UUID | None] = ContextVar("log_article_id", default=None)
+
+# LogRecord 自带的属性，其余的（extra 传入的字段）都输出到 JSON 中
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+
+
+@contextmanager
+def log_context(
+    stage: str | None = None, article_id: uuid.UUID | None = None
+) -> Iterator[None]:
+    """
+    代码块内的日志带上 stage 和 article_id；不传的值沿用外层的
+    """
+    stage_token = _stage.set(stage) if stage is not None else None
+    article_token = _article_id.set(article_id) if article_id is not None else None
+    try:
+        yield
+    finally:
+        if stage_token is not None:
+            _stage.reset(stage_token)
+        if article_token is not None:
+            _article_id.reset(article_token)
+
+
+@contextmanager
+def log_duration(
+    logger: logging.Logger, message: str, level: int = logging.INFO, **fields: Any
+) -> Iterator[None]:
+    """
+    代码块结束时记录一条带 duration_ms 的日志
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        logger.log(level, message, extra={**fields, "duration_ms": duration_ms})
+
+
+class ContextFilter(logging.Filter):
+    """
+    在产生日志的线程中读取上下文，QueueListener 的线程里已经拿不到了
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "stage", None) is None:
+            record.stage = _stage.get()
+        if getattr(record, "article_id", None) is None:
+            record.article_id = _article_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    同一位置（logger + 行号）的 INFO 及以下日志，每 window_seconds 秒内前 burst 条全部保留，
+    之后每 rate 条保留一条，保留的记录带上 sample_rate；WARNING 及以上不采样。
+
+    计数不加锁，多线程同时写时可能略有偏差
+    """
+
+    def __init__(self, burst: int, window_seconds: float, rate: int) -> None:
+        super().__init__()
+        self.burst = burst
+        self.window_seconds = window_seconds
+        self.rate = max(rate, 1)
+        # (logger, 行号) -> [窗口开始时间, 窗口内的条数]
+        self._counts: dict[tuple[str, int], list[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        count = self._counts.get(key)
+        if count is None or now - count[0] >= self.window_seconds:
+            count = self._counts[key] = [now, 0]
+        count[1] += 1
+        seen = int(count[1])
+        if seen <= self.burst:
+            return True
+        if (seen - self.burst) % self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = record.stack_info
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    本地开发用的单行文本，extra 字段以 key=value 追加在后面
+    """
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = " ".join(
+            f"{key}={value}"
+            for key, value in record.__dict__.items()
+            if key not in _RESERVED and value is not None
+        )
+        if not fields:
+            return text
+        head, newline, rest = text.partition("\n")
+        return f"{head} {fields}{newline}{rest}"
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 默认的 prepare 会把异常格式化进 message；这里保留 exc_text，
+        # 由 listener 线程中的 formatter 单独输出
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+
+def setup_logging() -> None:
+    """
+    根 logger 只把日志放进队列，由 QueueListener 的后台线程格式化并写到 stdout，
+    写日志不会阻塞事件循环和处理任务；重复调用不会重复注册
+    """
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter())
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    if settings.LOG_SAMPLE_RATE > 1:
+        handler.addFilter(
+            SamplingFilter(
+                burst=settings.LOG_SAMPLE_BURST,
+                window_seconds=settings.LOG_SAMPLE_WINDOW_SECONDS,
+                rate=settings.LOG_SAMPLE_RATE,
+            )
+        )
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    # uvicorn 自己配置了 handler，统一改为经过队列输出
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """
+    写完队列中剩余的日志
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, MetricFamily
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    检测事件循环被阻塞的情况。
+
+    事件循环每 interval 秒更新一次心跳，监控线程发现心跳超过 threshold 秒没有
+    更新时，抓取事件循环线程当前的调用栈并记录日志，每次阻塞只记录一次。
+    """
+
+    def __init__(self, threshold: float, interval: float, max_stalls: int = 20) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls_total = 0
+        self.max_lag = 0.0
+        self.recent_stalls: deque[dict[str, Any]] = deque(maxlen=max_stalls)
+        self._beat = time.monotonic()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _heartbeat(self) -> None:
+        now = time.monotonic()
+        lag = now - self._beat - self.interval
+        if lag > self.max_lag:
+            self.max_lag = lag
+        self._beat = now
+        assert self._loop is not None
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+
+    def _capture_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame))
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self._beat
+            if lag <= self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            # 阻塞还在进行，此时的调用栈就是阻塞事件循环的代码
+            reported = True
+            stack = self._capture_stack()
+            self.stalls_total += 1
+            self.recent_stalls.append(
+                {"at": time.time(), "lag_seconds": round(lag, 3), "stack": stack}
+            )
+            logger.warning(f"event loop blocked for {lag:.3f}s\n{stack}")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "threshold_seconds": self.threshold,
+            "stalls_total": self.stalls_total,
+            "max_lag_seconds": round(self.max_lag, 3),
+            "recent_stalls": list(self.recent_stalls),
+        }
+
+
+loop_monitor = LoopLagMonitor(
+    threshold=settings.LOOP_LAG_THRESHOLD_SECONDS,
+    interval=settings.LOOP_LAG_INTERVAL_SECONDS,
+)
+
+
+def _collect_loop_lag() -> Iterator[MetricFamily]:
+    yield (
+        "event_loop_stalls_total",
+        "counter",
+        "Times the event loop was blocked longer than the threshold.",
+        [("", {}, loop_monitor.stalls_total)],
+    )
+    yield (
+        "event_loop_max_lag_seconds",
+        "gauge",
+        "Largest event loop heartbeat delay seen.",
+        [("", {}, loop_monitor.max_lag)],
+    )
+
+
+REGISTRY.register_collector(_collect_loop_lag)
@@ -0,0 +1,396 @@
+import asyncio
+import bisect
+import functools
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.log import log_context, log_duration
+
+logger = logging.getLogger(__name__)
+
+# 记录是在请求和任务的热路径上，所以不加锁：每个线程写自己的分片，
+# 读取（抓取 /metrics）时把所有分片加起来。单个分片只被一个线程写，不会丢失更新。
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+F = TypeVar("F", bound=Callable[..., Any])
+LabelValues = tuple[str, ...]
+# (名称后缀, 标签, 值)
+Sample = tuple[str, dict[str, str], float]
+# (名称, 类型, 说明, 样本)
+MetricFamily = tuple[str, str, str, Iterable[Sample]]
+Collector = Callable[[], Iterable[MetricFamily]]
+
+
+class _Shards:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._local = threading.local()
+        self._all: list[list[float]] = []
+        self._lock = threading.Lock()
+
+    def local(self) -> list[float]:
+        values = getattr(self._local, "values", None)
+        if values is None:
+            # 每个线程只在第一次写入时加锁登记
+            values = [0.0] * self.size
+            with self._lock:
+                self._all.append(values)
+            self._local.values = values
+        return values
+
+    def sum(self) -> list[float]:
+        with self._lock:
+            shards = list(self._all)
+        total = [0.0] * self.size
+        for values in shards:
+            for i, value in enumerate(values):
+                total[i] += value
+        return total
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[LabelValues, _Shards] = {}
+
+    def _shard_size(self) -> int:
+        return 1
+
+    def _shards(self, labelvalues: LabelValues) -> _Shards:
+        shards = self._children.get(labelvalues)
+        if shards is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            shards = self._children.setdefault(labelvalues, _Shards(self._shard_size()))
+        return shards
+
+    def _labels(self, labelvalues: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labelnames, labelvalues, strict=True))
+
+    def samples(self) -> Iterator[Sample]:
+        for labelvalues, shards in list(self._children.items()):
+            yield "", self._labels(labelvalues), shards.sum()[0]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._shards(labelvalues).local()[0] += amount
+
+
+class Gauge(_Metric):
+    """
+    可以增减的值；分片相加，所以 inc/dec 可以在不同线程中配对调用
+    """
+
+    type = "gauge"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._shards(labelvalues).local()[0] += amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._shards(labelvalues).local()[0] -= amount
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _shard_size(self) -> int:
+        # 每个桶的计数（不累加）、+Inf、sum
+        return len(self.buckets) + 2
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        values = self._shards(labelvalues).local()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def samples(self) -> Iterator[Sample]:
+        for labelvalues, shards in list(self._children.items()):
+            values = shards.sum()
+            labels = self._labels(labelvalues)
+            cumulative = 0.0
+            for bound, count in zip(
+                (*self.buckets, math.inf), values[:-1], strict=True
+            ):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format_value(bound)
+                yield "_bucket", {**labels, "le": le}, cumulative
+            yield "_count", labels, cumulative
+            yield "_sum", labels, values[-1]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        # 抓取时才计算的指标，返回 (名称, 类型, 说明, 样本)
+        self._collectors: list[Collector] = []
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.register(metric)
+        return metric
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def _families(self) -> Iterator[MetricFamily]:
+        for metric in list(self._metrics.values()):
+            yield metric.name, metric.type, metric.documentation, metric.samples()
+        for collector in self._collectors:
+            try:
+                yield from collector()
+            except Exception as err:
+                # 某个指标取不到不影响其他指标
+                yield (
+                    "metrics_collector_errors",
+                    "gauge",
+                    f"Collector {collector.__name__} failed: {err!r}",
+                    [("", {"collector": collector.__name__}, 1)],
+                )
+
+    def render(self) -> str:
+        """
+        Prometheus 文本格式（0.0.4）
+        """
+        lines = []
+        for name, metric_type, documentation, samples in self._families():
+            lines.append(f"# HELP {name} {_escape_help(documentation)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(
+                    f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+        value = value.replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_requests_in_flight = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+)
+http_request_duration_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by operation id.",
+    ["operation", "method", "status"],
+)
+http_response_size_bytes = REGISTRY.histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by operation id.",
+    ["operation"],
+    buckets=SIZE_BUCKETS,
+)
+http_db_queries = REGISTRY.histogram(
+    "http_db_queries",
+    "SQL statements executed per HTTP request by operation id.",
+    ["operation"],
+    buckets=COUNT_BUCKETS,
+)
+http_db_duration_seconds = REGISTRY.histogram(
+    "http_db_duration_seconds",
+    "Total time spent in SQL statements per HTTP request by operation id.",
+    ["operation"],
+)
+http_db_repeated_queries_total = REGISTRY.counter(
+    "http_db_repeated_queries_total",
+    "HTTP requests that executed the same statement repeatedly (N+1 queries).",
+    ["operation"],
+)
+pipeline_items_total = REGISTRY.counter(
+    "pipeline_items_total",
+    "Articles picked, succeeded and failed by pipeline stage.",
+    ["stage", "result"],
+)
+pipeline_stage_duration_seconds = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of one run of a pipeline stage.",
+    ["stage"],
+)
+
+
+class MetricsMiddleware:
+    """
+    记录每个路由的耗时、响应大小和正在处理的请求数；
+    路由用 operation id（custom_generate_unique_id）区分，未匹配的请求归为 unmatched，
+    避免标签数量随 URL 增长
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        size = 0
+        content_length: int | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size, content_length
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", []):
+                    if key.lower() == b"content-length":
+                        content_length = int(value)
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            operation = getattr(route, "unique_id", None) or "unmatched"
+            http_request_duration_seconds.observe(
+                time.perf_counter() - start, operation, scope["method"], str(status)
+            )
+            # sendfile/pathsend 发送的文件不经过 body 消息，用 Content-Length
+            if content_length is not None:
+                size = max(size, content_length)
+            http_response_size_bytes.observe(size, operation)
+
+
+def timed_stage(stage: str) -> Callable[[F], F]:
+    """
+    装饰流水线阶段函数（同步或异步），记录每次运行的耗时；
+    运行期间的日志都带上 stage，结束时记录一条带 duration_ms 的日志
+    """
+
+    @contextmanager
+    def timed() -> Iterator[None]:
+        with (
+            log_context(stage=stage),
+            log_duration(logger, f"{stage} finished"),
+            pipeline_stage_duration_seconds.time(stage),
+        ):
+            yield
+
+    def decorator(func: F) -> F:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with timed():
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timed():
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def record_items(stage: str, result: str, count: int = 1) -> None:
+    """
+    result 为 picked、succeeded 或 failed
+    """
+    if count:
+        pipeline_items_total.inc(stage, result, amount=count)
@@ -0,0 +1,394 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+from pydantic import ValidationError
+from sqlmodel import Session
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import security
+from app.core.blocking import run_blocking
+from app.core.config import settings
+from app.core.db import engine
+from app.models import ProfilingReport, ProfilingRule, TokenPayload, User
+
+try:
+    import pyinstrument  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # 没有安装 pyinstrument 时使用 cProfile
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# X-Profile 请求头或 profile 查询参数的取值：return 用报告替换响应，store 保存报告
+MODE_RETURN = "return"
+MODE_STORE = "store"
+_MODES = {
+    "1": MODE_RETURN,
+    "true": MODE_RETURN,
+    MODE_RETURN: MODE_RETURN,
+    MODE_STORE: MODE_STORE,
+}
+
+RULES_FILE = "rules.json"
+# 多个 API 进程共用规则文件，每个进程最多每秒检查一次文件是否有变化
+RULES_RELOAD_SECONDS = 1.0
+
+
+class _CProfileProfiler:
+    suffix = ".txt"
+    media_type = "text/plain; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def render(self) -> bytes:
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(100)
+        return stream.getvalue().encode()
+
+
+class _PyinstrumentProfiler:
+    suffix = ".html"
+    media_type = "text/html; charset=utf-8"
+
+    def __init__(self) -> None:
+        # async_mode 只统计当前请求所在的 task，其他并发请求不会混进报告
+        self._profiler = pyinstrument.Profiler(async_mode="enabled")
+
+    def start(self) -> None:
+        self._profiler.start()
+
+    def stop(self) -> None:
+        self._profiler.stop()
+
+    def render(self) -> bytes:
+        html: str = self._profiler.output_html()
+        return html.encode()
+
+
+def new_profiler() -> Any:
+    """
+    优先使用采样式的 pyinstrument（火焰图 HTML），没有安装时退回 cProfile（文本）。
+
+    两者都只分析事件循环线程：同步路由在线程池中执行的时间显示为等待；
+    cProfile 还会统计同一时间在事件循环上运行的其他请求
+    """
+    if pyinstrument is not None:
+        return _PyinstrumentProfiler()
+    return _CProfileProfiler()
+
+
+def _profiles_dir() -> Path:
+    return Path(settings.PROFILING_DIR)
+
+
+class ProfilingRules:
+    """
+    按路由采样的规则，保存在 PROFILING_DIR 下的 JSON 文件中，同一台机器上的
+    所有 API 进程都能读到；规则到期后自动失效
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._rules: dict[str, dict[str, float]] = {}
+        self._mtime: float | None = None
+        self._checked_at = 0.0
+
+    @property
+    def path(self) -> Path:
+        return self._path or _profiles_dir() / RULES_FILE
+
+    def _load(self) -> None:
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._rules, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._rules = json.loads(self.path.read_text())
+        except (OSError, ValueError) as err:
+            logger.warning(f"read profiling rules error: {err!r}")
+            self._rules = {}
+        self._mtime = mtime
+
+    def active(self) -> dict[str, dict[str, float]]:
+        now = time.monotonic()
+        if now - self._checked_at >= RULES_RELOAD_SECONDS:
+            self._checked_at = now
+            self._load()
+        wall = time.time()
+        return {
+            operation: rule
+            for operation, rule in self._rules.items()
+            if rule["expires_at"] > wall
+        }
+
+    def _save(self, rules: dict[str, dict[str, float]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(rules))
+        os.replace(tmp, self.path)
+        # 下一次 active() 立即重新读取
+        self._checked_at = 0.0
+
+    def list_rules(self) -> list[ProfilingRule]:
+        self._checked_at = 0.0
+        return [
+            ProfilingRule(
+                operation=operation,
+                percent=rule["percent"],
+                expires_at=datetime.fromtimestamp(rule["expires_at"]),
+            )
+            for operation, rule in sorted(self.active().items())
+        ]
+
+    def set_rule(
+        self, operation: str, percent: float, duration_seconds: int
+    ) -> ProfilingRule:
+        self._checked_at = 0.0
+        rules = self.active()
+        expires_at = time.time() + duration_seconds
+        rules[operation] = {"percent": percent, "expires_at": expires_at}
+        self._save(rules)
+        return ProfilingRule(
+            operation=operation,
+            percent=percent,
+            expires_at=datetime.fromtimestamp(expires_at),
+        )
+
+    def delete_rule(self, operation: str) -> bool:
+        self._checked_at = 0.0
+        rules = self.active()
+        if rules.pop(operation, None) is None:
+            return False
+        self._save(rules)
+        return True
+
+
+profiling_rules = ProfilingRules()
+
+
+def _report_path(name: str) -> Path | None:
+    # 只接受目录下的文件名，防止路径穿越
+    if not name or Path(name).name != name or name == RULES_FILE:
+        return None
+    path = _profiles_dir() / name
+    return path if path.is_file() else None
+
+
+def save_report(name: str, content: bytes) -> None:
+    directory = _profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_bytes(content)
+    # 只保留最近的 PROFILING_MAX_REPORTS 个报告
+    reports = sorted(
+        (path for path in directory.iterdir() if path.suffix in (".html", ".txt")),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for path in reports[settings.PROFILING_MAX_REPORTS :]:
+        path.unlink(missing_ok=True)
+
+
+def list_reports() -> list[ProfilingReport]:
+    directory = _profiles_dir()
+    if not directory.is_dir():
+        return []
+    reports = []
+    for path in directory.iterdir():
+        if path.suffix not in (".html", ".txt"):
+            continue
+        stat = path.stat()
+        reports.append(
+            ProfilingReport(
+                name=path.name,
+                size=stat.st_size,
+                created_at=datetime.fromtimestamp(stat.st_mtime),
+            )
+        )
+    return sorted(reports, key=lambda report: report.created_at, reverse=True)
+
+
+def read_report(name: str) -> tuple[bytes, str] | None:
+    path = _report_path(name)
+    if path is None:
+        return None
+    media_type = _CProfileProfiler.media_type
+    if path.suffix == _PyinstrumentProfiler.suffix:
+        media_type = _PyinstrumentProfiler.media_type
+    return path.read_bytes(), media_type
+
+
+def _report_name(operation: str, suffix: str) -> str:
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{operation}-{uuid.uuid4().hex[:8]}{suffix}"
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return bytes(value).decode("latin-1")
+    return None
+
+
+def _requested_mode(scope: Scope) -> str | None:
+    value = _header(scope, b"x-profile")
+    query_string = scope.get("query_string", b"")
+    if value is None and b"profile=" in query_string:
+        values = parse_qs(query_string.decode("latin-1")).get("profile")
+        value = values[-1] if values else None
+    if value is None:
+        return None
+    return _MODES.get(value.strip().lower())
+
+
+def is_superuser_token(authorization: str | None) -> bool:
+    """
+    与 get_current_active_superuser 相同的校验，只在请求带了分析标记时执行
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        token_data = TokenPayload(**payload)
+    except (InvalidTokenError, ValidationError):
+        return False
+    with Session(engine) as session:
+        user = session.get(User, token_data.sub)
+        return bool(user and user.is_active and user.is_superuser)
+
+
+class ProfilingMiddleware:
+    """
+    超级用户带 X-Profile 请求头（或 profile 查询参数）的请求，以及命中采样规则的请求，
+    在分析器下执行。同一时间只分析一个请求，其他请求照常处理。
+
+    X-Profile: 1 / return 时响应替换为分析报告，原状态码放在 X-Profiled-Status 中；
+    X-Profile: store 和采样的请求保存报告，响应头 X-Profile-Report 为报告名称
+    """
+
+    def __init__(self, app: ASGIApp, rules: ProfilingRules | None = None) -> None:
+        self.app = app
+        self.rules = rules or profiling_rules
+        self._busy = False
+
+    def _sampled_operation(self, scope: Scope) -> str | None:
+        rules = self.rules.active()
+        if not rules:
+            return None
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", []):
+            operation: str | None = getattr(route, "unique_id", None)
+            if operation is None or operation not in rules:
+                continue
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                if random.random() * 100 < rules[operation]["percent"]:
+                    return operation
+                return None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+        operation = "request"
+        mode = _requested_mode(scope)
+        if mode is not None and not await run_blocking(
+            is_superuser_token, _header(scope, b"authorization")
+        ):
+            mode = None
+        if mode is None:
+            sampled = self._sampled_operation(scope)
+            if sampled is None:
+                await self.app(scope, receive, send)
+                return
+            mode, operation = MODE_STORE, sampled
+        if self._busy:
+            await self.app(scope, receive, send)
+            return
+        if mode == MODE_RETURN:
+            await self._return_report(scope, receive, send)
+        else:
+            await self._store_report(scope, receive, send, operation)
+
+    async def _profile(
+        self, profiler: Any, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        self._busy = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self._busy = False
+
+    async def _return_report(self, scope: Scope, receive: Receive, send: Send) -> None:
+        status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = new_profiler()
+        await self._profile(profiler, scope, receive, discard)
+        body = await run_blocking(profiler.render)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", profiler.media_type.encode()),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profiled-status", str(status).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _store_report(
+        self, scope: Scope, receive: Receive, send: Send, operation: str
+    ) -> None:
+        profiler = new_profiler()
+        name = _report_name(operation, profiler.suffix)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-report", name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self._profile(profiler, scope, receive, send_wrapper)
+        finally:
+            try:
+                body = await run_blocking(profiler.render)
+                await run_blocking(save_report, name, body)
+            except Exception as err:
+                logger.error(f"save profile {name} error: {err!r}")
@@ -0,0 +1,160 @@
+"""
+统计每个请求执行的 SQL 语句数和数据库耗时，找出重复执行的同一条语句（N+1 查询）
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import (
+    http_db_duration_seconds,
+    http_db_queries,
+    http_db_repeated_queries_total,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        # 参数化的语句文本，参数不同的同一条查询算作重复
+        self.statements: Counter[str] = Counter()
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """
+        执行次数达到 threshold 的语句
+        """
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= threshold
+        }
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+# 同步路由和依赖在线程池中运行时会复制上下文，拿到的是同一个 QueryStats
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# 统计所有线程的语句，用于测试和压测（TestClient 在另一个线程里处理请求）
+_all_threads: list[QueryStats] = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def track_queries(*, all_threads: bool = False) -> Iterator[QueryStats]:
+    """
+    统计代码块中执行的语句；all_threads 为 True 时也统计其他线程执行的语句
+    """
+    stats = QueryStats()
+    if all_threads:
+        with _lock:
+            _all_threads.append(stats)
+        try:
+            yield stats
+        finally:
+            with _lock:
+                _all_threads.remove(stats)
+        return
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def instrument_engine(engine: Any) -> None:
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn: Any, *_args: Any) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(
+        conn: Any, _cursor: Any, statement: str, *_args: Any
+    ) -> None:
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.add(statement, seconds)
+        for stats in _all_threads:
+            stats.add(statement, seconds)
+
+    def handle_error(context: Any) -> None:
+        started = (
+            context.connection.info.get("query_started") if context.connection else None
+        )
+        if started:
+            started.pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+class QueryStatsMiddleware:
+    """
+    在 Server-Timing 响应头中返回请求的语句数和数据库耗时，并按路由记录到指标中；
+    同一条语句执行次数达到 DB_REPEATED_QUERY_THRESHOLD 时记录一条警告
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    # 流式响应之后执行的语句不包括在内
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", stats.server_timing()
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._record(scope, stats)
+
+    def _record(self, scope: Scope, stats: QueryStats) -> None:
+        route = scope.get("route")
+        operation = getattr(route, "unique_id", None) or "unmatched"
+        http_db_queries.observe(stats.count, operation)
+        http_db_duration_seconds.observe(stats.seconds, operation)
+        repeated = stats.repeated(settings.DB_REPEATED_QUERY_THRESHOLD)
+        if not repeated:
+            return
+        http_db_repeated_queries_total.inc(operation)
+        for statement, count in repeated.items():
+            logger.warning(
+                "statement executed %d times in one request",
+                count,
+                extra={
+                    "operation": operation,
+                    "statement": statement[:1000],
+                    "queries": stats.count,
+                },
+            )
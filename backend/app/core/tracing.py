@@ -0,0 +1,304 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from app.core.config import settings
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import Link, NonRecordingSpan, SpanContext, TraceFlags
+    from opentelemetry.trace.status import StatusCode
+except ImportError:  # 没有安装 opentelemetry-sdk 时所有 span 都是空操作
+    trace = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_tracer: Any = None
+_provider: Any = None
+
+
+if trace is not None:
+
+    class JsonFileSpanExporter(SpanExporter):
+        """
+        每个 span 一行 JSON 追加到本地文件，不依赖 collector，离线也能查看
+        """
+
+        def __init__(self, path: str) -> None:
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+            lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+            try:
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError as err:
+                logger.error(f"export spans error: {err!r}")
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            pass
+
+    class TailSamplingProcessor(SpanProcessor):
+        """
+        按 trace 缓存结束的 span，本地根 span 结束时决定整条 trace 是否导出：
+        有错误、耗时超过 slow_seconds 的 trace 总是保留，其余按 ratio 采样。
+
+        ratio 用 trace id 的高 64 位决定，同一篇文章在各个阶段的决定一致，
+        并且与头部采样（使用低 64 位）互相独立。
+        """
+
+        def __init__(
+            self,
+            delegate: SpanProcessor,
+            ratio: float,
+            slow_seconds: float,
+            max_traces: int = 10000,
+        ) -> None:
+            self.delegate = delegate
+            self.bound = int(ratio * (1 << 64))
+            self.slow_ns = int(slow_seconds * 1e9)
+            self.max_traces = max_traces
+            self._traces: OrderedDict[int, list[ReadableSpan]] = OrderedDict()
+            self._lock = threading.Lock()
+
+        def on_start(self, span: Any, parent_context: Any = None) -> None:
+            self.delegate.on_start(span, parent_context=parent_context)
+
+        def _keep(self, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+            if (root.context.trace_id >> 64) < self.bound:
+                return True
+            if root.end_time and root.start_time:
+                if root.end_time - root.start_time >= self.slow_ns:
+                    return True
+            return any(span.status.status_code == StatusCode.ERROR for span in spans)
+
+        def on_end(self, span: ReadableSpan) -> None:
+            trace_id = span.context.trace_id
+            is_local_root = span.parent is None or span.parent.is_remote
+            with self._lock:
+                spans = self._traces.setdefault(trace_id, [])
+                spans.append(span)
+                if is_local_root:
+                    del self._traces[trace_id]
+                elif len(self._traces) > self.max_traces:
+                    # 根 span 一直没有结束的 trace，丢弃最早的
+                    self._traces.popitem(last=False)
+            if is_local_root and self._keep(span, spans):
+                for item in spans:
+                    self.delegate.on_end(item)
+
+        def shutdown(self) -> None:
+            self.delegate.shutdown()
+
+        def force_flush(self, timeout_millis: int = 30000) -> bool:
+            return self.delegate.force_flush(timeout_millis)
+
+
+def _exporter() -> Any:
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    return JsonFileSpanExporter(settings.TRACING_FILE_PATH)
+
+
+def setup_tracing(service_name: str) -> None:
+    """
+    按配置初始化 tracer；未开启或没有安装 opentelemetry-sdk 时什么都不做
+    """
+    global _tracer, _provider
+    if not settings.TRACING_ENABLED or _tracer is not None:
+        return
+    if trace is None:
+        logger.warning("opentelemetry-sdk is not installed, tracing disabled")
+        return
+    # 头部采样：按 trace id 决定是否记录；文章的 trace id 固定，各阶段的决定一致
+    head = TraceIdRatioBased(settings.TRACING_HEAD_SAMPLE_RATIO)
+    sampler = ParentBased(
+        root=head, remote_parent_sampled=head, remote_parent_not_sampled=head
+    )
+    provider = TracerProvider(
+        sampler=sampler,
+        resource=Resource.create({"service.name": service_name}),
+    )
+    processor: SpanProcessor = BatchSpanProcessor(_exporter())
+    if settings.TRACING_TAIL_SAMPLE_RATIO < 1:
+        processor = TailSamplingProcessor(
+            processor,
+            ratio=settings.TRACING_TAIL_SAMPLE_RATIO,
+            slow_seconds=settings.TRACING_TAIL_SLOW_SECONDS,
+        )
+    provider.add_span_processor(processor)
+    _provider = provider
+    _tracer = provider.get_tracer("app")
+
+    from app.core.db import engine
+
+    instrument_engine(engine)
+
+
+def shutdown_tracing() -> None:
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+
+def article_trace_id(article_id: uuid.UUID) -> int:
+    """
+    由文章 id 的 hash 得到 trace id。uuid4 中固定的版本位和变体位会让按 trace id
+    采样的比例失真（低 64 位总是大于 2**63），hash 之后的每一位都是均匀的
+    """
+    return int.from_bytes(hashlib.sha256(article_id.bytes).digest()[:16], "big")
+
+
+def _article_span_context(article_id: uuid.UUID) -> Any:
+    """
+    同一篇文章在抓取、解析、聚合、生成音频各阶段的 span 属于同一条 trace，
+    trace id 由文章 id 得到，跨进程也不需要传递上下文
+    """
+    trace_id = article_trace_id(article_id)
+    return SpanContext(
+        trace_id=trace_id,
+        span_id=(trace_id & 0xFFFFFFFFFFFFFFFF) or 1,
+        is_remote=True,
+        trace_flags=TraceFlags(TraceFlags.SAMPLED),
+    )
+
+
+def _links(article_ids: Iterable[uuid.UUID]) -> list[Any]:
+    links = [Link(_article_span_context(article_id)) for article_id in article_ids]
+    # 链接到当前的阶段 span，方便从文章 trace 找到是哪一次运行处理的
+    current = trace.get_current_span().get_span_context()
+    if current.is_valid:
+        links.append(Link(current))
+    return links
+
+
+@contextmanager
+def start_span(
+    name: str,
+    attributes: dict[str, Any] | None = None,
+    *,
+    article_id: uuid.UUID | None = None,
+    links: Iterable[uuid.UUID] = (),
+) -> Iterator[Any]:
+    """
+    创建 span；传入 article_id 时 span 放在这篇文章的 trace 中，
+    links 中的文章 trace 会作为链接（例如聚合文章的来源）
+    """
+    if _tracer is None:
+        yield None
+        return
+    context = None
+    if article_id is not None:
+        context = trace.set_span_in_context(
+            NonRecordingSpan(_article_span_context(article_id))
+        )
+    span_links = _links(links) if article_id is not None or links else None
+    with _tracer.start_as_current_span(
+        name, context=context, attributes=attributes, links=span_links
+    ) as span:
+        yield span
+
+
+def set_attributes(span: Any, attributes: dict[str, Any]) -> None:
+    """
+    span 为 None（未开启追踪）时什么都不做，值为 None 的属性会被忽略
+    """
+    if span is not None:
+        span.set_attributes(
+            {key: value for key, value in attributes.items() if value is not None}
+        )
+
+
+def set_error(span: Any, description: str) -> None:
+    """
+    没有抛出异常的失败也标记为错误，尾部采样会保留这条 trace
+    """
+    if span is not None:
+        span.set_status(StatusCode.ERROR, description)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    装饰同步或异步函数，每次调用创建一个 span
+    """
+
+    def decorator(func: F) -> F:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with start_span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with start_span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def instrument_engine(engine: Any) -> None:
+    """
+    为每条 SQL 创建 span
+    """
+    from sqlalchemy import event
+
+    def before_cursor_execute(
+        conn: Any, _cursor: Any, statement: str, *_args: Any
+    ) -> None:
+        if _tracer is None:
+            return
+        span = _tracer.start_span(
+            "db.query",
+            attributes={"db.system": "postgresql", "db.statement": statement[:1000]},
+        )
+        conn.info.setdefault("otel_spans", []).append(span)
+
+    def after_cursor_execute(conn: Any, *_args: Any) -> None:
+        spans = conn.info.get("otel_spans")
+        if spans:
+            spans.pop().end()
+
+    def handle_error(context: Any) -> None:
+        spans = (
+            context.connection.info.get("otel_spans") if context.connection else None
+        )
+        if spans:
+            span = spans.pop()
+            span.record_exception(context.original_exception)
+            span.set_status(StatusCode.ERROR)
+            span.end()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
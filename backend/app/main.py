@@ -1,91 +1,45 @@
-# from apscheduler.triggers.cron import CronTrigger
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 import sentry_sdk
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
+from app.api.routes import audio, metrics, profiling
 from app.core.config import settings
-from app.services.article import (
-    generate_audio,
-)
-
-# 初始化调度器
-scheduler = AsyncIOScheduler()
-
-
-# 配置任务
-def configure_scheduler():
-    # 每 10 秒执行一次（同步任务）
-    # scheduler.add_job(
-    #     crawl_content,
-    #     trigger=IntervalTrigger(seconds=20),
-    #     id="crawl_content",
-    #     max_instances=1,  # 确保同一时间只有一个任务实例在运行
-    #     coalesce=True,    # 如果错过了执行时间，只运行一次
-    #     kwargs={'limit': 1},
-    # )
-
-    # scheduler.add_job(
-    #     ai_parse_content,
-    #     trigger=IntervalTrigger(seconds=10),
-    #     id="ai_parse_content",
-    #     max_instances=1,  # 确保同一时间只有一个任务实例在运行
-    #     coalesce=True,    # 如果错过了执行时间，只运行一次
-    #     kwargs={'limit': 1},
-    # )
-
-    # scheduler.add_job(
-    #     aggregate_by_tag,
-    #     trigger=IntervalTrigger(seconds=10),
-    #     id="aggregate_by_tag",
-    #     max_instances=1,  # 确保同一时间只有一个任务实例在运行
-    #     coalesce=True,    # 如果错过了执行时间，只运行一次
-    # )
-
-    scheduler.add_job(
-        generate_audio,
-        trigger=IntervalTrigger(seconds=20),
-        id="generate_audio",
-        max_instances=1,  # 确保同一时间只有一个任务实例在运行
-        coalesce=True,  # 如果错过了执行时间，只运行一次
-    )
-
-    # # 每天 8:30 执行一次（异步任务）
-    # scheduler.add_job(
-    #     async_cron_task,
-    #     trigger=CronTrigger(hour=8, minute=30),
-    #     id="cron_job",
-    # )
+from app.core.log import setup_logging
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.queries import QueryStatsMiddleware
+from app.core.tracing import setup_tracing
+from app.services import task
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+setup_logging()
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
-    sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
+    sentry_sdk.init(
+        dsn=str(settings.SENTRY_DSN),
+        traces_sample_rate=settings.SENTRY_TRACES_SAMPLE_RATE,
+    )
+setup_tracing("backend")
 
 
 # 定义 FastAPI 生命周期管理器
 @asynccontextmanager
-async def lifespan():
-    # 启动时逻辑
-    print("Starting scheduler...")
-    configure_scheduler()
-    scheduler.start()
+async def lifespan(_app: FastAPI):
+    # 多个 API 进程时关闭 SCHEDULER_ENABLED，由 app.worker 单独运行定时任务
+    await task.startup(run_scheduler=settings.SCHEDULER_ENABLED)
     try:
         yield  # 保持运行直到应用关闭
     finally:
-        # 关闭时逻辑
-        print("Shutting down scheduler...")
-        scheduler.shutdown()
+        await task.shutdown()
 
 
 app = FastAPI(
@@ -106,7 +60,21 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
+
+if settings.DB_QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+# 关闭时不注册中间件和路由，请求路径上没有额外开销
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(profiling.router, prefix=settings.API_V1_STR)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# 音频走专门的路由，需要在 StaticFiles 之前注册
+app.include_router(audio.router)
 
 
 current_dir = Path(__file__).parent
@@ -1,5 +1,5 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 from pydantic import AnyHttpUrl, EmailStr, field_validator
 from sqlalchemy import String
@@ -186,6 +186,29 @@ class Article(ArticleBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     created_at: datetime = Field(default=datetime.now())
     updated_at: datetime = Field(default=datetime.now())
+    # 以下字段由抓取和处理流程写入，不接受客户端提交
+    # 音频时长（秒），转码完成后写入；转码失败时为 0
+    audio_duration: float | None = Field(default=None)
+    # 已生成的压缩版本，如 opus、m4a
+    audio_renditions: list[str] | None = Field(
+        default=[], sa_column=Column(ARRAY(String(20)))
+    )
+    # 抓取时页面返回的缓存校验信息，重新抓取时用于条件请求
+    etag: str | None = Field(default=None, max_length=255)
+    last_modified: str | None = Field(default=None, max_length=255)
+    # content 的 sha256，内容没有变化时跳过后续的 AI 处理
+    content_sha256: str | None = Field(default=None, max_length=64)
+    # 预处理前后 content 的估算 token 数
+    raw_tokens: int | None = Field(default=None)
+    content_tokens: int | None = Field(default=None)
+
+
+class ArticlePublic(ArticleBase):
+    id: uuid.UUID
+    created_at: datetime
+    updated_at: datetime
+    audio_duration: float | None = None
+    audio_renditions: list[str] | None = None
 
 
 class ArticleUpdate(ArticleBase):
@@ -197,10 +220,70 @@ class ArticleCreate(ArticleBase):
 
 
 class Articles(SQLModel):
-    data: list[Article]
+    data: list[ArticlePublic]
     count: int
 
 
 class ArticlesUpdate(SQLModel):
     data: list[ArticleUpdate]
     count: int
+
+
+# 每次 LLM 请求的记录，只追加不修改
+class LLMCall(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+    model: str = Field(max_length=100)
+    # parse_content、parse_chunk、parse_merge、tag_aggregate 等
+    stage: str = Field(default="", max_length=50)
+    article_id: uuid.UUID | None = Field(default=None, index=True)
+    # 0 表示网络错误或超时
+    status_code: int
+    milliseconds: int
+    prompt_tokens: int | None = Field(default=None)
+    completion_tokens: int | None = Field(default=None)
+    cached_tokens: int | None = Field(default=None)
+    cache_hit: bool = False
+
+
+class LLMLatencyStats(SQLModel):
+    model: str
+    stage: str
+    calls: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+
+
+class LLMTokenUsage(SQLModel):
+    day: date
+    model: str
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+
+
+class LLMCallSummary(SQLModel):
+    days: int
+    latency: list[LLMLatencyStats]
+    tokens: list[LLMTokenUsage]
+
+
+class ProfilingRuleCreate(SQLModel):
+    # 路由的 operation id，与 http_request_duration_seconds 的 operation 标签相同
+    operation: str = Field(min_length=1, max_length=255)
+    percent: float = Field(gt=0, le=100)
+    duration_seconds: int = Field(gt=0, le=86400)
+
+
+class ProfilingRule(SQLModel):
+    operation: str
+    percent: float
+    expires_at: datetime
+
+
+class ProfilingReport(SQLModel):
+    name: str
+    size: int
+    created_at: datetime
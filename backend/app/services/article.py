@@ -1,22 +1,40 @@
+import asyncio
+import hashlib
+import logging
 import uuid
+from collections.abc import Iterator
 from datetime import datetime, timedelta
 from typing import Any
 
-from crawl4ai import AsyncWebCrawler
 from sqlalchemy import or_  # 添加这个导入
-from sqlmodel import Session, create_engine, desc, func, select
+from sqlmodel import Session, col, desc, func, select
 
 from app.api.deps import SessionDep
+from app.core.blocking import run_blocking
+from app.core.breaker import OPEN, tts_breaker
 from app.core.config import settings
-from app.models import Article, ArticleCreate, Articles, ArticleUpdate
+from app.core.db import engine
+from app.core.log import log_context
+from app.core.metrics import REGISTRY, MetricFamily, record_items, timed_stage
+from app.core.tracing import set_error, start_span, traced
+from app.models import Article, ArticleCreate, ArticlePublic, Articles, ArticleUpdate
+from app.services.crawler import FetchResult, fetch_markdown
 from app.services.llm import (
+    count_tokens,
     deal_content_parse_ret,
     get_content_parse_system_prompt,
     get_tag_aggregate_system_prompt,
-    request_ai,
+    llm_available,
+    parse_long_content,
+    request_ai_with_fallback,
+    request_ai_with_fallback_sync,
 )
+from app.services.llm_usage import llm_call_context
+from app.services.markdown import clean_markdown
 from app.services.tts import bk_tts
 
+logger = logging.getLogger(__name__)
+
 
 def get_articles(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
     """
@@ -28,7 +46,9 @@ def get_articles(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
         select(Article).order_by(desc(Article.created_at)).offset(skip).limit(limit)
     )
     items = session.exec(statement).all()
-    return Articles(data=items, count=count)
+    return Articles(
+        data=[ArticlePublic.model_validate(item) for item in items], count=count
+    )
 
 
 def create_article(*, session: SessionDep, article_in: ArticleCreate) -> Any:
@@ -72,55 +92,137 @@ def query_article(session: SessionDep, url: str = "", day: str = "") -> Article:
     return session.exec(statement).first()
 
 
+def _save_crawl_result(
+    session: Session, article_id: uuid.UUID, url: str, result: FetchResult
+) -> Article | None:
+    """
+    清理抓取结果并写入数据库；包含正则清理、哈希和数据库操作，在线程中执行
+    """
+    # 直接通过 ID 获取文章实例
+    article = session.get(Article, article_id)
+    if not article:
+        return None
+    # 在本地去掉图片、链接、代码块、表格等，减少交给 LLM 的 token
+    content = clean_markdown(result.markdown)
+    content_sha256 = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    article.is_active = True
+    article.etag = result.etag
+    article.last_modified = result.last_modified
+    article.updated_at = datetime.now()
+    if result.not_modified or content_sha256 == article.content_sha256:
+        # 内容没有变化，保留已有的 AI 处理结果
+        logger.info(f"crawl {url} not modified")
+    else:
+        article.content = content
+        article.content_sha256 = content_sha256
+        article.raw_tokens = count_tokens(result.markdown)
+        article.content_tokens = count_tokens(content)
+        logger.info(
+            f"clean {url} tokens {article.raw_tokens} -> {article.content_tokens}",
+            extra={
+                "raw_tokens": article.raw_tokens,
+                "content_tokens": article.content_tokens,
+            },
+        )
+        # 内容变化后需要重新解析
+        article.ai_content = ""
+        article.status = "crawl_content"
+    session.add(article)
+    session.commit()
+    session.refresh(article)
+    article.content = ""
+    return article
+
+
+@timed_stage("crawl_content")
+@traced("pipeline.crawl_content")
 async def crawl_content(limit: int = 1) -> Articles | None:
     """
     Get content
     """
     # 创建新的数据库会话
-    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
     update_list = []
     with Session(engine) as session:
-        articles = (
+        stmt = (
             select(Article)
             .where(Article.is_active.is_(False))
             .order_by(desc(Article.created_at))
             .limit(limit)
         )
+        # 数据库操作是同步的，放到线程中执行，不阻塞事件循环
+        articles = await run_blocking(lambda: session.exec(stmt).all())
         urls = []
-        for article in session.exec(articles).all():
-            urls.append((article.url, article.id))
+        for article in articles:
+            urls.append((article.url, article.id, article.etag, article.last_modified))
         if not urls:
-            print("not article to crawl")
+            logger.debug("not article to crawl")
             return
-        async with AsyncWebCrawler() as crawler:
-            for url, article_id in urls:
-                try:
-                    result = await crawler.arun(
-                        url=url,
+        record_items("crawl_content", "picked", len(urls))
+        for url, article_id, etag, last_modified in urls:
+            try:
+                with (
+                    start_span("crawl_content", {"url": url}, article_id=article_id),
+                    log_context(article_id=article_id),
+                ):
+                    result = await fetch_markdown(
+                        url, etag=etag, last_modified=last_modified
+                    )
+                    saved = await run_blocking(
+                        _save_crawl_result, session, article_id, url, result
                     )
-                    # 直接通过 ID 获取文章实例
-                    article = session.get(Article, article_id)
-                    if article:
-                        article.content = result.markdown_v2.raw_markdown
-                        article.is_active = True
-                        article.status = "crawl_content"
-                        article.updated_at = datetime.now()
-                        session.add(article)
-                        session.commit()
-                        session.refresh(article)
-                        article.content = ""
-                        update_list.append(article)
-                except Exception as err:
-                    print(f"crawl {url} error", err)
-    return Articles(data=update_list, count=len(update_list))
+                if saved:
+                    update_list.append(saved)
+                record_items("crawl_content", "succeeded")
+            except Exception as err:
+                record_items("crawl_content", "failed")
+                logger.error(
+                    f"crawl {url} error: {err!r}", extra={"article_id": article_id}
+                )
+    return Articles(
+        data=[ArticlePublic.model_validate(item) for item in update_list],
+        count=len(update_list),
+    )
+
+
+async def _parse_article_content(
+    content: str, content_tokens: int | None
+) -> dict[str, Any]:
+    tokens = content_tokens or count_tokens(content)
+    if tokens > settings.LLM_MAX_PROMPT_TOKENS:
+        # 长文章分段处理，避免超出上下文或超时
+        return await asyncio.wait_for(
+            parse_long_content("gpt-4o-mini", content),
+            timeout=settings.LLM_ARTICLE_TIMEOUT_SECONDS,
+        )
+    system_prompt = get_content_parse_system_prompt()
+    ret = await request_ai_with_fallback("gpt-4o-mini", content, system_prompt)
+    if "answer" not in ret:
+        return {}
+    return deal_content_parse_ret(ret["answer"])
+
+
+def _save_parse_result(
+    session: Session, article_id: uuid.UUID, result: dict[str, Any]
+) -> None:
+    article = session.get(Article, article_id)
+    if not article:
+        return
+    article.ai_content = result["content"]
+    article.ai_abstract = result["abstract"]
+    article.tags = result["tags"]
+    article.status = "parse_content"
+    article.updated_at = datetime.now()
+    session.add(article)
+    session.commit()
 
 
+@timed_stage("parse_content")
+@traced("pipeline.parse_content")
 async def ai_parse_content(limit: int = 10):
     """
     AI parse content
     """
     # 创建新的数据库会话
-    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
     with Session(engine) as session:
         stmt = (
             select(Article)
@@ -135,36 +237,53 @@ async def ai_parse_content(limit: int = 10):
             .order_by(desc(Article.created_at))
             .limit(limit)
         )
-        articles = session.exec(stmt).all()
-        print("asdfasdfasdfsa")
+        if not llm_available("gpt-4o-mini"):
+            logger.warning("llm circuit open, skip parse content")
+            return
+        # 先取出需要的字段：commit 之后实例会过期，再访问属性会在事件循环中查询数据库
+        articles = [
+            (article.id, article.url, article.content, article.content_tokens)
+            for article in await run_blocking(lambda: session.exec(stmt).all())
+        ]
         if not articles:
-            print("not article to parse content ")
+            logger.debug("not article to parse content")
             return
-        for article in articles:
+        record_items("parse_content", "picked", len(articles))
+        for article_id, url, content, content_tokens in articles:
             try:
-                system_prompt = get_content_parse_system_prompt()
-                ret = request_ai("gpt-4o-mini", article.content, system_prompt)
-                if ret["status_code"] != 200:
-                    print(f"parse {article.url} content error")
+                with (
+                    start_span("parse_content", article_id=article_id) as span,
+                    llm_call_context("parse_content", article_id),
+                ):
+                    result = await _parse_article_content(content or "", content_tokens)
+                    if not result:
+                        set_error(span, "empty parse result")
+                    else:
+                        await run_blocking(
+                            _save_parse_result, session, article_id, result
+                        )
+                if not result:
+                    record_items("parse_content", "failed")
+                    logger.error(
+                        f"parse {url} content error", extra={"article_id": article_id}
+                    )
                     continue
-                result = deal_content_parse_ret(ret["answer"])
-                article.ai_content = result["content"]
-                article.ai_abstract = result["abstract"]
-                article.tags = result["tags"]
-                article.status = "parse_content"
-                article.updated_at = datetime.now()
-                session.add(article)
-                session.commit()
+                record_items("parse_content", "succeeded")
             except Exception as err:
-                print(f"parse {article.url} content error", err)
+                record_items("parse_content", "failed")
+                logger.error(
+                    f"parse {url} content error: {err!r}",
+                    extra={"article_id": article_id},
+                )
 
 
+@timed_stage("tag_aggregate")
+@traced("pipeline.tag_aggregate")
 def aggregate_by_tag() -> list[str]:
     """
     Get all unique tags from Article table
     """
     # 创建新的数据库会话
-    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
     with Session(engine) as session:
         # Using unnest since tags is stored as an ARRAY type
         statement = select(Article).where(
@@ -176,7 +295,7 @@ def aggregate_by_tag() -> list[str]:
         )
         articles = session.exec(statement).all()
         if not articles:
-            print("not article to aggregate by tag")
+            logger.debug("not article to aggregate by tag")
             return
         tags = []
         article_ids = []
@@ -184,6 +303,7 @@ def aggregate_by_tag() -> list[str]:
             tags.extend(article.tags)
             article_ids.append(article.id)
         tags = list(set(tags))
+        record_items("tag_aggregate", "picked", len(tags))
         sp = get_tag_aggregate_system_prompt()
         for tag in tags:
             tmp_list = [article for article in articles if tag in article.tags]
@@ -192,10 +312,27 @@ def aggregate_by_tag() -> list[str]:
             for article in tmp_list:
                 query += f"\n{article.content}\n"
                 resource_ids.append(str(article.id))
+            # 聚合文章的 id 提前生成，作为它的 trace id，并链接到来源文章的 trace
+            aggregate_id = uuid.uuid4()
             try:
-                ret = request_ai("gpt-4o-mini", query, sp)
+                with (
+                    start_span(
+                        "tag_aggregate",
+                        {"tag": tag},
+                        article_id=aggregate_id,
+                        links=[article.id for article in tmp_list],
+                    ) as span,
+                    llm_call_context("tag_aggregate", aggregate_id),
+                ):
+                    ret = request_ai_with_fallback_sync("gpt-4o-mini", query, sp)
+                    if ret["status_code"] != 200:
+                        set_error(span, f"llm status {ret['status_code']}")
                 if ret["status_code"] != 200:
-                    print(f"parse {article.url} content error")
+                    record_items("tag_aggregate", "failed")
+                    logger.error(
+                        f"aggregate {tag} error: llm status {ret['status_code']}",
+                        extra={"article_id": aggregate_id},
+                    )
                     continue
                 result = deal_content_parse_ret(ret["answer"])
                 combined_tags = (
@@ -212,12 +349,18 @@ def aggregate_by_tag() -> list[str]:
                     resoure_id=",".join(resource_ids),
                 )
                 # Convert ArticleCreate to Article model
-                article = Article.model_validate(article_data)
+                article = Article.model_validate(
+                    article_data, update={"id": aggregate_id}
+                )
                 session.add(article)
                 session.commit()
+                record_items("tag_aggregate", "succeeded")
             except Exception as err:
-                print(f"aggregate {tag} error", err)
-                print(f"Error details: {repr(err)}")
+                record_items("tag_aggregate", "failed")
+                logger.error(
+                    f"aggregate {tag} error: {err!r}",
+                    extra={"article_id": aggregate_id},
+                )
                 continue
 
         # update article status to tag_aggregate if id in article_ids
@@ -230,12 +373,13 @@ def aggregate_by_tag() -> list[str]:
             session.commit()
 
 
+@timed_stage("generate_audio")
+@traced("pipeline.generate_audio")
 def generate_audio() -> list[str]:
     """
     Generate audio for articles
     """
     # 创建新的数据库会话
-    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
     with Session(engine) as session:
         stmt = (
             select(Article)
@@ -252,15 +396,47 @@ def generate_audio() -> list[str]:
         )
         articles = session.exec(stmt).all()
         if not articles:
-            print("not article to generate audio")
+            logger.debug("not article to generate audio")
             return
+        record_items("generate_audio", "picked", len(articles))
         for article in articles:
+            if tts_breaker().state == OPEN:
+                logger.warning("tts circuit open, skip generate audio")
+                break
             try:
-                audio_url = bk_tts(article.ai_abstract)
+                with (
+                    start_span("generate_audio", article_id=article.id),
+                    log_context(article_id=article.id),
+                ):
+                    audio_url = bk_tts(article.ai_abstract)
                 article.audio = audio_url
                 article.status = "generate_audio"
                 article.updated_at = datetime.now()
                 session.add(article)
                 session.commit()
+                record_items("generate_audio", "succeeded")
             except Exception as err:
-                print(f"generate audio {article.id} content error", err)
+                record_items("generate_audio", "failed")
+                logger.error(
+                    f"generate audio {article.id} error: {err!r}",
+                    extra={"article_id": article.id},
+                )
+
+
+def _collect_status_depth() -> Iterator[MetricFamily]:
+    # 每个处理状态下还有多少篇文章，反映各阶段的积压
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Article.status, func.count())
+            .where(col(Article.is_active).is_(True))
+            .group_by(col(Article.status))
+        ).all()
+    yield (
+        "articles_by_status",
+        "gauge",
+        "Active articles by pipeline status.",
+        [("", {"status": status or "new"}, count) for status, count in rows],
+    )
+
+
+REGISTRY.register_collector(_collect_status_depth)
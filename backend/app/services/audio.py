@@ -0,0 +1,233 @@
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Article
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = Path(__file__).parent.parent / "static" / "audio"
+AUDIO_EXTENSION = ".mp3"
+TEMP_SUFFIX = ".tmp"
+COPY_CHUNK_SIZE = 1024 * 1024
+# 播放时刷新 mtime 的最小间隔，避免每个 Range 请求都写一次 inode
+TOUCH_INTERVAL_SECONDS = 60
+# 转码生成的压缩版本：名称 -> (扩展名, Content-Type)，按体积从小到大排列
+RENDITIONS = {
+    "opus": (".opus", "audio/ogg"),
+    "m4a": (".m4a", "audio/mp4"),
+}
+
+# 文件名 -> 文件大小，进程内的查找索引；未命中时再回退到磁盘检查
+_index: dict[str, int] = {}
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def audio_cache_key(text: str, sound: str, seed: int, model: str) -> str:
+    """
+    同样的文本、音色、种子和模型一定合成同样的音频，用它们的 hash 作为文件名
+    """
+    payload = json.dumps([model, sound, seed, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def audio_filename(key: str) -> str:
+    return key + AUDIO_EXTENSION
+
+
+def audio_url(filename: str) -> str:
+    return settings.STATIC_DOMAIN + "/" + settings.STATIC_PREFIX + "/audio/" + filename
+
+
+def is_cache_file(path: Path) -> bool:
+    return path.suffix == AUDIO_EXTENSION and len(path.stem) == 64
+
+
+def rendition_path(path: Path, name: str) -> Path:
+    return path.with_suffix(RENDITIONS[name][0])
+
+
+def _is_rendition_file(path: Path) -> bool:
+    return len(path.stem) == 64 and any(
+        path.suffix == extension for extension, _ in RENDITIONS.values()
+    )
+
+
+def _load_index() -> None:
+    global _index_loaded
+    if _index_loaded:
+        return
+    with _index_lock:
+        if _index_loaded:
+            return
+        AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+        for path in AUDIO_DIR.iterdir():
+            if is_cache_file(path):
+                _index[path.name] = path.stat().st_size
+        _index_loaded = True
+
+
+def lookup_audio(key: str) -> str | None:
+    """
+    命中缓存时返回已有音频的 url，并刷新它的 mtime 作为最近访问时间
+    """
+    _load_index()
+    filename = audio_filename(key)
+    path = AUDIO_DIR / filename
+    try:
+        # 其它进程写入的文件不在本进程的索引中，这里顺便补上
+        os.utime(path)
+    except FileNotFoundError:
+        _index.pop(filename, None)
+        return None
+    if filename not in _index:
+        _index[filename] = path.stat().st_size
+    return audio_url(filename)
+
+
+def touch_audio(path: Path) -> None:
+    """
+    播放时刷新 mtime，淘汰时按 mtime 判断最近访问
+    """
+    try:
+        if time.time() - path.stat().st_mtime >= TOUCH_INTERVAL_SECONDS:
+            os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _fsync_dir(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _copy_atomic(src: Path, target: Path) -> None:
+    """
+    跨文件系统时分块写入同目录下的临时文件，写完再 rename，读者不会看到写了一半的文件
+    """
+    tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}{TEMP_SUFFIX}")
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+            if settings.AUDIO_FSYNC:
+                fdst.flush()
+                os.fsync(fdst.fileno())
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    # 删除原始的 音频
+    os.remove(src)
+
+
+def ingest_audio(src: str | Path, target: Path) -> None:
+    """
+    把 src 移动到 target；同一文件系统下直接 rename，不复制数据
+    """
+    src = Path(src)
+    try:
+        os.replace(src, target)
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            raise
+        _copy_atomic(src, target)
+    if settings.AUDIO_FSYNC:
+        _fsync_dir(target.parent)
+
+
+def store_audio(src: str | Path, key: str) -> str:
+    """
+    把 TTS 生成的音频存入缓存目录，返回音频 url
+    """
+    _load_index()
+    filename = audio_filename(key)
+    target = AUDIO_DIR / filename
+    ingest_audio(src, target)
+    _index[filename] = target.stat().st_size
+    return audio_url(filename)
+
+
+def _referenced_audio(session: Session) -> set[str]:
+    statement = select(Article.audio).where(Article.audio != "")
+    return {
+        audio.rsplit("/", 1)[-1] for audio in session.exec(statement).all() if audio
+    }
+
+
+def _remove(path: Path) -> None:
+    path.unlink(missing_ok=True)
+    for name in RENDITIONS:
+        rendition_path(path, name).unlink(missing_ok=True)
+    _index.pop(path.name, None)
+
+
+def _size_with_renditions(path: Path, size: int) -> int:
+    for name in RENDITIONS:
+        try:
+            size += rendition_path(path, name).stat().st_size
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def prune_audio_cache() -> None:
+    """
+    回收没有 Article 引用的音频；超出容量上限时按最近访问时间淘汰未被引用的音频，
+    仍被引用的音频不会淘汰，否则文章会被反复重新合成
+    """
+    _load_index()
+    with Session(engine) as session:
+        referenced = _referenced_audio(session)
+    now = time.time()
+    total = 0
+    entries = []
+    for path in AUDIO_DIR.iterdir():
+        if path.name.endswith(TEMP_SUFFIX):
+            # 进程在写入过程中退出留下的临时文件
+            if now - path.stat().st_mtime > settings.AUDIO_GC_GRACE_SECONDS:
+                path.unlink(missing_ok=True)
+            continue
+        if _is_rendition_file(path):
+            if not path.with_suffix(AUDIO_EXTENSION).exists():
+                path.unlink(missing_ok=True)
+            continue
+        if not is_cache_file(path):
+            continue
+        stat = path.stat()
+        if path.name in referenced:
+            total += _size_with_renditions(path, stat.st_size)
+            continue
+        if now - stat.st_mtime > settings.AUDIO_GC_GRACE_SECONDS:
+            _remove(path)
+            logger.info(f"gc unreferenced audio {path.name}")
+            continue
+        size = _size_with_renditions(path, stat.st_size)
+        total += size
+        entries.append((stat.st_mtime, size, path))
+
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= settings.AUDIO_CACHE_MAX_BYTES:
+            break
+        _remove(path)
+        total -= size
+        logger.info(f"evict audio {path.name}")
+    if total > settings.AUDIO_CACHE_MAX_BYTES:
+        logger.warning(
+            f"audio cache uses {total} bytes of referenced audio, "
+            f"over the {settings.AUDIO_CACHE_MAX_BYTES} bytes limit"
+        )
@@ -0,0 +1,394 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.blocking import run_blocking
+from app.core.breaker import crawler_breaker
+from app.core.config import settings
+from app.core.tracing import set_attributes, start_span
+from app.services.extract import decode_html, html_to_markdown, visible_text_length
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler
+
+logger = logging.getLogger(__name__)
+
+
+def _child_pids() -> set[int]:
+    try:
+        import psutil
+    except ImportError:
+        return set()
+    return {child.pid for child in psutil.Process(os.getpid()).children()}
+
+
+def _subtree_memory_mb(pids: set[int]) -> float | None:
+    """
+    pids 及其子进程的 RSS 之和，单位 MB；没有安装 psutil 或进程都已退出时返回 None
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    rss = 0
+    found = False
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            processes = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            continue
+        for process in processes:
+            try:
+                rss += process.memory_info().rss
+                found = True
+            except psutil.Error:
+                continue
+    return rss / 1024 / 1024 if found else None
+
+
+def new_crawler() -> "AsyncWebCrawler":
+    # crawl4ai 会导入 Playwright，只在需要浏览器时才导入，只处理 API 请求的进程不会加载
+    from crawl4ai import AsyncWebCrawler
+
+    return AsyncWebCrawler()
+
+
+class PooledCrawler:
+    def __init__(self) -> None:
+        self.crawler = new_crawler()
+        self.pages = 0
+        # 启动时新出现的子进程（Playwright driver 和它启动的浏览器）
+        self.pids: set[int] = set()
+
+    async def start(self) -> None:
+        before = _child_pids()
+        await self.crawler.__aenter__()
+        self.pids = _child_pids() - before
+
+    async def close(self) -> None:
+        try:
+            await self.crawler.__aexit__(None, None, None)
+        except Exception as err:
+            logger.warning(f"close crawler error: {err!r}")
+
+    def memory_mb(self) -> float | None:
+        """
+        这个实例自己的浏览器进程树的 RSS，不包括 worker 进程和池中其它浏览器
+        """
+        return _subtree_memory_mb(self.pids)
+
+    def is_healthy(self) -> bool:
+        # crawl4ai 没有公开浏览器状态，这里尽量探测 playwright 的 browser 对象
+        strategy = getattr(self.crawler, "crawler_strategy", None)
+        manager = getattr(strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is None or not hasattr(browser, "is_connected"):
+            return True
+        return bool(browser.is_connected())
+
+
+class CrawlerPool:
+    """
+    常驻的浏览器池，避免每次抓取都启动、关闭一个 headless 浏览器。
+
+    每个浏览器抓取 CRAWLER_MAX_PAGES 个页面后、自己的浏览器进程树内存超过
+    CRAWLER_MAX_MEMORY_MB 或健康检查失败时会被回收重建。
+    """
+
+    def __init__(self, size: int, max_pages: int, max_memory_mb: int) -> None:
+        self.size = size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self._idle: asyncio.Queue[PooledCrawler] | None = None
+        self._lock = asyncio.Lock()
+        # 同时只启动一个浏览器，才能分清新出现的子进程属于哪个实例
+        self._launch_lock = asyncio.Lock()
+
+    async def _new_crawler(self) -> PooledCrawler:
+        pooled = PooledCrawler()
+        async with self._launch_lock:
+            await pooled.start()
+        return pooled
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._idle is not None:
+                return
+            idle: asyncio.Queue[PooledCrawler] = asyncio.Queue()
+            for _ in range(self.size):
+                idle.put_nowait(await self._new_crawler())
+            self._idle = idle
+            logger.info(f"crawler pool started with {self.size} browsers")
+
+    async def warmup(self) -> None:
+        try:
+            await self.start()
+        except Exception as err:
+            # 预热失败不影响服务，第一次抓取时会再尝试启动
+            logger.error(f"warm up crawler pool error: {err!r}")
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._idle is None:
+                return
+            while not self._idle.empty():
+                await self._idle.get_nowait().close()
+            self._idle = None
+
+    def _should_recycle(self, pooled: PooledCrawler) -> bool:
+        if pooled.pages >= self.max_pages or not pooled.is_healthy():
+            return True
+        memory = pooled.memory_mb()
+        return memory is not None and memory > self.max_memory_mb
+
+    async def _release(self, pooled: PooledCrawler, failed: bool) -> None:
+        if self._idle is None:
+            # 池已经关闭
+            await pooled.close()
+            return
+        if failed or self._should_recycle(pooled):
+            await pooled.close()
+            try:
+                pooled = await self._new_crawler()
+            except Exception as err:
+                logger.error(f"restart crawler error: {err!r}")
+                # 下次 acquire 时再补充
+                pooled = PooledCrawler()
+                pooled.pages = self.max_pages
+        self._idle.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator["AsyncWebCrawler"]:
+        await self.start()
+        assert self._idle is not None
+        pooled = await self._idle.get()
+        if pooled.pages >= self.max_pages:
+            # 上次重建失败留下的占位，重新创建
+            try:
+                pooled = await self._new_crawler()
+            except Exception:
+                self._idle.put_nowait(pooled)
+                raise
+        failed = False
+        try:
+            yield pooled.crawler
+        except Exception:
+            failed = not pooled.is_healthy()
+            raise
+        finally:
+            pooled.pages += 1
+            await self._release(pooled, failed)
+
+    async def health_check(self) -> None:
+        """
+        检查空闲的浏览器，回收已经断开或需要重建的实例
+        """
+        if self._idle is None:
+            return
+        for _ in range(self._idle.qsize()):
+            pooled = self._idle.get_nowait()
+            await self._release(pooled, failed=not pooled.is_healthy())
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "started": self._idle is not None,
+        }
+
+
+crawler_pool = CrawlerPool(
+    size=settings.CRAWLER_POOL_SIZE,
+    max_pages=settings.CRAWLER_MAX_PAGES,
+    max_memory_mb=settings.CRAWLER_MAX_MEMORY_MB,
+)
+
+
+# 提示需要开启 JavaScript 的页面，正文只能由浏览器渲染
+JS_GATED_RE = re.compile(
+    r"(enable|requires?|turn on) javascript|javascript (is )?(disabled|required)",
+    re.IGNORECASE,
+)
+
+TIER_HTTP = "http"
+TIER_BROWSER = "browser"
+
+# 域名 -> (上次可用的抓取方式, 记录时间)
+_domain_tiers: dict[str, tuple[str, float]] = {}
+# 域名 -> HTTP 抓取连续得到需要 JavaScript 的页面的次数
+_js_gated_counts: dict[str, int] = {}
+_http_client: httpx.AsyncClient | None = None
+
+
+@dataclass
+class FetchResult:
+    markdown: str
+    tier: str
+    etag: str | None = None
+    last_modified: str | None = None
+    # 条件请求返回 304，页面没有变化
+    not_modified: bool = False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=settings.CRAWLER_HTTP_TIMEOUT,
+            follow_redirects=True,
+            headers={"User-Agent": settings.CRAWLER_USER_AGENT},
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _preferred_tier(domain: str) -> str | None:
+    remembered = _domain_tiers.get(domain)
+    if remembered is None:
+        return None
+    tier, remembered_at = remembered
+    if time.monotonic() - remembered_at > settings.CRAWLER_TIER_TTL_SECONDS:
+        # 过期后重新探测，站点可能已经改成服务端渲染
+        del _domain_tiers[domain]
+        return None
+    return tier
+
+
+def _remember_tier(domain: str, tier: str) -> None:
+    _domain_tiers[domain] = (tier, time.monotonic())
+
+
+def _record_js_gated(domain: str) -> None:
+    """
+    连续 CRAWLER_TIER_BROWSER_AFTER 个页面都需要 JavaScript 时，才让域名直接使用浏览器；
+    单个页面太短、404 或请求失败不代表整个站点都需要浏览器
+    """
+    count = _js_gated_counts.get(domain, 0) + 1
+    if count >= settings.CRAWLER_TIER_BROWSER_AFTER:
+        _js_gated_counts.pop(domain, None)
+        _remember_tier(domain, TIER_BROWSER)
+    else:
+        _js_gated_counts[domain] = count
+
+
+def looks_js_gated(markdown: str) -> bool:
+    """
+    抽取结果太短或提示需要 JavaScript 时，认为页面需要浏览器渲染
+    """
+    length = visible_text_length(markdown)
+    if length < settings.CRAWLER_MIN_CONTENT_CHARS:
+        return True
+    return length < settings.CRAWLER_MIN_CONTENT_CHARS * 5 and bool(
+        JS_GATED_RE.search(markdown)
+    )
+
+
+def _conditional_headers(etag: str | None, last_modified: str | None) -> dict[str, str]:
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+async def _fetch_http(
+    url: str, etag: str | None = None, last_modified: str | None = None
+) -> tuple[FetchResult | None, str | None, str | None, bool]:
+    """
+    返回 (可用的抓取结果, etag, last_modified, 页面是否需要 JavaScript)；
+    结果不可用时仍返回页面的缓存校验信息
+    """
+    with start_span("crawler.http", {"url": url}) as span:
+        response = await get_http_client().get(
+            url, headers=_conditional_headers(etag, last_modified)
+        )
+        set_attributes(span, {"http.status_code": response.status_code})
+    new_etag = response.headers.get("etag")
+    new_last_modified = response.headers.get("last-modified")
+    if response.status_code == 304:
+        result = FetchResult(
+            markdown="",
+            tier=TIER_HTTP,
+            etag=new_etag or etag,
+            last_modified=new_last_modified or last_modified,
+            not_modified=True,
+        )
+        return result, result.etag, result.last_modified, False
+    if response.status_code != 200:
+        return None, None, None, False
+    content_type = response.headers.get("content-type", "")
+    if "html" not in content_type:
+        return None, new_etag, new_last_modified, False
+    html = decode_html(response.content, content_type)
+    # 大页面的解析可能耗时几十毫秒，放到线程中执行
+    markdown = await run_blocking(html_to_markdown, html)
+    if looks_js_gated(markdown):
+        return None, new_etag, new_last_modified, True
+    result = FetchResult(
+        markdown=markdown,
+        tier=TIER_HTTP,
+        etag=new_etag,
+        last_modified=new_last_modified,
+    )
+    return result, new_etag, new_last_modified, False
+
+
+async def _fetch_browser(url: str) -> FetchResult:
+    with crawler_breaker().protect(), start_span("crawler.arun", {"url": url}):
+        async with crawler_pool.acquire() as crawler:
+            result = await crawler.arun(
+                url=url,
+            )
+    return FetchResult(markdown=result.markdown_v2.raw_markdown, tier=TIER_BROWSER)
+
+
+async def fetch_markdown(
+    url: str, etag: str | None = None, last_modified: str | None = None
+) -> FetchResult:
+    """
+    先用普通 HTTP 请求抓取并抽取正文，内容为空或需要 JavaScript 时再交给浏览器；
+    记住每个域名可用的方式，下次直接使用；同一域名连续多个页面需要 JavaScript 时
+    才记为浏览器。
+
+    传入上次抓取的 etag/last_modified 时总是先发条件请求，页面没有变化只花一次 304。
+    """
+    domain = urlsplit(url).hostname or ""
+    preferred = _preferred_tier(domain)
+    new_etag = new_last_modified = None
+    if preferred != TIER_BROWSER or etag or last_modified:
+        js_gated = False
+        try:
+            result, new_etag, new_last_modified, js_gated = await _fetch_http(
+                url, etag, last_modified
+            )
+        except httpx.HTTPError as err:
+            logger.info(f"http fetch {url} error: {err!r}")
+            result = None
+        if result is not None:
+            if not result.not_modified:
+                _remember_tier(domain, TIER_HTTP)
+                _js_gated_counts.pop(domain, None)
+            return result
+        if js_gated and preferred != TIER_BROWSER:
+            _record_js_gated(domain)
+    result = await _fetch_browser(url)
+    result.etag = new_etag
+    result.last_modified = new_last_modified
+    return result
@@ -0,0 +1,288 @@
+import atexit
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, MetricFamily
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutgoingEmail:
+    email_to: str
+    subject: str
+    html_content: str
+    attempts: int = 0
+
+
+class Transport(Protocol):
+    def send(self, batch: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        """
+        发送一批邮件，返回发送失败的；抛出异常时整批都按失败处理
+        """
+        ...
+
+    def close(self) -> None: ...
+
+
+class SMTPTransport:
+    """
+    保持一个已认证的 SMTP 连接，多封邮件共用；服务器断开时 emails 会重连一次
+    """
+
+    def __init__(self) -> None:
+        self._backend: Any = None
+
+    def _connect(self) -> Any:
+        # emails 会导入 DNS、DKIM 等依赖，只在发送时导入
+        from emails.backend import SMTPBackend  # type: ignore
+
+        options: dict[str, Any] = {
+            "host": settings.SMTP_HOST,
+            "port": settings.SMTP_PORT,
+        }
+        if settings.SMTP_TLS:
+            options["tls"] = True
+        elif settings.SMTP_SSL:
+            options["ssl"] = True
+        if settings.SMTP_USER:
+            options["user"] = settings.SMTP_USER
+        if settings.SMTP_PASSWORD:
+            options["password"] = settings.SMTP_PASSWORD
+        return SMTPBackend(**options)
+
+    def send(self, batch: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        from emails.message import Message
+
+        from_email = settings.EMAILS_FROM_EMAIL
+        assert from_email, "no provided configuration for email variables"
+        failed: list[OutgoingEmail] = []
+        for index, email in enumerate(batch):
+            try:
+                if self._backend is None:
+                    self._backend = self._connect()
+            except Exception as err:
+                # 连不上服务器，这封和后面的都没有发出，已经发出的不再重发
+                logger.error(f"connect to SMTP server error: {err!r}")
+                failed.extend(batch[index:])
+                break
+            message = Message(
+                subject=email.subject,
+                html=email.html_content,
+                mail_from=(settings.EMAILS_FROM_NAME, from_email),
+            )
+            try:
+                response = message.send(to=email.email_to, smtp=self._backend)
+            except Exception as err:
+                response = None
+                logger.warning(f"send email to {email.email_to} error: {err!r}")
+            if response is None or not response.success:
+                logger.warning(f"send email to {email.email_to} failed: {response}")
+                failed.append(email)
+                # 连接可能已经不可用，下一封重新连接
+                self.close()
+        return failed
+
+    def close(self) -> None:
+        if self._backend is None:
+            return
+        try:
+            self._backend.close()
+        except Exception as err:
+            logger.warning(f"close SMTP connection error: {err!r}")
+        self._backend = None
+
+
+class EmailOutbox:
+    """
+    请求把邮件放进内存队列后立即返回，由后台线程发送，SMTP 慢不会拖慢请求。
+
+    后台线程一次取出一批，共用一个 SMTP 连接发送，空闲 idle_seconds 后断开；
+    失败的邮件按 retry_seconds 指数退避重试，max_attempts 次都失败后丢弃并记录错误。
+    队列满时丢弃新邮件。stop 时把剩余的邮件（包括等待重试的）再发送一次。
+    """
+
+    def __init__(
+        self,
+        transport: Transport | None = None,
+        *,
+        batch_size: int,
+        max_queue: int,
+        max_attempts: int,
+        retry_seconds: float,
+        idle_seconds: float,
+    ) -> None:
+        self.transport = transport or SMTPTransport()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.idle_seconds = idle_seconds
+        self._queue: queue.Queue[OutgoingEmail | None] = queue.Queue(maxsize=max_queue)
+        # (下次重试的时间, 序号, 邮件)
+        self._retries: list[tuple[float, int, OutgoingEmail]] = []
+        self._sequence = itertools.count()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._atexit = False
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def enqueue(self, email: OutgoingEmail) -> None:
+        # 第一次有邮件时才启动后台线程，不发邮件的进程没有额外的线程
+        self.start()
+        try:
+            self._queue.put_nowait(email)
+        except queue.Full:
+            self.dropped += 1
+            logger.error(f"email outbox is full, dropped email to {email.email_to}")
+
+    def queue_size(self) -> int:
+        return self._queue.qsize() + len(self._retries)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="email-outbox", daemon=True
+            )
+            self._thread.start()
+            if not self._atexit:
+                # 没有经过 lifespan 关闭的进程（脚本、测试）退出前也把邮件发完
+                atexit.register(self.stop)
+                self._atexit = True
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _take(self, timeout: float) -> tuple[list[OutgoingEmail], bool]:
+        """
+        等待 timeout 秒取出一批邮件，返回 (邮件, 是否收到停止信号)
+        """
+        batch: list[OutgoingEmail] = []
+        try:
+            email = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return batch, False
+        while email is not None:
+            batch.append(email)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                email = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _send(self, batch: list[OutgoingEmail], *, retry: bool = True) -> None:
+        try:
+            failed = self.transport.send(batch)
+        except Exception as err:
+            logger.error(f"send {len(batch)} emails error: {err!r}")
+            failed = batch
+            self.transport.close()
+        self.sent += len(batch) - len(failed)
+        self.failed += len(failed)
+        for email in failed:
+            email.attempts += 1
+            if not retry or email.attempts >= self.max_attempts:
+                self.dropped += 1
+                logger.error(
+                    f"giving up email to {email.email_to} "
+                    f"after {email.attempts} attempts"
+                )
+                continue
+            delay = self.retry_seconds * 2 ** (email.attempts - 1)
+            heapq.heappush(
+                self._retries,
+                (time.monotonic() + delay, next(self._sequence), email),
+            )
+
+    def _run(self) -> None:
+        last_sent = time.monotonic()
+        while True:
+            timeout = self.idle_seconds
+            if self._retries:
+                timeout = min(timeout, max(self._retries[0][0] - time.monotonic(), 0))
+            batch, stopping = self._take(timeout)
+            now = time.monotonic()
+            while (
+                self._retries
+                and self._retries[0][0] <= now
+                and len(batch) < self.batch_size
+            ):
+                batch.append(heapq.heappop(self._retries)[2])
+            if batch:
+                self._send(batch)
+                last_sent = time.monotonic()
+            elif now - last_sent >= self.idle_seconds:
+                # 长时间没有邮件时断开，避免服务器因超时关闭连接
+                self.transport.close()
+            if stopping:
+                break
+        # 退出前把剩余的邮件再发送一次，失败的不再重试
+        remaining = [email for _, _, email in self._retries]
+        self._retries = []
+        while True:
+            try:
+                email = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if email is not None:
+                remaining.append(email)
+        for start in range(0, len(remaining), self.batch_size):
+            self._send(remaining[start : start + self.batch_size], retry=False)
+        self.transport.close()
+
+
+email_outbox = EmailOutbox(
+    batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+    max_queue=settings.EMAIL_OUTBOX_MAX_QUEUE,
+    max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    retry_seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS,
+    idle_seconds=settings.SMTP_IDLE_SECONDS,
+)
+
+
+def _collect_outbox() -> Iterator[MetricFamily]:
+    yield (
+        "email_outbox_queue_size",
+        "gauge",
+        "Emails waiting to be sent or retried.",
+        [("", {}, email_outbox.queue_size())],
+    )
+    yield (
+        "email_outbox_sent_total",
+        "counter",
+        "Emails sent by the outbox.",
+        [("", {}, email_outbox.sent)],
+    )
+    yield (
+        "email_outbox_failed_total",
+        "counter",
+        "Failed email send attempts.",
+        [("", {}, email_outbox.failed)],
+    )
+    yield (
+        "email_outbox_dropped_total",
+        "counter",
+        "Emails dropped because the queue was full or all attempts failed.",
+        [("", {}, email_outbox.dropped)],
+    )
+
+
+REGISTRY.register_collector(_collect_outbox)
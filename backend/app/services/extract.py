@@ -0,0 +1,192 @@
+import codecs
+import re
+from html.parser import HTMLParser
+
+# 这些标签里的内容不是正文；<header> 只在正文区域外跳过，见 _MarkdownExtractor
+SKIP_TAGS = {
+    "title",
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "nav",
+    "footer",
+    "aside",
+    "form",
+    "iframe",
+    "button",
+    "select",
+}
+BLOCK_TAGS = {
+    "p",
+    "div",
+    "section",
+    "article",
+    "main",
+    "blockquote",
+    "ul",
+    "ol",
+    "table",
+    "tr",
+    "figure",
+    "figcaption",
+    "dl",
+    "dt",
+    "dd",
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+MAIN_TAGS = {"article", "main"}
+# 正文区域至少要有这么多字符，才只使用正文区域的内容
+MIN_MAIN_CHARS = 200
+# 只在文档开头查找 <meta charset>
+CHARSET_SNIFF_BYTES = 4096
+HEADER_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+META_CHARSET_RE = re.compile(
+    rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE
+)
+# GB2312、GBK 页面里经常有超出声明字符集的字符，按超集 GB18030 解码
+CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030"}
+
+
+class _MarkdownExtractor(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.pre_depth = 0
+        # 每个未结束的 <header> 是否被跳过
+        self.headers: list[bool] = []
+        self.hrefs: list[str | None] = []
+        self.parts: list[str] = []
+        self.main_parts: list[str] = []
+
+    def _emit(self, text: str) -> None:
+        self.parts.append(text)
+        if self.main_depth:
+            self.main_parts.append(text)
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "header":
+            # 页面顶部的站点 header 不是正文，文章里的 header 通常包含标题
+            skip = bool(self.skip_depth) or not self.main_depth
+            self.headers.append(skip)
+            if skip:
+                self.skip_depth += 1
+            else:
+                self._emit("\n\n")
+            return
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+            return
+        if self.skip_depth:
+            return
+        if tag in MAIN_TAGS:
+            self.main_depth += 1
+        if tag in HEADING_TAGS:
+            self._emit("\n\n" + "#" * int(tag[1]) + " ")
+        elif tag == "li":
+            self._emit("\n- ")
+        elif tag == "br":
+            self._emit("\n")
+        elif tag == "pre":
+            self.pre_depth += 1
+            self._emit("\n\n```\n")
+        elif tag in BLOCK_TAGS:
+            self._emit("\n\n")
+        elif tag == "a":
+            self.hrefs.append(dict(attrs).get("href"))
+            self._emit("[")
+        elif tag == "img":
+            values = dict(attrs)
+            if values.get("src"):
+                self._emit(f"![{values.get('alt') or ''}]({values['src']})")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "header":
+            if not self.headers:
+                return
+            if self.headers.pop():
+                self.skip_depth = max(self.skip_depth - 1, 0)
+            else:
+                self._emit("\n\n")
+            return
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+            return
+        if self.skip_depth:
+            return
+        if tag == "a":
+            href = self.hrefs.pop() if self.hrefs else None
+            self._emit(f"]({href})" if href else "]")
+        elif tag == "pre":
+            self.pre_depth = max(self.pre_depth - 1, 0)
+            self._emit("\n```\n\n")
+        elif tag in BLOCK_TAGS or tag in HEADING_TAGS:
+            self._emit("\n\n")
+        if tag in MAIN_TAGS:
+            self.main_depth = max(self.main_depth - 1, 0)
+
+    def handle_data(self, data: str) -> None:
+        if self.skip_depth:
+            return
+        if not self.pre_depth:
+            data = re.sub(r"\s+", " ", data)
+        self._emit(data)
+
+
+def _normalize(markdown: str) -> str:
+    markdown = re.sub(r"[ \t]+\n", "\n", markdown)
+    markdown = re.sub(r"\n[ \t]+(?=\S)", "\n", markdown)
+    markdown = re.sub(r"\n{3,}", "\n\n", markdown)
+    return markdown.strip()
+
+
+def _lookup_charset(name: str) -> str | None:
+    name = CHARSET_ALIASES.get(name.lower(), name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def decode_html(content: bytes, content_type: str = "") -> str:
+    """
+    按 BOM、Content-Type 的 charset、<meta charset> 的顺序确定编码，都没有时按 UTF-8；
+    没有在响应头中声明编码的 GBK 页面按 UTF-8 解码会变成乱码
+    """
+    if content.startswith(codecs.BOM_UTF8):
+        return content.decode("utf-8-sig", errors="replace")
+    charset = None
+    match = HEADER_CHARSET_RE.search(content_type)
+    if match:
+        charset = _lookup_charset(match.group(1))
+    if charset is None:
+        meta = META_CHARSET_RE.search(content[:CHARSET_SNIFF_BYTES])
+        if meta:
+            charset = _lookup_charset(meta.group(1).decode("ascii", errors="ignore"))
+    return content.decode(charset or "utf-8", errors="replace")
+
+
+def html_to_markdown(html: str) -> str:
+    """
+    把服务端渲染的 HTML 转成 markdown，去掉导航、脚本等非正文内容；
+    页面有 <article>/<main> 时优先只保留其中的内容
+    """
+    extractor = _MarkdownExtractor()
+    extractor.feed(html)
+    extractor.close()
+    main = _normalize("".join(extractor.main_parts))
+    if len(main) >= MIN_MAIN_CHARS:
+        return main
+    return _normalize("".join(extractor.parts))
+
+
+def visible_text_length(markdown: str) -> int:
+    """
+    去掉链接地址、图片和 markdown 符号后的文本长度
+    """
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", markdown)
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"[#*>`\-\s\[\]]", "", text)
+    return len(text)
@@ -1,17 +1,47 @@
+import asyncio
 import json
+import logging
+import re
 import time
+from collections import deque
+from typing import Any
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from app.core.config import settings
+from app.core.breaker import OPEN, llm_breaker
+from app.core.config import LLMEndpoint, settings
+from app.core.tracing import set_attributes, start_span
+from app.services.llm_usage import llm_call_context, record_llm_call
+
+logger = logging.getLogger(__name__)
 
 one_api_url = (
     settings.ONE_API_BASE_URL + "/chat/completions"
 )  ##|| "http://127.0.0.1:3000/v1"
 one_token = settings.ONE_TOKEN
 
+# 中日韩字符大约一个字一个 token，其它文本按单词和标点估算
+CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+WORD_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    估算文本的 token 数，不依赖具体模型的 tokenizer
+    """
+    if not text:
+        return 0
+    cjk = len(CJK_RE.findall(text))
+    rest = CJK_RE.sub(" ", text)
+    tokens = 0
+    for word in WORD_RE.findall(rest):
+        # 长单词通常会被拆成多个 token
+        tokens += max(1, len(word) // 6 + 1) if word.isalpha() else 1
+    return cjk + tokens
+
 
 def get_content_parse_system_prompt() -> str:
     return """ 你是一个文档处理专家，你能高效地处理markdown格式的文本。并且能去除文版本中不方便转化为语音的内容。
@@ -40,6 +70,61 @@ def get_tag_aggregate_system_prompt() -> str:
 """
 
 
+def get_chunk_clean_system_prompt() -> str:
+    return """ 你是一个文档处理专家，你能高效地处理markdown格式的文本。用户提供的是一篇长文章中的一个片段。
+    请去除片段中不方便转化为语音的内容，包括：图片,超链接，代码块，表格等。
+    去除这些内容后，如果出现语句不通顺，你需要对其进行修改。
+    直接返回处理后的文本，不要添加任何解释，也不要使用json格式。
+    【注意】：不需要对文本进行翻译，如果原文是英文，返回的文本也要是英文。
+"""
+
+
+def get_chunk_merge_system_prompt() -> str:
+    return """ 你是一个文档处理专家。用户提供的是一篇已经整理好的文章。
+    请对文章打标签，如：新闻，科技，教育等，标签数量不要超过5个。
+    最后生成摘要，并按照以下json格式返回：
+    {
+        "tags":["科技","教育"],
+        "abstract":"这是一个科学技术在高等教育中的应用的案例"
+    }
+    【注意】：不需要对文本进行翻译，如果原文是英文，返回的abstract也要是英文。
+"""
+
+
+def split_into_chunks(text: str, max_tokens: int) -> list[str]:
+    """
+    按段落把文本切成不超过 max_tokens 的片段，超长的段落按字符再切分
+    """
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        tokens = count_tokens(paragraph)
+        if tokens > max_tokens:
+            # 按估算的每 token 字符数切开超长段落
+            step = max(1, len(paragraph) * max_tokens // tokens)
+            pieces = [paragraph[i : i + step] for i in range(0, len(paragraph), step)]
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[: len(text) * max_tokens // tokens]
+
+
 def deal_content_parse_ret(answer: str) -> dict:
     """
     Parse the LLM response string containing JSON data into a dictionary.
@@ -81,7 +166,139 @@ def deal_content_parse_ret(answer: str) -> dict:
         return {}
 
 
-def request_ai(model, query, system_prompt="", chat_url=one_api_url, token=one_token):
+def deal_merge_ret(answer: str) -> dict[str, Any]:
+    """
+    解析合并步骤返回的 json，只需要 tags、abstract 两个字段
+    """
+    start = answer.find("{")
+    end = answer.rfind("}")
+    if start == -1 or end == -1:
+        return {}
+    try:
+        result: dict[str, Any] = json.loads(answer[start : end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if all(key in result for key in ["tags", "abstract"]):
+        return result
+    return {}
+
+
+async def parse_long_content(model: str, content: str) -> dict[str, Any]:
+    """
+    长文章分段并行清理，再合并生成标签和摘要，返回与 deal_content_parse_ret 相同的结构；
+    失败时返回空 dict
+    """
+    chunks = split_into_chunks(content, settings.LLM_CHUNK_TOKENS)
+    if len(chunks) > settings.LLM_MAX_CHUNKS:
+        logger.warning(
+            f"content has {len(chunks)} chunks, keep {settings.LLM_MAX_CHUNKS}"
+        )
+        chunks = chunks[: settings.LLM_MAX_CHUNKS]
+    semaphore = asyncio.Semaphore(settings.LLM_CHUNK_CONCURRENCY)
+    clean_prompt = get_chunk_clean_system_prompt()
+
+    async def clean(chunk: str) -> str | None:
+        async with semaphore:
+            with llm_call_context("parse_chunk"):
+                ret = await request_ai_with_fallback(model, chunk, clean_prompt)
+        if "answer" not in ret:
+            return None
+        answer: str = ret["answer"]
+        return answer.strip()
+
+    cleaned = await asyncio.gather(*(clean(chunk) for chunk in chunks))
+    if any(part is None for part in cleaned):
+        return {}
+    merged = "\n\n".join(part for part in cleaned if part)
+    with llm_call_context("parse_merge"):
+        ret = await request_ai_with_fallback(
+            model,
+            truncate_to_tokens(merged, settings.LLM_MAX_PROMPT_TOKENS),
+            get_chunk_merge_system_prompt(),
+        )
+    if "answer" not in ret:
+        return {}
+    result = deal_merge_ret(ret["answer"])
+    if not result:
+        return {}
+    result["content"] = merged
+    return result
+
+
+def is_retryable(ret: dict[str, Any]) -> bool:
+    # 0 表示网络错误、超时或熔断
+    status_code: int = ret["status_code"]
+    return status_code == 0 or status_code == 429 or status_code >= 500
+
+
+def circuit_open_ret(model: str) -> dict[str, Any]:
+    return {
+        "status_code": 0,
+        "error": {"message": f"circuit llm:{model} is open"},
+        "milliseconds": 0,
+        "model": model,
+    }
+
+
+def llm_available(model: str) -> bool:
+    """
+    主模型或任一备用模型没有熔断时返回 True
+    """
+    models = [model] + [endpoint.model for endpoint in settings.LLM_FALLBACKS]
+    return any(llm_breaker(name).state != OPEN for name in models)
+
+
+def _span_attributes(ret: dict[str, Any]) -> dict[str, Any]:
+    usage = (ret.get("data") or {}).get("usage") or {}
+    return {
+        "http.status_code": ret["status_code"],
+        "llm.prompt_tokens": usage.get("prompt_tokens"),
+        "llm.completion_tokens": usage.get("completion_tokens"),
+    }
+
+
+def build_messages(
+    model: str, query: str, system_prompt: str = ""
+) -> list[dict[str, str]]:
+    messages = []
+    if system_prompt != "":
+        messages.append(
+            {
+                "role": "user" if model.startswith("o1") else "system",
+                "content": system_prompt,
+            }
+        )
+    messages.append({"role": "user", "content": query})
+    return messages
+
+
+def request_ai(
+    model: str,
+    query: str,
+    system_prompt: str = "",
+    chat_url: str = one_api_url,
+    token: str = one_token,
+    timeout: float | None = None,
+) -> dict[str, Any]:
+    breaker = llm_breaker(model)
+    if not breaker.allow():
+        return circuit_open_ret(model)
+    with start_span("llm.request", {"llm.model": model}) as span:
+        ret = _request_ai(model, query, system_prompt, chat_url, token, timeout)
+        set_attributes(span, _span_attributes(ret))
+    breaker.record(not is_retryable(ret), ret["milliseconds"] / 1000)
+    record_llm_call(ret, model)
+    return ret
+
+
+def _request_ai(
+    model: str,
+    query: str,
+    system_prompt: str,
+    chat_url: str,
+    token: str,
+    timeout: float | None,
+) -> dict[str, Any]:
     # 创建一个Session对象
     session = requests.Session()
 
@@ -104,26 +321,23 @@ def request_ai(model, query, system_prompt="", chat_url=one_api_url, token=one_t
         "Authorization": f"Bearer {token}",  # 示例授权头
     }
 
-    messages = []
-    if system_prompt != "":
-        messages.append(
-            {
-                "role": "user" if model.startswith("o1") else "system",
-                "content": system_prompt,
-            }
-        )
-    messages.append({"role": "user", "content": query})
     # 设置请求数据
-    data = {
+    data: dict[str, Any] = {
         "model": model,
-        "messages": messages,
+        "messages": build_messages(model, query, system_prompt),
     }
 
     # 发送POST请求
     start_time = time.time()
-    status_code = 200
+    # 0 表示没有拿到响应：网络错误或超时
+    status_code = 0
     try:
-        response = session.post(chat_url, json=data, headers=headers)
+        response = session.post(
+            chat_url,
+            json=data,
+            headers=headers,
+            timeout=timeout or settings.LLM_TIMEOUT_SECONDS,
+        )
         end_time = time.time()
         # response.raise_for_status()  # 如果响应状态码是4xx/5xx会抛出异常
         status_code = response.status_code
@@ -153,6 +367,203 @@ def request_ai(model, query, system_prompt="", chat_url=one_api_url, token=one_t
         }
 
 
+class LatencyTracker:
+    """
+    记录每个模型最近成功请求的耗时，用于计算对冲请求的触发时间
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = window
+        self._samples: dict[str, deque[int]] = {}
+
+    def record(self, model: str, milliseconds: int) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append(milliseconds)
+
+    def quantile(self, model: str, q: float) -> float | None:
+        samples = self._samples.get(model)
+        if not samples or len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)] / 1000
+
+
+latency_tracker = LatencyTracker()
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=settings.LLM_TIMEOUT_SECONDS)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def arequest_ai(
+    endpoint: LLMEndpoint, query: str, system_prompt: str = ""
+) -> dict[str, Any]:
+    """
+    request_ai 的异步版本，不做重试，返回相同结构的结果；网络错误时 status_code 为 0
+    """
+    breaker = llm_breaker(endpoint.model)
+    if not breaker.allow():
+        return circuit_open_ret(endpoint.model)
+    try:
+        with start_span("llm.request", {"llm.model": endpoint.model}) as span:
+            ret = await _arequest_ai(endpoint, query, system_prompt)
+            set_attributes(span, _span_attributes(ret))
+    except asyncio.CancelledError:
+        # 对冲时另一个请求先成功，被取消的请求不计入熔断统计
+        breaker.release()
+        raise
+    breaker.record(not is_retryable(ret), ret["milliseconds"] / 1000)
+    record_llm_call(ret, endpoint.model)
+    return ret
+
+
+async def _arequest_ai(
+    endpoint: LLMEndpoint, query: str, system_prompt: str
+) -> dict[str, Any]:
+    base_url = endpoint.base_url or settings.ONE_API_BASE_URL
+    token = endpoint.token or one_token
+    data = {
+        "model": endpoint.model,
+        "messages": build_messages(endpoint.model, query, system_prompt),
+    }
+    start_time = time.time()
+    try:
+        response = await get_http_client().post(
+            base_url + "/chat/completions",
+            json=data,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        milliseconds = int((time.time() - start_time) * 1000)
+        resp = response.json()
+    except Exception as e:
+        return {
+            "status_code": 0,
+            "error": {"message": str(e)},
+            "milliseconds": int((time.time() - start_time) * 1000),
+            "model": endpoint.model,
+        }
+    answer = ""
+    if resp and "choices" in resp and resp["choices"]:
+        answer = resp["choices"][0]["message"].get("content", "")
+    if response.status_code == 200 and len(answer) > 0:
+        latency_tracker.record(endpoint.model, milliseconds)
+        return {
+            "status_code": response.status_code,
+            "data": resp,
+            "milliseconds": milliseconds,
+            "answer": answer,
+            "model": endpoint.model,
+        }
+    return {
+        "status_code": response.status_code,
+        "error": resp,
+        "milliseconds": milliseconds,
+        "model": endpoint.model,
+    }
+
+
+async def _hedged_request(
+    primary: LLMEndpoint, secondary: LLMEndpoint, query: str, system_prompt: str
+) -> tuple[dict[str, Any], bool]:
+    """
+    主请求超过该模型近期的 p90 耗时仍未返回时，向备用模型发出同样的请求，
+    谁先成功用谁，并取消另一个。返回 (结果, 是否发出了对冲请求)
+    """
+    primary_task = asyncio.create_task(arequest_ai(primary, query, system_prompt))
+    delay = latency_tracker.quantile(primary.model, 0.9)
+    if delay is None:
+        return await primary_task, False
+    done, _ = await asyncio.wait({primary_task}, timeout=delay)
+    if done:
+        return primary_task.result(), False
+    logger.info(f"hedge {primary.model} with {secondary.model} after {delay:.1f}s")
+    hedge_task = asyncio.create_task(arequest_ai(secondary, query, system_prompt))
+    pending = {primary_task, hedge_task}
+    ret: dict[str, Any] = {}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                ret = task.result()
+                if "answer" in ret:
+                    return ret, True
+        return ret, True
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _fallback_chain(model: str) -> list[LLMEndpoint]:
+    return [LLMEndpoint(model=model)] + settings.LLM_FALLBACKS
+
+
+async def request_ai_with_fallback(
+    model: str, query: str, system_prompt: str = ""
+) -> dict[str, Any]:
+    """
+    按 [model] + LLM_FALLBACKS 的顺序请求，遇到 429/5xx/网络错误时换下一个；
+    开启 LLM_HEDGE_ENABLED 时，慢请求会对冲到链上的第二个模型
+    """
+    chain = _fallback_chain(model)
+    ret: dict[str, Any] = {}
+    index = 0
+    while index < len(chain):
+        if settings.LLM_HEDGE_ENABLED and index == 0 and len(chain) > 1:
+            ret, hedged = await _hedged_request(
+                chain[0], chain[1], query, system_prompt
+            )
+            # 发出过对冲请求时已经请求过第二个模型；主请求很快失败时仍然换到第二个
+            index = 2 if hedged else 1
+        else:
+            ret = await arequest_ai(chain[index], query, system_prompt)
+            index += 1
+        if not is_retryable(ret):
+            return ret
+        logger.warning(
+            f"request {ret['model']} failed with {ret['status_code']}, fallback"
+        )
+    return ret
+
+
+def request_ai_with_fallback_sync(
+    model: str, query: str, system_prompt: str = ""
+) -> dict[str, Any]:
+    """
+    request_ai_with_fallback 的同步版本，给在线程中运行的同步任务使用，不做对冲
+    """
+    ret: dict[str, Any] = {}
+    for endpoint in _fallback_chain(model):
+        ret = request_ai(
+            endpoint.model,
+            query,
+            system_prompt,
+            chat_url=(endpoint.base_url or settings.ONE_API_BASE_URL)
+            + "/chat/completions",
+            token=endpoint.token or one_token,
+        )
+        if not is_retryable(ret):
+            return ret
+        logger.warning(
+            f"request {endpoint.model} failed with {ret['status_code']}, fallback"
+        )
+    return ret
+
+
 if __name__ == "__main__":
     ret = request_ai(
         "deepseek-chat",
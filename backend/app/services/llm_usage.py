@@ -0,0 +1,252 @@
+import logging
+import queue
+import threading
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import literal_column
+from sqlmodel import Session, col, func
+from sqlmodel.sql.expression import Select
+from typing_extensions import Unpack
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.log import log_context
+from app.core.metrics import REGISTRY, MetricFamily
+from app.models import LLMCall, LLMCallSummary, LLMLatencyStats, LLMTokenUsage
+
+logger = logging.getLogger(__name__)
+
+# 当前 LLM 调用所属的处理阶段和文章，由调用方用 llm_call_context 设置
+_stage: ContextVar[str] = ContextVar("llm_stage", default="")
+_article_id: ContextVar[uuid.UUID | None] = ContextVar("llm_article_id", default=None)
+
+
+@contextmanager
+def llm_call_context(stage: str, article_id: uuid.UUID | None = None) -> Iterator[None]:
+    """
+    标记代码块内的 LLM 调用所属的阶段和文章；不传 article_id 时沿用外层的值。
+    asyncio 任务创建时会复制当前上下文，并发的分段请求也能拿到。
+    代码块内的日志也会带上 stage 和 article_id
+    """
+    stage_token = _stage.set(stage)
+    article_token = _article_id.set(article_id) if article_id is not None else None
+    try:
+        with log_context(stage, article_id):
+            yield
+    finally:
+        _stage.reset(stage_token)
+        if article_token is not None:
+            _article_id.reset(article_token)
+
+
+def _usage(ret: dict[str, Any]) -> dict[str, Any]:
+    data = ret.get("data") or ret.get("error")
+    if not isinstance(data, dict):
+        return {}
+    usage = data.get("usage")
+    return usage if isinstance(usage, dict) else {}
+
+
+def build_llm_call(ret: dict[str, Any], model: str) -> LLMCall:
+    """
+    从 request_ai/arequest_ai 的返回结果生成一条调用记录
+    """
+    usage = _usage(ret)
+    # OpenAI 兼容接口在 prompt_tokens_details.cached_tokens 中返回命中缓存的 token 数
+    details = usage.get("prompt_tokens_details") or {}
+    cached_tokens = details.get("cached_tokens") if isinstance(details, dict) else None
+    return LLMCall(
+        model=model,
+        stage=_stage.get(),
+        article_id=_article_id.get(),
+        status_code=ret["status_code"],
+        milliseconds=ret["milliseconds"],
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        cached_tokens=cached_tokens,
+        cache_hit=bool(cached_tokens),
+        created_at=datetime.now(),
+    )
+
+
+def _write_calls(calls: list[LLMCall]) -> None:
+    with Session(engine) as session:
+        session.add_all(calls)
+        session.commit()
+
+
+class LLMCallRecorder:
+    """
+    把调用记录放进内存队列，由后台线程按批写入数据库，调用方不会被写库阻塞。
+
+    队列满时丢弃新记录；写库失败时丢弃这一批，只记日志。
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[LLMCall]], None] = _write_calls,
+        *,
+        batch_size: int,
+        flush_seconds: float,
+        max_queue: int,
+    ) -> None:
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: queue.Queue[LLMCall | None] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self.dropped = 0
+
+    def record(self, call: LLMCall) -> None:
+        try:
+            self._queue.put_nowait(call)
+        except queue.Full:
+            self.dropped += 1
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="llm-call-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        写完队列中剩余的记录后退出后台线程
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _flush(self, batch: list[LLMCall]) -> None:
+        if not batch:
+            return
+        try:
+            self.write(batch)
+        except Exception as err:
+            logger.error(f"write {len(batch)} llm calls error: {err!r}")
+
+    def _run(self) -> None:
+        batch: list[LLMCall] = []
+        while True:
+            try:
+                call = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                self._flush(batch)
+                batch = []
+                continue
+            if call is None:
+                break
+            batch.append(call)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        # 退出前把剩余的记录全部写入
+        while True:
+            try:
+                call = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if call is not None:
+                batch.append(call)
+        self._flush(batch)
+
+
+llm_call_recorder = LLMCallRecorder(
+    batch_size=settings.LLM_USAGE_BATCH_SIZE,
+    flush_seconds=settings.LLM_USAGE_FLUSH_SECONDS,
+    max_queue=settings.LLM_USAGE_MAX_QUEUE,
+)
+
+
+def _collect_recorder() -> Iterator[MetricFamily]:
+    yield (
+        "llm_call_recorder_queue_size",
+        "gauge",
+        "LLM call records waiting to be written.",
+        [("", {}, llm_call_recorder.queue_size())],
+    )
+    yield (
+        "llm_call_recorder_dropped_total",
+        "counter",
+        "LLM call records dropped because the queue was full.",
+        [("", {}, llm_call_recorder.dropped)],
+    )
+
+
+REGISTRY.register_collector(_collect_recorder)
+
+
+def record_llm_call(ret: dict[str, Any], model: str) -> None:
+    if settings.LLM_USAGE_ENABLED:
+        llm_call_recorder.record(build_llm_call(ret, model))
+
+
+def get_llm_call_summary(session: Session, days: int = 7) -> LLMCallSummary:
+    """
+    最近 days 天按模型和阶段统计的耗时分位数，以及每天的 token 用量
+    """
+    since = datetime.now() - timedelta(days=days)
+    # sqlmodel 的 select 只为最多 4 列生成了类型重载，多列时直接构造 Select
+    latency_stmt: Select[Unpack[tuple[Any, ...]]] = (
+        Select(
+            col(LLMCall.model),
+            col(LLMCall.stage),
+            func.count(),
+            func.count().filter(col(LLMCall.status_code) != 200),
+            func.percentile_cont(0.5).within_group(col(LLMCall.milliseconds)),
+            func.percentile_cont(0.95).within_group(col(LLMCall.milliseconds)),
+        )
+        .where(LLMCall.created_at >= since)
+        .group_by(LLMCall.model, LLMCall.stage)
+        .order_by(LLMCall.model, LLMCall.stage)
+    )
+    latency = [
+        LLMLatencyStats(
+            model=model,
+            stage=stage,
+            calls=calls,
+            errors=errors,
+            p50_ms=p50 or 0,
+            p95_ms=p95 or 0,
+        )
+        for model, stage, calls, errors, p50, p95 in session.exec(latency_stmt).all()
+    ]
+    # 用字面量而不是绑定参数，GROUP BY 中才是同一个表达式
+    day = func.date_trunc(literal_column("'day'"), LLMCall.created_at)
+    tokens_stmt: Select[Unpack[tuple[Any, ...]]] = (
+        Select(
+            day,
+            col(LLMCall.model),
+            func.count(),
+            func.coalesce(func.sum(LLMCall.prompt_tokens), 0),
+            func.coalesce(func.sum(LLMCall.completion_tokens), 0),
+            func.coalesce(func.sum(LLMCall.cached_tokens), 0),
+        )
+        .where(LLMCall.created_at >= since)
+        .group_by(day, LLMCall.model)
+        .order_by(day, LLMCall.model)
+    )
+    tokens = [
+        LLMTokenUsage(
+            day=row[0].date(),
+            model=row[1],
+            calls=row[2],
+            prompt_tokens=row[3],
+            completion_tokens=row[4],
+            cached_tokens=row[5],
+        )
+        for row in session.exec(tokens_stmt).all()
+    ]
+    return LLMCallSummary(days=days, latency=latency, tokens=tokens)
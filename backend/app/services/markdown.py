@@ -0,0 +1,107 @@
+import re
+
+FENCED_CODE_RE = re.compile(r"^(```|~~~).*?^\1[^\n]*$", re.MULTILINE | re.DOTALL)
+IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+REFERENCE_LINK_RE = re.compile(r"\[([^\]]+)\]\[[^\]]*\]")
+LINK_DEFINITION_RE = re.compile(r"^\s*\[[^\]]+\]:\s*\S+.*$", re.MULTILINE)
+BARE_URL_RE = re.compile(r"<?https?://[^\s)>]*[^\s)>.,;:!?'\"]>?")
+HTML_TAG_RE = re.compile(r"</?[a-zA-Z][^>]*>")
+TABLE_ROW_RE = re.compile(r"^\s*\|.*\|\s*$")
+TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)+\|?\s*$")
+HORIZONTAL_RULE_RE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+EMPTY_HEADING_RE = re.compile(r"^\s*#+\s*$")
+# 常见的页面样板文字，只在文档开头和结尾单独成段的短行中匹配
+BOILERPLATE_RE = re.compile(
+    r"\b(all rights reserved|copyright|cookies?|subscribe|newsletter|sign (in|up)|"
+    r"log ?in|share (this|on)|follow us|skip to (main )?content|back to top)\b|"
+    r"©|版权所有|上一篇|下一篇|分享到|扫码关注|关注我们|返回顶部",
+    re.IGNORECASE,
+)
+BOILERPLATE_MAX_CHARS = 80
+# 样板文字很少是完整的句子，词数多的行按正文处理
+BOILERPLATE_MAX_WORDS = 8
+
+
+def _is_navigation(line: str) -> bool:
+    """
+    几乎全是链接的行是导航、面包屑或相关推荐
+    """
+    links = LINK_RE.findall(line)
+    if not links:
+        return False
+    rest = LINK_RE.sub("", line)
+    rest = re.sub(r"[\s\-*|>•·/]", "", rest)
+    if len(links) == 1:
+        return rest == ""
+    return len(rest) <= 3
+
+
+def _drop_lines(markdown: str) -> str:
+    lines = []
+    for line in markdown.splitlines():
+        if TABLE_ROW_RE.match(line) or TABLE_SEPARATOR_RE.match(line):
+            continue
+        if HORIZONTAL_RULE_RE.match(line) or EMPTY_HEADING_RE.match(line):
+            continue
+        if _is_navigation(line):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _is_boilerplate(paragraph: str) -> bool:
+    return all(
+        len(line.strip()) <= BOILERPLATE_MAX_CHARS
+        and len(LINK_RE.sub(r"\1", line).split()) <= BOILERPLATE_MAX_WORDS
+        and BOILERPLATE_RE.search(line)
+        and not line.lstrip().startswith("#")
+        for line in paragraph.splitlines()
+        if line.strip()
+    )
+
+
+def _trim_boilerplate(markdown: str) -> str:
+    """
+    去掉文档开头和结尾的样板段落（登录、订阅、版权声明等），
+    正文中间提到这些词的段落不受影响
+    """
+    paragraphs = [p for p in re.split(r"\n\s*\n", markdown) if p.strip()]
+    start, end = 0, len(paragraphs)
+    while start < end and _is_boilerplate(paragraphs[start]):
+        start += 1
+    while end > start and _is_boilerplate(paragraphs[end - 1]):
+        end -= 1
+    return "\n\n".join(paragraphs[start:end])
+
+
+def _dedupe_paragraphs(markdown: str) -> str:
+    seen = set()
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", markdown):
+        paragraph = paragraph.strip()
+        key = re.sub(r"\s+", " ", paragraph).lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+def clean_markdown(markdown: str) -> str:
+    """
+    在交给 LLM 之前去掉不适合转成语音的内容：代码块、图片、链接地址、表格、
+    HTML 标签、导航和样板文字，以及重复的段落
+    """
+    markdown = FENCED_CODE_RE.sub("", markdown)
+    markdown = IMAGE_RE.sub("", markdown)
+    markdown = LINK_DEFINITION_RE.sub("", markdown)
+    # 先按行去掉导航，再把剩下的链接替换成文字
+    markdown = _drop_lines(markdown)
+    markdown = _trim_boilerplate(markdown)
+    markdown = LINK_RE.sub(r"\1", markdown)
+    markdown = REFERENCE_LINK_RE.sub(r"\1", markdown)
+    markdown = BARE_URL_RE.sub("", markdown)
+    markdown = HTML_TAG_RE.sub("", markdown)
+    markdown = re.sub(r"[ \t]+\n", "\n", markdown)
+    return _dedupe_paragraphs(markdown)
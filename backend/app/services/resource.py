@@ -2,12 +2,10 @@ import uuid
 from datetime import datetime
 from typing import Any
 
-import feedparser
-from sqlmodel import desc, func, select
+from sqlmodel import col, desc, func, select
 
 from app.api.deps import SessionDep
 from app.models import Article, Resource, ResourceCreate, Resources, ResourceUpdate
-from app.services.article import query_article
 
 
 def get_resources(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
@@ -60,11 +58,17 @@ def create_resource(*, session: SessionDep, resource_in: ResourceCreate) -> Any:
     session.add(item)
     session.commit()
     session.refresh(item)
-    # 批量创建 Article
+    # 批量创建 Article，已经抓取过的文章用一条查询找出来
+    links = [entry["link"] for entry in entries]
+    existing = set(
+        session.exec(select(Article.url).where(col(Article.url).in_(links))).all()
+        if links
+        else ()
+    )
     articles_to_add = []
     for entry in entries:
-        article = query_article(session=session, url=entry["link"])
-        if not article:
+        if entry["link"] not in existing:
+            existing.add(entry["link"])
             article = Article(
                 resoure_id=item.id,
                 url=entry["link"],
@@ -82,6 +86,9 @@ def create_resource(*, session: SessionDep, resource_in: ResourceCreate) -> Any:
 
 
 def parse_rss(url: str):
+    # 只有添加 RSS 资源时才用到
+    import feedparser
+
     d = feedparser.parse(url)
     entries = []
     for entry in d.entries:
@@ -1 +1,173 @@
-# todo 把定时任务都迁移到这里
+# from apscheduler.triggers.cron import CronTrigger
+import asyncio
+import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core.config import settings
+from app.core.leader import LeaderElector
+from app.core.loop_monitor import loop_monitor
+from app.core.tracing import shutdown_tracing
+from app.services import llm
+from app.services.article import (
+    generate_audio,
+)
+from app.services.audio import prune_audio_cache
+from app.services.crawler import close_http_client, crawler_pool
+from app.services.email_outbox import email_outbox
+from app.services.llm_usage import llm_call_recorder
+from app.services.transcode import shutdown_transcode_pool, transcode_audio
+
+logger = logging.getLogger(__name__)
+
+# 初始化调度器
+scheduler = AsyncIOScheduler()
+# 多个进程或副本同时运行调度器时，只有 leader 执行单例任务
+leader = LeaderElector(
+    settings.SCHEDULER_LOCK_ID,
+    renew_seconds=settings.SCHEDULER_RENEW_SECONDS,
+    lease_seconds=settings.SCHEDULER_LEASE_SECONDS,
+)
+
+
+def add_job(
+    func: Callable[..., Any],
+    trigger: Any,
+    id: str,
+    every_node: bool = False,
+    **kwargs: Any,
+) -> None:
+    """
+    every_node 为 False 的任务在整个集群中只由 leader 执行；
+    为 True 时每个进程都执行，用于维护进程内资源的任务
+    """
+    if not every_node and settings.SCHEDULER_LEADER_ELECTION:
+        func = leader.guard(func)
+    scheduler.add_job(
+        func,
+        trigger=trigger,
+        id=id,
+        max_instances=1,  # 确保同一时间只有一个任务实例在运行
+        coalesce=True,  # 如果错过了执行时间，只运行一次
+        **kwargs,
+    )
+
+
+# 配置任务
+def configure_scheduler() -> None:
+    # 每 10 秒执行一次（同步任务）
+    # add_job(
+    #     crawl_content,
+    #     trigger=IntervalTrigger(seconds=20),
+    #     id="crawl_content",
+    #     kwargs={'limit': 1},
+    # )
+
+    # add_job(
+    #     ai_parse_content,
+    #     trigger=IntervalTrigger(seconds=10),
+    #     id="ai_parse_content",
+    #     kwargs={'limit': 1},
+    # )
+
+    # add_job(
+    #     aggregate_by_tag,
+    #     trigger=IntervalTrigger(seconds=10),
+    #     id="aggregate_by_tag",
+    # )
+
+    add_job(
+        generate_audio,
+        trigger=IntervalTrigger(seconds=20),
+        id="generate_audio",
+    )
+
+    # 回收断开或超出内存上限的浏览器，每个进程有自己的浏览器池
+    add_job(
+        crawler_pool.health_check,
+        trigger=IntervalTrigger(seconds=60),
+        id="crawler_pool_health_check",
+        every_node=True,
+    )
+
+    # 转码出低码率版本，在进程池中执行
+    add_job(
+        transcode_audio,
+        trigger=IntervalTrigger(seconds=30),
+        id="transcode_audio",
+    )
+
+    # 回收无引用的音频，并把 static/audio 控制在容量上限内
+    add_job(
+        prune_audio_cache,
+        trigger=IntervalTrigger(hours=1),
+        id="prune_audio_cache",
+    )
+
+    # # 每天 8:30 执行一次（异步任务）
+    # add_job(
+    #     async_cron_task,
+    #     trigger=CronTrigger(hour=8, minute=30),
+    #     id="cron_job",
+    # )
+
+
+_warmup: asyncio.Task[None] | None = None
+
+
+async def startup(run_scheduler: bool) -> None:
+    """
+    启动后台服务；run_scheduler 为 True 时还会启动定时任务和抓取用的浏览器池
+    """
+    global _warmup
+    if settings.LOOP_LAG_MONITOR_ENABLED:
+        loop_monitor.start()
+    llm_call_recorder.start()
+    if not run_scheduler:
+        return
+    logger.info("Starting scheduler...")
+    if settings.SCHEDULER_LEADER_ELECTION:
+        leader.start()
+    configure_scheduler()
+    scheduler.start()
+    if settings.CRAWLER_POOL_WARMUP:
+        # 在后台预热浏览器池，不阻塞启动
+        _warmup = asyncio.create_task(crawler_pool.warmup())
+
+
+async def shutdown() -> None:
+    global _warmup
+    if scheduler.running:
+        logger.info("Shutting down scheduler...")
+        scheduler.shutdown()
+    # 释放锁，其他节点可以立即接管
+    leader.stop()
+    shutdown_transcode_pool()
+    if _warmup is not None:
+        await _warmup
+        _warmup = None
+    await crawler_pool.close()
+    await close_http_client()
+    await llm.close_http_client()
+    # 写完剩余的 LLM 调用记录
+    llm_call_recorder.stop()
+    # 发完队列中的邮件
+    email_outbox.stop()
+    loop_monitor.stop()
+    # 导出缓存中剩余的 span
+    shutdown_tracing()
+
+
+def configure_worker_threads() -> None:
+    """
+    设置当前事件循环的默认线程池，调度器中的同步任务在这里执行
+    """
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=settings.WORKER_THREADS, thread_name_prefix="worker"
+        )
+    )
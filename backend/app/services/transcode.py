@@ -0,0 +1,159 @@
+import logging
+import os
+import shutil
+import subprocess
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import record_items, timed_stage
+from app.core.tracing import start_span, traced
+from app.models import Article
+from app.services import audio
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_transcode_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.AUDIO_TRANSCODE_WORKERS)
+    return _pool
+
+
+def shutdown_transcode_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _ffmpeg_args(name: str) -> list[str]:
+    if name == "opus":
+        return [
+            "-c:a",
+            "libopus",
+            "-b:a",
+            settings.AUDIO_OPUS_BITRATE,
+            "-application",
+            "voip",
+            "-f",
+            "ogg",
+        ]
+    return [
+        "-c:a",
+        "aac",
+        "-b:a",
+        settings.AUDIO_AAC_BITRATE,
+        "-movflags",
+        "+faststart",
+        "-f",
+        "mp4",
+    ]
+
+
+def probe_duration(src: Path) -> float:
+    output = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            str(src),
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return float(output.strip())
+
+
+def transcode_file(src: Path) -> tuple[float, list[str]]:
+    """
+    在子进程中执行：生成各个压缩版本，返回 (时长, 已生成的版本)
+    """
+    renditions = []
+    for name in audio.RENDITIONS:
+        target = audio.rendition_path(src, name)
+        if not target.exists():
+            tmp = target.with_name(
+                f".{target.name}.{uuid.uuid4().hex[:8]}{audio.TEMP_SUFFIX}"
+            )
+            try:
+                subprocess.run(
+                    ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", str(src)]
+                    + ["-vn", "-ac", "1"]
+                    + _ffmpeg_args(name)
+                    + [str(tmp)],
+                    capture_output=True,
+                    check=True,
+                )
+                os.replace(tmp, target)
+            finally:
+                tmp.unlink(missing_ok=True)
+        renditions.append(name)
+    return probe_duration(src), renditions
+
+
+def _audio_filename(article: Article) -> str:
+    return (article.audio or "").rsplit("/", 1)[-1]
+
+
+@timed_stage("transcode_audio")
+@traced("pipeline.transcode_audio")
+def transcode_audio(limit: int = 10) -> None:
+    """
+    为已生成音频的文章转码出低码率的 opus、aac 版本，并记录音频时长
+    """
+    if not settings.AUDIO_TRANSCODE_ENABLED:
+        return
+    if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+        logger.warning("ffmpeg not found, skip audio transcoding")
+        return
+    with Session(engine) as session:
+        stmt = (
+            select(Article)
+            .where(
+                Article.audio != "",
+                col(Article.audio_duration).is_(None),
+            )
+            .order_by(col(Article.updated_at))
+            .limit(limit)
+        )
+        articles = session.exec(stmt).all()
+        if not articles:
+            return
+        record_items("transcode_audio", "picked", len(articles))
+        pool = get_transcode_pool()
+        futures: dict[str, Future[tuple[float, list[str]]]] = {}
+        for article in articles:
+            filename = _audio_filename(article)
+            if filename not in futures:
+                src = audio.AUDIO_DIR / filename
+                futures[filename] = pool.submit(transcode_file, src)
+        for article in articles:
+            filename = _audio_filename(article)
+            try:
+                with start_span("transcode_audio", article_id=article.id):
+                    duration, renditions = futures[filename].result()
+                record_items("transcode_audio", "succeeded")
+            except Exception as err:
+                record_items("transcode_audio", "failed")
+                logger.error(f"transcode {filename} error: {err!r}")
+                # 标记为已处理，避免每次调度都重试同一个坏文件
+                duration, renditions = 0.0, []
+            article.audio_duration = duration
+            article.audio_renditions = renditions
+            article.updated_at = datetime.now()
+            session.add(article)
+        session.commit()
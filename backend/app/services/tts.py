@@ -1,53 +1,49 @@
 # https://developer.aliyun.com/article/1612744
 #
-import os
-import shutil
-import uuid
+import logging
+from typing import Any
 
-# 这个要用/ 结尾
-from datetime import datetime
-from pathlib import Path
+from app.core.breaker import tts_breaker
+from app.core.config import settings
+from app.core.log import log_duration
+from app.core.tracing import set_attributes, start_span
+from app.services.audio import audio_cache_key, lookup_audio, store_audio
 
-from gradio_client import Client
+logger = logging.getLogger(__name__)
 
-from app.core.config import settings
 
+def new_client(endpoint: str) -> Any:
+    # gradio_client 导入很慢，第一次合成时才导入
+    from gradio_client import Client
 
-def generate_unique_filename(extension=".mp3"):
-    """生成带日期的唯一文件名"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]  # 使用UUID的前8位
-    return f"audio_{timestamp}_{unique_id}{extension}"
+    return Client(endpoint)
 
 
 def test_bk_tts():
     content = "这是一个测试"
     audio_url = bk_tts(content)
-    print(audio_url)
+    logger.info(f"test tts: {audio_url}")
 
 
 def bk_tts(content, sound="中文女", seed=0) -> str | None:
-    cosyvoice_endpoint = settings.TTS_ENDPOINT
-    client = Client(cosyvoice_endpoint)
-    result = client.predict(
-        _sound_radio=sound,
-        _synthetic_input_textbox=content,
-        _seed=seed,
-        api_name="/generate_audio",
-    )
-    # result 是返回的本地音频地址
-    # 把result 保存到当前的目录下
-    audio_filename = generate_unique_filename()
-    current_dir = Path(__file__).parent.parent
-    audio_file = Path.joinpath(current_dir, "static", "audio", audio_filename)
-    print(audio_file)
-    shutil.copy(result, audio_file)
-    # 删除原始的 音频
-    os.remove(result)
-    return (
-        settings.STATIC_DOMAIN
-        + "/"
-        + settings.STATIC_PREFIX
-        + "/audio/"
-        + audio_filename
-    )
+    with start_span("tts.synthesize", {"tts.model": settings.TTS_MODEL}) as span:
+        key = audio_cache_key(content, sound, seed, settings.TTS_MODEL)
+        cached_url = lookup_audio(key)
+        set_attributes(span, {"tts.cache_hit": bool(cached_url)})
+        if cached_url:
+            return cached_url
+        cosyvoice_endpoint = settings.TTS_ENDPOINT
+        # TTS 服务不可用时快速失败，不再等待超时
+        with (
+            tts_breaker().protect(),
+            log_duration(logger, "tts synthesized", logging.DEBUG, chars=len(content)),
+        ):
+            client = new_client(cosyvoice_endpoint)
+            result = client.predict(
+                _sound_radio=sound,
+                _synthetic_input_textbox=content,
+                _seed=seed,
+                api_name="/generate_audio",
+            )
+        # result 是返回的本地音频地址，按内容 hash 存入 static/audio
+        return store_audio(result, key)
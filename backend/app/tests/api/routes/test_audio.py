@@ -0,0 +1,99 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routes.audio import PREFERRED_RENDITION, choose_rendition
+from app.core.config import settings
+from app.services import audio
+
+KEY = "a" * 64
+PAYLOAD = bytes(range(256)) * 4
+
+
+@pytest.fixture()
+def audio_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(audio, "AUDIO_DIR", tmp_path)
+    filename = audio.audio_filename(KEY)
+    (tmp_path / filename).write_bytes(PAYLOAD)
+    return f"/{settings.STATIC_PREFIX}/audio/{filename}"
+
+
+def test_read_audio(client: TestClient, audio_file: str) -> None:
+    r = client.get(audio_file)
+    assert r.status_code == 200
+    assert r.content == PAYLOAD
+    assert r.headers["content-type"] == "audio/mpeg"
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"] == f'"{KEY}"'
+    assert "immutable" in r.headers["cache-control"]
+
+
+def test_read_audio_range(client: TestClient, audio_file: str) -> None:
+    r = client.get(audio_file, headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.content == PAYLOAD[10:20]
+    assert r.headers["content-range"] == f"bytes 10-19/{len(PAYLOAD)}"
+
+    r = client.get(audio_file, headers={"Range": "bytes=-16"})
+    assert r.status_code == 206
+    assert r.content == PAYLOAD[-16:]
+
+    r = client.get(audio_file, headers={"Range": f"bytes={len(PAYLOAD)}-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(PAYLOAD)}"
+
+
+def test_read_audio_not_modified(client: TestClient, audio_file: str) -> None:
+    r = client.get(audio_file, headers={"If-None-Match": f'"{KEY}"'})
+    assert r.status_code == 304
+    assert r.content == b""
+
+
+def test_read_audio_not_found(client: TestClient, audio_file: str) -> None:
+    r = client.get(audio_file.replace(KEY, "b" * 64))
+    assert r.status_code == 404
+
+
+def test_read_audio_x_accel_redirect(client: TestClient, audio_file: str) -> None:
+    with patch("app.core.config.settings.AUDIO_DELIVERY_MODE", "x-accel-redirect"):
+        r = client.get(audio_file)
+    assert r.status_code == 200
+    assert r.content == b""
+    assert r.headers["x-accel-redirect"] == (
+        settings.AUDIO_ACCEL_REDIRECT_PREFIX + audio.audio_filename(KEY)
+    )
+
+
+def test_read_audio_rendition(
+    client: TestClient, audio_file: str, tmp_path: Path
+) -> None:
+    (tmp_path / f"{KEY}.opus").write_bytes(b"opus")
+
+    r = client.get(audio_file, headers={"Accept": "audio/ogg, */*;q=0.5"})
+    assert r.status_code == 200
+    assert r.content == b"opus"
+    assert r.headers["content-type"] == "audio/ogg"
+    assert r.headers["etag"] == f'"{KEY}-opus"'
+    assert r.headers["vary"] == "Accept"
+
+    # 没有生成 m4a 版本时回退到原始 mp3
+    r = client.get(audio_file, headers={"Accept": "audio/mp4"})
+    assert r.content == PAYLOAD
+
+
+def test_choose_rendition_accept(tmp_path: Path) -> None:
+    path = tmp_path / audio.audio_filename(KEY)
+    for name in audio.RENDITIONS:
+        audio.rendition_path(path, name).write_bytes(b"")
+
+    assert choose_rendition("*/*", path) == PREFERRED_RENDITION
+    assert choose_rendition("", path) == PREFERRED_RENDITION
+    assert choose_rendition("audio/*;q=0.8", path) == PREFERRED_RENDITION
+    assert choose_rendition("audio/ogg;q=0.5, audio/mp4", path) == "m4a"
+    assert choose_rendition("audio/mp4;q=0.5, audio/ogg;q=0.9", path) == "opus"
+    # 原始 mp3 的 q 值更高
+    assert choose_rendition("audio/mpeg, audio/ogg;q=0.5", path) is None
+    assert choose_rendition("audio/ogg;q=0, */*;q=0.1", path) == PREFERRED_RENDITION
+    assert choose_rendition("audio/mpeg", path) is None
@@ -5,6 +5,7 @@ from sqlmodel import Session
 
 from app.core.config import settings
 from app.tests.utils.item import create_random_item
+from app.tests.utils.utils import assert_max_queries
 
 
 def test_create_item(
@@ -162,3 +163,28 @@ def test_delete_item_not_enough_permissions(
     assert response.status_code == 400
     content = response.json()
     assert content["detail"] == "Not enough permissions"
+
+
+def test_read_items_query_budget(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    # 当前用户、总数、当前页
+    with assert_max_queries(3):
+        response = client.get(
+            f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+        )
+    assert response.status_code == 200
+    assert "db;dur=" in response.headers["Server-Timing"]
+
+
+def test_create_item_query_budget(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    # 当前用户、插入、刷新
+    with assert_max_queries(3):
+        response = client.post(
+            f"{settings.API_V1_STR}/items/",
+            headers=superuser_token_headers,
+            json={"title": "Foo", "description": "Fighters"},
+        )
+    assert response.status_code == 200
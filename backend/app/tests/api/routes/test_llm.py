@@ -0,0 +1,57 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import LLMCall
+
+
+def test_read_llm_call_summary(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    model = f"test-{uuid.uuid4().hex[:8]}"
+    for milliseconds, status_code in [(100, 200), (200, 200), (900, 429)]:
+        db.add(
+            LLMCall(
+                model=model,
+                stage="parse_content",
+                status_code=status_code,
+                milliseconds=milliseconds,
+                prompt_tokens=10,
+                completion_tokens=5,
+                created_at=datetime.now(),
+            )
+        )
+    db.commit()
+    response = client.get(
+        f"{settings.API_V1_STR}/llm/calls/summary",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    latency = [row for row in content["latency"] if row["model"] == model]
+    assert latency == [
+        {
+            "model": model,
+            "stage": "parse_content",
+            "calls": 3,
+            "errors": 1,
+            "p50_ms": 200,
+            "p95_ms": 830,
+        }
+    ]
+    tokens = [row for row in content["tokens"] if row["model"] == model]
+    assert tokens[0]["prompt_tokens"] == 30
+    assert tokens[0]["completion_tokens"] == 5 * 3
+
+
+def test_read_llm_call_summary_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/llm/calls/summary",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 403
@@ -8,7 +8,11 @@ from app import crud
 from app.core.config import settings
 from app.core.security import verify_password
 from app.models import User, UserCreate
-from app.tests.utils.utils import random_email, random_lower_string
+from app.tests.utils.utils import (
+    assert_max_queries,
+    random_email,
+    random_lower_string,
+)
 
 
 def test_get_users_superuser_me(
@@ -33,6 +37,16 @@ def test_get_users_normal_user_me(
     assert current_user["email"] == settings.EMAIL_TEST_USER
 
 
+def test_get_users_me_query_budget(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    with assert_max_queries(1):
+        r = client.get(
+            f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+        )
+    assert r.status_code == 200
+
+
 def test_create_user_new_email(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
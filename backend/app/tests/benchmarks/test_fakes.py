@@ -0,0 +1,74 @@
+import feedparser  # type: ignore[import-untyped]
+import httpx
+from fastapi.testclient import TestClient
+
+from app.benchmarks.fakes import (
+    FEEDS_PREFIX,
+    PAGES_PREFIX,
+    TAG_PREFIX,
+    FakeBehavior,
+    fake_llm_app,
+    fake_site_app,
+    fake_tts_app,
+)
+from app.core.config import settings
+from app.services.extract import html_to_markdown, visible_text_length
+from app.services.llm import deal_content_parse_ret
+
+
+def _chat(client: TestClient, content: str) -> httpx.Response:
+    response: httpx.Response = client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": content}],
+        },
+    )
+    return response
+
+
+def test_fake_llm_answer_is_parseable() -> None:
+    client = TestClient(fake_llm_app(FakeBehavior(payload_bytes=500), tags=3))
+    response = _chat(client, "article one")
+    assert response.status_code == 200
+    data = response.json()
+    result = deal_content_parse_ret(data["choices"][0]["message"]["content"])
+    assert result["tags"][0].startswith(TAG_PREFIX)
+    assert len(result["content"]) == 500
+    assert data["usage"]["prompt_tokens"] > 0
+    # 同样的内容总是得到同样的标签
+    again = _chat(client, "article one").json()
+    assert deal_content_parse_ret(again["choices"][0]["message"]["content"]) == result
+
+
+def test_fake_error_rate_and_stats() -> None:
+    client = TestClient(fake_tts_app(FakeBehavior(error_rate=1.0)))
+    response = client.post("/generate_audio", json={"_seed": 0})
+    assert response.status_code == 500
+    assert client.get("/_stats").json() == {"requests": 1, "errors": 1}
+
+    client = TestClient(fake_tts_app(FakeBehavior(payload_bytes=1000)))
+    response = client.post("/generate_audio", json={"_seed": 0})
+    assert response.content.startswith(b"RIFF")
+    assert len(response.content) == 1000
+
+
+def test_fake_pages_are_server_rendered() -> None:
+    client = TestClient(fake_site_app(FakeBehavior(payload_bytes=2000)))
+    response = client.get(f"{PAGES_PREFIX}/7.html")
+    markdown = html_to_markdown(response.text)
+    # 不会被判断为需要浏览器渲染
+    assert visible_text_length(markdown) >= settings.CRAWLER_MIN_CONTENT_CHARS
+    assert "Benchmark article 7" in markdown
+
+
+def test_fake_feeds_link_to_pages() -> None:
+    client = TestClient(fake_site_app(FakeBehavior(), feed_entries=3))
+    feed = feedparser.parse(client.get(f"{FEEDS_PREFIX}/one.xml").text)
+    assert len(feed.entries) == 3
+    assert feed.entries[0].link.startswith(f"http://testserver{PAGES_PREFIX}/")
+    # 不同的 feed 文章不同，添加资源时不会被当作已存在的文章
+    other = feedparser.parse(client.get(f"{FEEDS_PREFIX}/two.xml").text)
+    assert {entry.link for entry in feed.entries}.isdisjoint(
+        entry.link for entry in other.entries
+    )
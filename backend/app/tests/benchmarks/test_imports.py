@@ -0,0 +1,21 @@
+from app.benchmarks.imports import by_package, measure, parse_importtime
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     sqlalchemy.util
+import time:       300 |        420 |   sqlalchemy
+import time:        50 |        470 | app.core.db
+"""
+
+
+def test_parse_importtime() -> None:
+    modules = parse_importtime(SAMPLE)
+    assert modules["app.core.db"] == (50, 470)
+    assert by_package(modules) == {"sqlalchemy": 420, "app": 50}
+
+
+def test_api_does_not_import_heavy_dependencies() -> None:
+    # 抓取、TTS、RSS 和邮件的依赖只在用到时导入
+    result = measure("app.main")
+    assert result["heavy"] == []
+    assert result["total_ms"] > 0
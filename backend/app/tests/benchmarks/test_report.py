@@ -0,0 +1,25 @@
+from app.benchmarks.api import _metrics, micro_case
+from app.benchmarks.report import compare, percentile
+
+
+def test_percentile_and_compare() -> None:
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3.0], 0.95) == 3.0
+    assert percentile([float(i) for i in range(1, 101)], 0.95) == 95.05
+    lines, regressions = compare(
+        {"a.items_per_second": 8.0, "a.p50_seconds": 1.05, "b.p95_seconds": 2.0},
+        {"a.items_per_second": 10.0, "a.p50_seconds": 1.0},
+        threshold=0.1,
+    )
+    # 吞吐量下降 20% 是退化，耗时增加 5% 不超过阈值，基线中没有的指标只打印
+    assert regressions == ["a.items_per_second"]
+    assert len(lines) == 3
+
+
+def test_micro_case_and_metrics() -> None:
+    result = micro_case(lambda: [0] * 1000, repeat=2)
+    assert result["ns_per_op"] > 0
+    assert result["peak_alloc_bytes"] >= 8000
+    assert _metrics({"login": {"requests": 10, "errors": 0, "p50_ms": 1.5}}) == {
+        "login.p50_ms": 1.5
+    }
@@ -7,7 +7,7 @@ from sqlmodel import Session, delete
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import Item, User
+from app.models import Item, LLMCall, User
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
@@ -21,6 +21,8 @@ def db() -> Generator[Session, None, None]:
         session.execute(statement)
         statement = delete(User)
         session.execute(statement)
+        statement = delete(LLMCall)
+        session.execute(statement)
         session.commit()
 
 
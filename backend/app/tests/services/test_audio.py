@@ -0,0 +1,96 @@
+import errno
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.services import audio
+
+
+@pytest.fixture()
+def audio_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(audio, "AUDIO_DIR", tmp_path)
+    monkeypatch.setattr(audio, "_index", {})
+    monkeypatch.setattr(audio, "_index_loaded", False)
+    return tmp_path
+
+
+def test_audio_cache_key_is_content_addressed() -> None:
+    key = audio.audio_cache_key("你好", "中文女", 0, "cosyvoice")
+    assert key == audio.audio_cache_key("你好", "中文女", 0, "cosyvoice")
+    assert key != audio.audio_cache_key("你好", "中文女", 1, "cosyvoice")
+    assert key != audio.audio_cache_key("你好", "中文男", 0, "cosyvoice")
+    assert key != audio.audio_cache_key("你好", "中文女", 0, "other")
+    assert len(key) == 64
+
+
+def test_store_then_lookup_audio(
+    audio_dir: Path, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    key = audio.audio_cache_key("你好", "中文女", 0, "cosyvoice")
+    assert audio.lookup_audio(key) is None
+
+    src = tmp_path_factory.mktemp("tts") / "result.mp3"
+    src.write_bytes(b"mp3")
+    url = audio.store_audio(src, key)
+
+    assert not src.exists()
+    assert (audio_dir / audio.audio_filename(key)).read_bytes() == b"mp3"
+    assert url.endswith("/audio/" + audio.audio_filename(key))
+    assert audio.lookup_audio(key) == url
+
+
+def test_ingest_audio_across_filesystems(
+    audio_dir: Path, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    src = tmp_path_factory.mktemp("tts") / "result.mp3"
+    src.write_bytes(b"x" * (audio.COPY_CHUNK_SIZE + 1))
+    target = audio_dir / "target.mp3"
+    exdev = OSError(errno.EXDEV, "Invalid cross-device link")
+
+    with patch("app.services.audio.os.replace", side_effect=[exdev, None]) as replace:
+        audio.ingest_audio(src, target)
+
+    tmp = replace.call_args_list[1].args[0]
+    assert replace.call_args_list[1].args[1] == target
+    assert tmp.parent == audio_dir
+    assert tmp.name.endswith(audio.TEMP_SUFFIX)
+    assert tmp.stat().st_size == audio.COPY_CHUNK_SIZE + 1
+    assert not src.exists()
+
+
+def test_prune_keeps_referenced_audio(
+    audio_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    referenced = audio_dir / audio.audio_filename("a" * 64)
+    recent = audio_dir / audio.audio_filename("b" * 64)
+    old = audio_dir / audio.audio_filename("c" * 64)
+    for path in (referenced, recent, old):
+        path.write_bytes(b"x" * 10)
+    os.utime(referenced, (0, 0))
+    os.utime(old, (time.time() - 60, time.time() - 60))
+    monkeypatch.setattr(settings, "AUDIO_CACHE_MAX_BYTES", 20)
+
+    with (
+        patch("app.services.audio.Session"),
+        patch("app.services.audio._referenced_audio", return_value={referenced.name}),
+    ):
+        audio.prune_audio_cache()
+
+    # 被引用的音频即使最久没有访问也不会被淘汰，先淘汰未被引用的
+    assert referenced.exists()
+    assert recent.exists()
+    assert not old.exists()
+
+
+def test_touch_audio_refreshes_stale_mtime(audio_dir: Path) -> None:
+    path = audio_dir / audio.audio_filename("a" * 64)
+    path.write_bytes(b"mp3")
+    os.utime(path, (0, 0))
+
+    audio.touch_audio(path)
+
+    assert time.time() - path.stat().st_mtime < audio.TOUCH_INTERVAL_SECONDS
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+def _breaker(**kwargs: float) -> CircuitBreaker:
+    options = {
+        "failure_rate": 0.5,
+        "min_calls": 4,
+        "window": 10,
+        "open_seconds": 60.0,
+        "slow_call_seconds": 1.0,
+    }
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)  # type: ignore[arg-type]
+
+
+def test_breaker_opens_on_failure_rate() -> None:
+    breaker = _breaker()
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected_total"] == 1
+
+
+def test_breaker_counts_slow_calls_as_failures() -> None:
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(True, seconds=2.0)
+    assert breaker.state == OPEN
+
+
+def test_breaker_half_open_probe() -> None:
+    breaker = _breaker(open_seconds=0.01)
+    for _ in range(4):
+        breaker.record(False)
+    time.sleep(0.02)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # 只放行一次试探
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["opened_total"] == 2
+
+
+def test_breaker_release_returns_probe() -> None:
+    breaker = _breaker(open_seconds=0.01)
+    for _ in range(4):
+        breaker.record(False)
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_breaker_protect() -> None:
+    breaker = _breaker()
+    for _ in range(4):
+        with pytest.raises(ValueError):
+            with breaker.protect():
+                raise ValueError("boom")
+    with pytest.raises(CircuitOpenError):
+        with breaker.protect():
+            pass
+
+
+def test_protect_releases_half_open_call_on_cancel() -> None:
+    breaker = _breaker(open_seconds=0, min_calls=1)
+    breaker.record(False)
+    assert breaker.state == HALF_OPEN
+
+    async def cancelled() -> None:
+        with breaker.protect():
+            raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled())
+
+    # 被取消的试探不计入统计，名额归还后可以再次试探
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,54 @@
+import asyncio
+import subprocess
+import sys
+from unittest.mock import patch
+
+from app.services.crawler import CrawlerPool, _subtree_memory_mb
+
+
+class FakeCrawler:
+    started = 0
+    closed = 0
+
+    async def __aenter__(self) -> "FakeCrawler":
+        FakeCrawler.started += 1
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        FakeCrawler.closed += 1
+
+
+def test_crawler_pool_reuses_and_recycles() -> None:
+    FakeCrawler.started = FakeCrawler.closed = 0
+    pool = CrawlerPool(size=1, max_pages=2, max_memory_mb=1024)
+
+    async def crawl() -> list[object]:
+        crawlers = []
+        for _ in range(3):
+            async with pool.acquire() as crawler:
+                crawlers.append(crawler)
+        await pool.close()
+        return crawlers
+
+    with (
+        patch("app.services.crawler.new_crawler", FakeCrawler),
+        patch("app.services.crawler._child_pids", return_value=set()),
+    ):
+        crawlers = asyncio.run(crawl())
+
+    # 同一个浏览器抓取两个页面后被回收重建
+    assert crawlers[0] is crawlers[1]
+    assert crawlers[2] is not crawlers[0]
+    assert FakeCrawler.started == 2
+    assert FakeCrawler.closed == 2
+
+
+def test_subtree_memory_only_counts_given_processes() -> None:
+    assert _subtree_memory_mb(set()) is None
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        memory = _subtree_memory_mb({child.pid})
+    finally:
+        child.kill()
+        child.wait()
+    assert memory is not None and 0 < memory < 1024
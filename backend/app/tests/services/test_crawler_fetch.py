@@ -0,0 +1,122 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import crawler
+from app.services.crawler import TIER_BROWSER, TIER_HTTP, FetchResult
+
+ARTICLE = (
+    "<html><body><article><p>"
+    + "Server rendered text. " * 20
+    + "</p></article></body></html>"
+)
+SPA = '<html><body><div id="root"></div><noscript>enable JavaScript</noscript></body></html>'
+
+
+def _client(html: str) -> httpx.AsyncClient:
+    def handler(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, html=html)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_fetch_markdown_uses_http_tier() -> None:
+    browser = AsyncMock()
+    with (
+        patch.object(crawler, "_http_client", _client(ARTICLE)),
+        patch.object(crawler, "_domain_tiers", {}),
+        patch.object(crawler, "_fetch_browser", browser),
+    ):
+        result = asyncio.run(crawler.fetch_markdown("https://ssr.example.com/a"))
+        assert crawler._domain_tiers["ssr.example.com"][0] == TIER_HTTP
+
+    assert result.tier == TIER_HTTP
+    assert "Server rendered text." in result.markdown
+    browser.assert_not_called()
+
+
+def test_fetch_markdown_falls_back_to_browser() -> None:
+    rendered = FetchResult(markdown="rendered", tier=TIER_BROWSER)
+    browser = AsyncMock(return_value=rendered)
+    pages = settings.CRAWLER_TIER_BROWSER_AFTER
+    with (
+        patch.object(crawler, "_http_client", _client(SPA)),
+        patch.object(crawler, "_domain_tiers", {}),
+        patch.object(crawler, "_js_gated_counts", {}),
+        patch.object(crawler, "_fetch_browser", browser),
+        patch.object(crawler, "_fetch_http", wraps=crawler._fetch_http) as http,
+    ):
+        for i in range(pages + 1):
+            result = asyncio.run(crawler.fetch_markdown(f"https://spa.example.com/{i}"))
+            assert result == rendered
+
+    # 连续多个页面需要 JavaScript 后，直接使用浏览器，不再探测
+    assert http.call_count == pages
+    assert browser.call_count == pages + 1
+
+
+def test_fetch_markdown_not_found_keeps_http_tier() -> None:
+    def handler(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    browser = AsyncMock(return_value=FetchResult(markdown="", tier=TIER_BROWSER))
+    with (
+        patch.object(crawler, "_http_client", client),
+        patch.object(crawler, "_domain_tiers", {}),
+        patch.object(crawler, "_js_gated_counts", {}),
+        patch.object(crawler, "_fetch_browser", browser),
+    ):
+        for i in range(settings.CRAWLER_TIER_BROWSER_AFTER + 1):
+            asyncio.run(crawler.fetch_markdown(f"https://ssr.example.com/{i}"))
+        assert "ssr.example.com" not in crawler._domain_tiers
+
+
+def test_fetch_markdown_sniffs_meta_charset() -> None:
+    html = (
+        '<html><head><meta charset="gbk"></head><body><article><p>'
+        + "服务端渲染的正文。" * 30
+        + "</p></article></body></html>"
+    )
+
+    def handler(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            content=html.encode("gbk"),
+            headers={"Content-Type": "text/html"},
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with (
+        patch.object(crawler, "_http_client", client),
+        patch.object(crawler, "_domain_tiers", {}),
+    ):
+        result = asyncio.run(crawler.fetch_markdown("https://gbk.example.com/a"))
+
+    assert result.tier == TIER_HTTP
+    assert "服务端渲染的正文。" in result.markdown
+
+
+def test_fetch_markdown_conditional_request() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, html=ARTICLE, headers={"ETag": '"v1"'})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with (
+        patch.object(crawler, "_http_client", client),
+        patch.object(crawler, "_domain_tiers", {}),
+    ):
+        first = asyncio.run(crawler.fetch_markdown("https://ssr.example.com/a"))
+        second = asyncio.run(
+            crawler.fetch_markdown("https://ssr.example.com/a", etag=first.etag)
+        )
+
+    assert first.etag == '"v1"'
+    assert not first.not_modified
+    assert second.not_modified
+    assert second.etag == '"v1"'
+    assert second.markdown == ""
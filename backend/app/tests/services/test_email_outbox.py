@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.services.email_outbox import EmailOutbox, OutgoingEmail, SMTPTransport
+
+
+class _Transport:
+    def __init__(self, failures: dict[str, int] | None = None) -> None:
+        # 每个收件人前几次发送失败
+        self.failures = failures or {}
+        self.batches: list[list[str]] = []
+        self.closed = 0
+        self.done = threading.Event()
+
+    def send(self, batch: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        self.batches.append([email.email_to for email in batch])
+        failed = []
+        for email in batch:
+            if self.failures.get(email.email_to, 0) > 0:
+                self.failures[email.email_to] -= 1
+                failed.append(email)
+        self.done.set()
+        return failed
+
+    def close(self) -> None:
+        self.closed += 1
+
+
+def _outbox(transport: _Transport, **kwargs: float) -> EmailOutbox:
+    options = {
+        "batch_size": 3,
+        "max_queue": 100,
+        "max_attempts": 3,
+        "retry_seconds": 0.01,
+        "idle_seconds": 60,
+        **kwargs,
+    }
+    return EmailOutbox(transport, **options)  # type: ignore[arg-type]
+
+
+def _email(to: str) -> OutgoingEmail:
+    return OutgoingEmail(email_to=to, subject="subject", html_content="<p>hi</p>")
+
+
+def test_outbox_sends_in_batches() -> None:
+    transport = _Transport()
+    outbox = _outbox(transport)
+    # 先放进队列再启动后台线程，批次的划分是确定的
+    for i in range(7):
+        outbox._queue.put_nowait(_email(f"user{i}@example.com"))
+    outbox.start()
+    outbox.stop()
+    assert [len(batch) for batch in transport.batches] == [3, 3, 1]
+    assert outbox.sent == 7
+    assert transport.closed >= 1
+
+
+def test_outbox_retries_with_backoff_then_gives_up() -> None:
+    transport = _Transport({"flaky@example.com": 2, "broken@example.com": 10})
+    outbox = _outbox(transport)
+    outbox.enqueue(_email("flaky@example.com"))
+    outbox.enqueue(_email("broken@example.com"))
+    # 第 1 次失败后等 0.01 秒，第 2 次失败后等 0.02 秒
+    deadline = time.monotonic() + 5
+    while (outbox.sent, outbox.dropped) != (1, 1) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    outbox.stop()
+    sent = [to for batch in transport.batches for to in batch]
+    assert sent.count("flaky@example.com") == 3
+    assert sent.count("broken@example.com") == 3
+    assert outbox.sent == 1
+    assert outbox.failed == 5
+    assert outbox.dropped == 1
+
+
+def test_stop_sends_pending_retries_once() -> None:
+    transport = _Transport({"slow@example.com": 1})
+    outbox = _outbox(transport, retry_seconds=60)
+    outbox.enqueue(_email("slow@example.com"))
+    transport.done.wait(5)
+    outbox.stop()
+    assert transport.batches == [["slow@example.com"], ["slow@example.com"]]
+    assert outbox.sent == 1
+
+
+class _Message:
+    sent: list[str] = []
+
+    def __init__(self, **_kwargs: Any) -> None:
+        pass
+
+    def send(self, *, to: str, smtp: Any) -> Any:
+        if to.startswith("broken"):
+            raise ConnectionError("connection reset")
+        _Message.sent.append(to)
+        return MagicMock(success=True)
+
+
+def test_smtp_transport_returns_only_failed_messages() -> None:
+    _Message.sent = []
+    transport = SMTPTransport()
+    batch = [_email(to) for to in ("a@example.com", "broken@example.com")]
+    batch.append(_email("c@example.com"))
+    with (
+        patch.object(settings, "EMAILS_FROM_EMAIL", "noreply@example.com"),
+        patch("emails.message.Message", _Message),
+        patch.object(transport, "_connect", side_effect=[MagicMock(), MagicMock()]),
+    ):
+        failed = transport.send(batch)
+    # 中途失败时，已经发出的邮件不会被重发
+    assert [email.email_to for email in failed] == ["broken@example.com"]
+    assert _Message.sent == ["a@example.com", "c@example.com"]
+
+
+def test_smtp_transport_fails_the_rest_when_reconnect_fails() -> None:
+    _Message.sent = []
+    transport = SMTPTransport()
+    batch = [_email(to) for to in ("broken@example.com", "b@example.com")]
+    with (
+        patch.object(settings, "EMAILS_FROM_EMAIL", "noreply@example.com"),
+        patch("emails.message.Message", _Message),
+        patch.object(
+            transport, "_connect", side_effect=[MagicMock(), OSError("refused")]
+        ),
+    ):
+        failed = transport.send(batch)
+    assert [email.email_to for email in failed] == [
+        "broken@example.com",
+        "b@example.com",
+    ]
+    assert _Message.sent == []
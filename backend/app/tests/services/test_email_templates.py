@@ -0,0 +1,13 @@
+from app.utils import email_templates, generate_reset_password_email
+
+
+def test_templates_are_compiled_once() -> None:
+    environment = email_templates()
+    first = environment.get_template("reset_password.html")
+    email = generate_reset_password_email(
+        email_to="user@example.com", email="user@example.com", token="token-123"
+    )
+    assert "reset-password?token=token-123" in email.html_content
+    assert "user@example.com" in email.html_content
+    # 同一个编译好的模板对象
+    assert environment.get_template("reset_password.html") is first
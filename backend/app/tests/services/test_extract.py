@@ -0,0 +1,56 @@
+from app.services.extract import decode_html, html_to_markdown, visible_text_length
+
+PARAGRAPH = "FastAPI is a modern web framework for building APIs. " * 5
+
+HTML = f"""
+<html>
+<head><title>Page title</title><style>p {{ color: red }}</style></head>
+<body>
+  <header><a href="/">Site name</a></header>
+  <nav><a href="/">Home</a></nav>
+  <article>
+    <header><h1>Hello</h1></header>
+    <p>{PARAGRAPH}</p>
+    <p>See <a href="https://example.com">the docs</a>.</p>
+    <ul><li>one</li><li>two</li></ul>
+    <script>alert(1)</script>
+  </article>
+  <footer>Copyright</footer>
+</body>
+</html>
+"""
+
+
+def test_html_to_markdown_keeps_main_content() -> None:
+    markdown = html_to_markdown(HTML)
+    assert markdown.startswith("# Hello")
+    assert PARAGRAPH.strip() in markdown
+    assert "[the docs](https://example.com)" in markdown
+    assert "- one\n- two" in markdown
+    assert "Home" not in markdown
+    assert "Site name" not in markdown
+    assert "Page title" not in markdown
+    assert "Copyright" not in markdown
+    assert "alert" not in markdown
+    assert "color" not in markdown
+
+
+def test_visible_text_length_ignores_markup() -> None:
+    assert visible_text_length("# Hi [a](https://example.com) ![x](y.png)") == 3
+
+
+def test_html_to_markdown_without_main_drops_title() -> None:
+    markdown = html_to_markdown(
+        "<html><head><title>Page title</title></head>"
+        "<body><header>Site</header><h1>Hello</h1><p>text</p></body></html>"
+    )
+    assert markdown == "# Hello\n\ntext"
+
+
+def test_decode_html_charset() -> None:
+    text = "中文正文"
+    meta = f'<meta http-equiv="Content-Type" content="text/html; charset=gb2312">{text}'
+    assert decode_html(meta.encode("gbk")).endswith(text)
+    assert decode_html(text.encode("gbk"), "text/html; charset=GBK") == text
+    assert decode_html(text.encode("utf-8"), "text/html") == text
+    assert decode_html(b'<meta charset="unknown">ok') == '<meta charset="unknown">ok'
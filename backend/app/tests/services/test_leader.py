@@ -0,0 +1,153 @@
+import asyncio
+import time
+from typing import Any, cast
+from unittest.mock import patch
+
+from sqlalchemy import Connection
+
+from app.core.leader import LeaderElector, _connect, _engine
+
+
+class FakeResult:
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def scalar(self) -> Any:
+        return self.value
+
+
+class FakeConnection:
+    def __init__(self, lock_free: bool = True) -> None:
+        self.lock_free = lock_free
+        self.broken = False
+        self.closed = False
+        self.statements: list[str] = []
+
+    def execute(self, statement: Any, params: Any = None) -> FakeResult:
+        if self.broken:
+            raise ConnectionError("server closed the connection")
+        sql = str(statement)
+        self.statements.append(sql)
+        if "pg_try_advisory_lock" in sql:
+            return FakeResult(self.lock_free)
+        return FakeResult(1)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _elector(conn: FakeConnection, lease_seconds: float = 15.0) -> LeaderElector:
+    return LeaderElector(
+        1,
+        renew_seconds=5.0,
+        lease_seconds=lease_seconds,
+        connect=lambda: cast(Connection, conn),
+    )
+
+
+def test_leader_acquires_and_renews() -> None:
+    conn = FakeConnection()
+    elector = _elector(conn)
+    elector.tick()
+    assert elector.is_leader
+    elector.tick()
+    assert elector.is_leader
+    assert conn.statements[-1] == "SELECT 1"
+
+
+def test_follower_when_lock_is_held() -> None:
+    elector = _elector(FakeConnection(lock_free=False))
+    elector.tick()
+    assert not elector.is_leader
+
+
+def test_leader_steps_down_when_connection_breaks() -> None:
+    conn = FakeConnection()
+    elector = _elector(conn)
+    elector.tick()
+    conn.broken = True
+    elector.tick()
+    assert not elector.is_leader
+    assert conn.closed
+
+
+def test_leader_lease_expires() -> None:
+    elector = _elector(FakeConnection(), lease_seconds=0.01)
+    elector.tick()
+    time.sleep(0.02)
+    assert not elector.is_leader
+
+
+def test_guard_skips_on_followers() -> None:
+    calls: list[str] = []
+    elector = _elector(FakeConnection(lock_free=False))
+
+    def job() -> str:
+        calls.append("sync")
+        return "done"
+
+    async def async_job() -> str:
+        calls.append("async")
+        return "done"
+
+    elector.tick()
+    assert elector.guard(job)() is None
+    assert asyncio.run(elector.guard(async_job)()) is None
+    assert calls == []
+
+    elector = _elector(FakeConnection())
+    elector.tick()
+    assert elector.guard(job)() == "done"
+    assert asyncio.run(elector.guard(async_job)()) == "done"
+    assert calls == ["sync", "async"]
+
+
+def test_guard_holds_job_lock_while_running() -> None:
+    leader_conn = FakeConnection()
+    job_conns = [FakeConnection(), FakeConnection(lock_free=False)]
+    conns = iter([leader_conn, *job_conns])
+    elector = LeaderElector(
+        1,
+        renew_seconds=5.0,
+        lease_seconds=15.0,
+        connect=lambda: cast(Connection, next(conns)),
+    )
+    elector.tick()
+    held: list[bool] = []
+
+    def job() -> str:
+        # 任务运行期间锁一直由自己的连接持有
+        held.append(not job_conns[0].closed)
+        return "done"
+
+    assert elector.guard(job)() == "done"
+    assert held == [True]
+    assert "pg_advisory_unlock" in job_conns[0].statements[-1]
+    assert job_conns[0].closed
+    # leader 切换后，旧节点上的任务还持有锁，新 leader 跳过这次运行
+    assert elector.guard(job)() is None
+    assert held == [True]
+    assert job_conns[1].closed
+
+
+def test_stop_releases_lock() -> None:
+    conn = FakeConnection()
+    elector = _elector(conn)
+    elector.start()
+    time.sleep(0.05)
+    elector.stop()
+    assert not elector.is_leader
+    assert "pg_advisory_unlock" in conn.statements[-1]
+    assert conn.closed
+
+
+def test_reconnect_reuses_engine() -> None:
+    _engine.cache_clear()
+    try:
+        with patch("app.core.leader.create_engine") as create_engine:
+            _connect()
+            _connect()
+        assert create_engine.call_count == 1
+        assert create_engine.return_value.connect.call_count == 2
+    finally:
+        _engine.cache_clear()
@@ -0,0 +1,136 @@
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+from app.core.config import LLMEndpoint
+from app.services import llm
+
+
+def test_split_into_chunks_respects_token_limit() -> None:
+    text = "\n\n".join(f"paragraph {i} " + "word " * 40 for i in range(20))
+    chunks = llm.split_into_chunks(text, 200)
+    assert len(chunks) > 1
+    assert all(llm.count_tokens(chunk) <= 200 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_split_into_chunks_splits_long_paragraph() -> None:
+    text = "长" * 1000
+    chunks = llm.split_into_chunks(text, 300)
+    assert all(llm.count_tokens(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_parse_long_content() -> None:
+    prompts = []
+
+    async def fake_request_ai(
+        _model: str, query: str, system_prompt: str
+    ) -> dict[str, Any]:
+        prompts.append(system_prompt)
+        if system_prompt == llm.get_chunk_merge_system_prompt():
+            return {"status_code": 200, "answer": '{"tags":["科技"],"abstract":"摘要"}'}
+        return {"status_code": 200, "answer": query.upper()}
+
+    content = "\n\n".join(("word " * 100).strip() for _ in range(6))
+    with (
+        patch.object(llm, "request_ai_with_fallback", fake_request_ai),
+        patch("app.core.config.settings.LLM_CHUNK_TOKENS", 150),
+    ):
+        result = asyncio.run(llm.parse_long_content("gpt-4o-mini", content))
+
+    assert result["tags"] == ["科技"]
+    assert result["abstract"] == "摘要"
+    assert result["content"] == content.upper()
+    assert prompts.count(llm.get_chunk_clean_system_prompt()) == 6
+    assert prompts[-1] == llm.get_chunk_merge_system_prompt()
+
+
+def _fake_arequest_ai(
+    delays: dict[str, float], statuses: dict[str, int], calls: list[str]
+) -> Any:
+    async def fake(
+        endpoint: LLMEndpoint, _query: str, _system_prompt: str = ""
+    ) -> dict[str, Any]:
+        calls.append(endpoint.model)
+        await asyncio.sleep(delays.get(endpoint.model, 0))
+        status_code = statuses.get(endpoint.model, 200)
+        ret = {"status_code": status_code, "model": endpoint.model, "milliseconds": 0}
+        if status_code == 200:
+            ret["answer"] = endpoint.model
+        return ret
+
+    return fake
+
+
+def test_request_ai_with_fallback_on_429() -> None:
+    calls: list[str] = []
+    fake = _fake_arequest_ai({}, {"primary": 429, "second": 503}, calls)
+    fallbacks = [LLMEndpoint(model="second"), LLMEndpoint(model="third")]
+    with (
+        patch.object(llm, "arequest_ai", fake),
+        patch("app.core.config.settings.LLM_FALLBACKS", fallbacks),
+    ):
+        ret = asyncio.run(llm.request_ai_with_fallback("primary", "q"))
+
+    assert ret["answer"] == "third"
+    assert calls == ["primary", "second", "third"]
+
+
+def test_request_ai_hedges_slow_primary() -> None:
+    calls: list[str] = []
+    fake = _fake_arequest_ai({"primary": 5, "second": 0}, {}, calls)
+    tracker = llm.LatencyTracker()
+    for _ in range(30):
+        tracker.record("primary", 10)
+    with (
+        patch.object(llm, "arequest_ai", fake),
+        patch.object(llm, "latency_tracker", tracker),
+        patch("app.core.config.settings.LLM_FALLBACKS", [LLMEndpoint(model="second")]),
+        patch("app.core.config.settings.LLM_HEDGE_ENABLED", True),
+    ):
+        ret = asyncio.run(
+            asyncio.wait_for(llm.request_ai_with_fallback("primary", "q"), 2)
+        )
+
+    assert ret["answer"] == "second"
+    assert calls == ["primary", "second"]
+
+
+def test_request_ai_hedge_falls_back_on_fast_failure() -> None:
+    calls: list[str] = []
+    fake = _fake_arequest_ai({}, {"primary": 503}, calls)
+    tracker = llm.LatencyTracker()
+    for _ in range(30):
+        tracker.record("primary", 1000)
+    with (
+        patch.object(llm, "arequest_ai", fake),
+        patch.object(llm, "latency_tracker", tracker),
+        patch("app.core.config.settings.LLM_FALLBACKS", [LLMEndpoint(model="second")]),
+        patch("app.core.config.settings.LLM_HEDGE_ENABLED", True),
+    ):
+        ret = asyncio.run(llm.request_ai_with_fallback("primary", "q"))
+
+    # 主请求在对冲之前就失败了，仍然换到第二个模型
+    assert ret["answer"] == "second"
+    assert calls == ["primary", "second"]
+
+
+def test_request_ai_with_fallback_sync() -> None:
+    calls: list[tuple[str, str]] = []
+
+    def fake(model: str, *_args: Any, **kwargs: Any) -> dict[str, Any]:
+        calls.append((model, kwargs["chat_url"]))
+        if model == "primary":
+            return {"status_code": 429, "milliseconds": 0}
+        return {"status_code": 200, "answer": model, "milliseconds": 0}
+
+    fallbacks = [LLMEndpoint(model="second", base_url="http://second/v1")]
+    with (
+        patch.object(llm, "request_ai", fake),
+        patch("app.core.config.settings.LLM_FALLBACKS", fallbacks),
+    ):
+        ret = llm.request_ai_with_fallback_sync("primary", "q")
+
+    assert ret["answer"] == "second"
+    assert calls[1] == ("second", "http://second/v1/chat/completions")
@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+from typing import Any
+
+from app.models import LLMCall
+from app.services.llm_usage import LLMCallRecorder, build_llm_call, llm_call_context
+
+
+def _ret(**usage: object) -> dict[str, Any]:
+    return {
+        "status_code": 200,
+        "data": {"choices": [], "usage": usage},
+        "milliseconds": 1200,
+        "answer": "ok",
+    }
+
+
+def test_build_llm_call_reads_usage_and_context() -> None:
+    article_id = uuid.uuid4()
+    ret = _ret(
+        prompt_tokens=100,
+        completion_tokens=20,
+        prompt_tokens_details={"cached_tokens": 64},
+    )
+    with llm_call_context("parse_content", article_id):
+        with llm_call_context("parse_chunk"):
+            call = build_llm_call(ret, "gpt-4o-mini")
+    assert call.stage == "parse_chunk"
+    assert call.article_id == article_id
+    assert call.prompt_tokens == 100
+    assert call.completion_tokens == 20
+    assert call.cached_tokens == 64
+    assert call.cache_hit
+    assert call.milliseconds == 1200
+
+    call = build_llm_call({"status_code": 0, "milliseconds": 5}, "gpt-4o-mini")
+    assert call.stage == ""
+    assert call.article_id is None
+    assert call.prompt_tokens is None
+    assert not call.cache_hit
+
+
+def test_llm_call_context_propagates_to_tasks() -> None:
+    async def stage_in_task() -> str:
+        async def inner() -> str:
+            return build_llm_call(_ret(), "m").stage
+
+        with llm_call_context("parse_merge"):
+            return await asyncio.create_task(inner())
+
+    assert asyncio.run(stage_in_task()) == "parse_merge"
+
+
+def test_recorder_writes_batches_and_flushes_on_stop() -> None:
+    batches: list[list[LLMCall]] = []
+    recorder = LLMCallRecorder(
+        batches.append, batch_size=2, flush_seconds=60, max_queue=10
+    )
+    recorder.start()
+    for _ in range(5):
+        recorder.record(build_llm_call(_ret(), "m"))
+    recorder.stop()
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_recorder_drops_when_queue_is_full() -> None:
+    batches: list[list[LLMCall]] = []
+    recorder = LLMCallRecorder(
+        batches.append, batch_size=10, flush_seconds=60, max_queue=2
+    )
+    for _ in range(3):
+        recorder.record(build_llm_call(_ret(), "m"))
+    assert recorder.dropped == 1
+    recorder.start()
+    recorder.stop()
+    assert sum(len(batch) for batch in batches) == 2
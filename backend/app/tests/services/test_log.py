@@ -0,0 +1,106 @@
+import io
+import json
+import logging
+import queue
+import uuid
+from logging.handlers import QueueListener
+from typing import Any
+
+from app.core.log import (
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    _QueueHandler,
+    log_context,
+    log_duration,
+)
+
+
+def _pipeline(*filters: logging.Filter) -> tuple[logging.Logger, io.StringIO]:
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    logger = logging.getLogger(f"test.{uuid.uuid4().hex}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    logger.addHandler(_Stop(listener))
+    return logger, stream
+
+
+class _Stop(logging.Handler):
+    # 测试中在读取输出前调用 logger.handlers[-1].stop() 等待队列写完
+    def __init__(self, listener: QueueListener) -> None:
+        super().__init__()
+        self.listener = listener
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
+
+    def stop(self) -> None:
+        self.listener.stop()
+
+
+def _records(logger: logging.Logger, stream: io.StringIO) -> list[dict[str, Any]]:
+    logger.handlers[-1].stop()  # type: ignore[attr-defined]
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_carry_context_and_fields() -> None:
+    logger, stream = _pipeline(ContextFilter())
+    article_id = uuid.uuid4()
+    with log_context(stage="parse_content"):
+        with log_context(article_id=article_id):
+            with log_duration(logger, "parsed", tokens=12):
+                pass
+        logger.info("done %s", "ok")
+    logger.info("outside")
+    first, second, third = _records(logger, stream)
+    assert first["message"] == "parsed"
+    assert first["stage"] == "parse_content"
+    assert first["article_id"] == str(article_id)
+    assert first["tokens"] == 12
+    assert first["duration_ms"] >= 0
+    assert second["message"] == "done ok"
+    assert second["stage"] == "parse_content"
+    assert "article_id" not in second
+    assert "stage" not in third
+
+
+def test_exception_is_kept_separately() -> None:
+    logger, stream = _pipeline()
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    (record,) = _records(logger, stream)
+    assert record["message"] == "failed"
+    assert record["level"] == "ERROR"
+    assert "ValueError: boom" in record["exc_info"]
+
+
+def test_sampling_keeps_burst_then_every_nth() -> None:
+    logger, stream = _pipeline(SamplingFilter(burst=3, window_seconds=60, rate=5))
+    for i in range(20):
+        logger.info(f"item {i}")
+    for _ in range(2):
+        logger.warning("always kept")
+    records = _records(logger, stream)
+    assert [record["message"] for record in records] == [
+        "item 0",
+        "item 1",
+        "item 2",
+        "item 7",
+        "item 12",
+        "item 17",
+        "always kept",
+        "always kept",
+    ]
+    assert records[3]["sample_rate"] == 5
+    assert "sample_rate" not in records[0]
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from app.core.blocking import run_blocking
+from app.core.loop_monitor import LoopLagMonitor
+
+
+def block_the_loop() -> None:
+    time.sleep(0.3)
+
+
+def test_loop_monitor_reports_blocking_stack() -> None:
+    monitor = LoopLagMonitor(threshold=0.1, interval=0.02)
+
+    async def run() -> None:
+        monitor.start()
+        await asyncio.sleep(0.05)
+        block_the_loop()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.stalls_total == 1
+    assert monitor.max_lag >= 0.2
+    stall = monitor.recent_stalls[0]
+    assert "block_the_loop" in stall["stack"]
+
+
+def test_run_blocking_keeps_loop_responsive() -> None:
+    monitor = LoopLagMonitor(threshold=0.1, interval=0.02)
+
+    async def run() -> None:
+        monitor.start()
+        await run_blocking(block_the_loop)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.stalls_total == 0
@@ -0,0 +1,47 @@
+from app.services.llm import count_tokens
+from app.services.markdown import clean_markdown
+
+RAW = """[Home](/) | [News](/news) | [About](/about)
+
+# Title
+
+![cover](https://example.com/cover.png)
+
+First paragraph with [a link](https://example.com/a) and https://example.com/b.
+
+```python
+print("code")
+```
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+First paragraph with [a link](https://example.com/a) and https://example.com/b.
+
+Second paragraph.
+
+Copyright © 2025 Example. All rights reserved.
+"""
+
+
+def test_clean_markdown() -> None:
+    cleaned = clean_markdown(RAW)
+    assert cleaned == (
+        "# Title\n\nFirst paragraph with a link and .\n\nSecond paragraph."
+    )
+
+
+def test_clean_markdown_reduces_tokens() -> None:
+    assert count_tokens(clean_markdown(RAW)) < count_tokens(RAW)
+
+
+def test_clean_markdown_keeps_boilerplate_words_in_content() -> None:
+    content = (
+        "# Title\n\n"
+        "Browsers send cookies with every request, so the session survives reloads."
+        "\n\nUsers log in once.\n\n"
+        "Readers who subscribe to the feed get every new post without visiting."
+    )
+    markdown = f"Sign in\n\n{content}\n\nFollow us\n\nCopyright 2025 Example\n"
+    assert clean_markdown(markdown) == content
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from collections.abc import Iterator
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricFamily, MetricsMiddleware, Registry, timed_stage
+
+
+def test_counter_sums_thread_shards() -> None:
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs.", ["stage"])
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.inc("crawl")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'jobs_total{stage="crawl"} 4000' in registry.render()
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_count 4" in text
+    assert "latency_seconds_sum 3.65" in text
+
+
+def test_collector_errors_do_not_break_render() -> None:
+    registry = Registry()
+    registry.gauge("up", "Up.").inc()
+
+    def broken() -> Iterator[MetricFamily]:
+        raise RuntimeError("db down")
+        yield
+
+    registry.register_collector(broken)
+    text = registry.render()
+    assert "up 1" in text
+    assert 'metrics_collector_errors{collector="broken"} 1' in text
+
+
+def test_timed_stage_records_async_and_sync() -> None:
+    from app.core.metrics import pipeline_stage_duration_seconds
+
+    @timed_stage("test_sync")
+    def sync_job() -> int:
+        return 1
+
+    @timed_stage("test_async")
+    async def async_job() -> int:
+        return 2
+
+    assert sync_job() == 1
+    assert asyncio.run(async_job()) == 2
+    samples = {
+        labels["stage"]: value
+        for suffix, labels, value in pipeline_stage_duration_seconds.samples()
+        if suffix == "_count"
+    }
+    assert samples["test_sync"] == 1
+    assert samples["test_async"] == 1
+
+
+def test_middleware_labels_by_operation_id() -> None:
+    from app.core.metrics import http_request_duration_seconds
+
+    app = FastAPI(generate_unique_id_function=lambda route: f"test-{route.name}")
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int) -> dict[str, int]:
+        return {"item_id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    counts = {
+        (labels["operation"], labels["status"]): value
+        for suffix, labels, value in http_request_duration_seconds.samples()
+        if suffix == "_count"
+    }
+    assert counts[("test-read_item", "200")] == 2
+    assert counts[("unmatched", "404")] == 1
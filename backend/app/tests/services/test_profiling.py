@@ -0,0 +1,102 @@
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, ProfilingRules
+
+
+@pytest.fixture
+def profiles_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _client(rules: ProfilingRules) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int) -> dict[str, int]:
+        return {"id": item_id}
+
+    @app.get("/other")
+    async def read_other() -> dict[str, str]:
+        return {"ok": "1"}
+
+    app.add_middleware(ProfilingMiddleware, rules=rules)
+    return TestClient(app)
+
+
+@pytest.mark.usefixtures("profiles_dir")
+def test_rules_are_shared_and_expire() -> None:
+    rules = ProfilingRules()
+    rules.set_rule("read_item_items__item_id__get", 50, 60)
+    rules.set_rule("read_other_other_get", 100, 60)
+    # 另一个进程从同一个文件读取
+    other = ProfilingRules()
+    assert [rule.operation for rule in other.list_rules()] == [
+        "read_item_items__item_id__get",
+        "read_other_other_get",
+    ]
+    assert other.delete_rule("read_other_other_get")
+    assert not other.delete_rule("read_other_other_get")
+
+    rules.set_rule("read_other_other_get", 100, 1)
+    assert len(rules.list_rules()) == 2
+    time.sleep(1.05)
+    assert [rule.operation for rule in rules.list_rules()] == [
+        "read_item_items__item_id__get"
+    ]
+
+
+@pytest.mark.usefixtures("profiles_dir")
+def test_sampled_route_stores_report() -> None:
+    rules = ProfilingRules()
+    rules.set_rule("read_item_items__item_id__get", 100, 60)
+    client = _client(rules)
+
+    response = client.get("/other")
+    assert "x-profile-report" not in response.headers
+
+    response = client.get("/items/1")
+    assert response.json() == {"id": 1}
+    name = response.headers["x-profile-report"]
+    assert [report.name for report in profiling.list_reports()] == [name]
+    report = profiling.read_report(name)
+    assert report is not None and report[0]
+
+
+@pytest.mark.usefixtures("profiles_dir")
+def test_superuser_flag_returns_report(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        profiling, "is_superuser_token", lambda auth: auth == "Bearer admin"
+    )
+    client = _client(ProfilingRules())
+
+    response = client.get("/other?profile=1", headers={"Authorization": "Bearer x"})
+    assert response.json() == {"ok": "1"}
+
+    response = client.get(
+        "/other", headers={"Authorization": "Bearer admin", "X-Profile": "1"}
+    )
+    assert response.headers["x-profiled-status"] == "200"
+    assert response.headers["content-type"].startswith(
+        profiling.new_profiler().media_type.split(";")[0]
+    )
+    assert profiling.list_reports() == []
+
+    response = client.get(
+        "/other?profile=store", headers={"Authorization": "Bearer admin"}
+    )
+    assert response.json() == {"ok": "1"}
+    assert profiling.read_report(response.headers["x-profile-report"]) is not None
+
+
+def test_read_report_rejects_paths(profiles_dir: Path) -> None:
+    (profiles_dir.parent / "secret.txt").write_text("secret")
+    assert profiling.read_report("../secret.txt") is None
+    assert profiling.read_report(profiling.RULES_FILE) is None
@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.metrics import REGISTRY
+from app.core.queries import QueryStatsMiddleware, instrument_engine, track_queries
+
+
+def _engine() -> Engine:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    instrument_engine(engine)
+    return engine
+
+
+def test_track_queries_counts_statements() -> None:
+    engine = _engine()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with track_queries() as stats:
+            for i in range(3):
+                conn.execute(text("SELECT :i"), {"i": i})
+            conn.execute(text("SELECT 2"))
+    assert stats.count == 4
+    assert stats.seconds > 0
+    # 参数不同的同一条语句算作重复
+    assert stats.repeated(3) == {"SELECT ?": 3}
+    assert stats.server_timing().endswith('desc="4 queries"')
+
+
+def test_middleware_reports_queries(caplog: pytest.LogCaptureFixture) -> None:
+    engine = _engine()
+    app = FastAPI()
+
+    @app.get("/rows")
+    def rows(count: int) -> int:
+        # 同步路由在线程池中运行，语句也要计入这个请求
+        with engine.connect() as conn:
+            for i in range(count):
+                conn.execute(text("SELECT :i"), {"i": i})
+        return count
+
+    app.add_middleware(QueryStatsMiddleware)
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="app.core.queries"):
+        response = client.get("/rows", params={"count": 2})
+        assert response.headers["Server-Timing"].endswith('desc="2 queries"')
+        assert not caplog.records
+        with track_queries(all_threads=True) as stats:
+            response = client.get("/rows", params={"count": 6})
+    assert response.headers["Server-Timing"].endswith('desc="6 queries"')
+    assert stats.count == 6
+    (record,) = caplog.records
+    assert record.statement == "SELECT ?"  # type: ignore[attr-defined]
+    text_metrics = REGISTRY.render()
+    assert 'http_db_repeated_queries_total{operation="rows_rows_get"} 1' in text_metrics
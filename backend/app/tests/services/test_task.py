@@ -0,0 +1,21 @@
+import asyncio
+
+from app.services import task
+
+
+def test_startup_without_scheduler() -> None:
+    async def run() -> None:
+        await task.startup(run_scheduler=False)
+        assert not task.scheduler.running
+        await task.shutdown()
+
+    asyncio.run(run())
+
+
+def test_configure_scheduler_jobs() -> None:
+    task.configure_scheduler()
+    try:
+        job_ids = {job.id for job in task.scheduler.get_jobs()}
+    finally:
+        task.scheduler.remove_all_jobs()
+    assert {"generate_audio", "transcode_audio", "prune_audio_cache"} <= job_ids
@@ -0,0 +1,145 @@
+import random
+import uuid
+from collections.abc import Callable
+
+import pytest
+
+from app.core import tracing
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import (  # noqa: E402
+    ParentBased,
+    Sampler,
+    TraceIdRatioBased,
+)
+
+
+def _tracer(
+    monkeypatch: pytest.MonkeyPatch,
+    processor_factory: Callable[[SpanProcessor], SpanProcessor] | None = None,
+    sampler: Sampler | None = None,
+) -> InMemorySpanExporter:
+    exporter = InMemorySpanExporter()
+    processor: SpanProcessor = SimpleSpanProcessor(exporter)
+    if processor_factory is not None:
+        processor = processor_factory(processor)
+    provider = TracerProvider(sampler=sampler)
+    provider.add_span_processor(processor)
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer("test"))
+    return exporter
+
+
+def test_start_span_is_noop_when_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tracing, "_tracer", None)
+    with tracing.start_span("noop", article_id=uuid.uuid4()) as span:
+        tracing.set_attributes(span, {"key": "value"})
+        tracing.set_error(span, "failed")
+    assert span is None
+
+
+def test_article_spans_share_trace(monkeypatch: pytest.MonkeyPatch) -> None:
+    exporter = _tracer(monkeypatch)
+    article_id = uuid.uuid4()
+    source_id = uuid.uuid4()
+    with tracing.start_span("pipeline.crawl_content"):
+        with tracing.start_span("crawl_content", article_id=article_id):
+            with tracing.start_span("crawler.http"):
+                pass
+    with tracing.start_span("tag_aggregate", article_id=article_id, links=[source_id]):
+        pass
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans["crawl_content"].context.trace_id == tracing.article_trace_id(
+        article_id
+    )
+    assert spans["crawler.http"].context.trace_id == tracing.article_trace_id(
+        article_id
+    )
+    assert spans["tag_aggregate"].context.trace_id == tracing.article_trace_id(
+        article_id
+    )
+    # 文章 span 链接回触发它的阶段 span
+    stage = spans["pipeline.crawl_content"].context
+    assert [link.context.span_id for link in spans["crawl_content"].links] == [
+        stage.span_id
+    ]
+    assert [link.context.trace_id for link in spans["tag_aggregate"].links] == [
+        tracing.article_trace_id(source_id)
+    ]
+
+
+def test_tail_sampling_keeps_errors_and_slow_traces(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    exporter = _tracer(
+        monkeypatch,
+        lambda delegate: tracing.TailSamplingProcessor(
+            delegate, ratio=0, slow_seconds=60
+        ),
+    )
+    with tracing.start_span("fast", article_id=uuid.uuid4()):
+        with tracing.start_span("child"):
+            pass
+    assert exporter.get_finished_spans() == ()
+
+    with tracing.start_span("failed", article_id=uuid.uuid4()):
+        with tracing.start_span("child") as child:
+            tracing.set_error(child, "boom")
+    assert [span.name for span in exporter.get_finished_spans()] == [
+        "child",
+        "failed",
+    ]
+    exporter.clear()
+
+    with pytest.raises(ValueError):
+        with tracing.start_span("raised"):
+            raise ValueError("boom")
+    assert [span.name for span in exporter.get_finished_spans()] == ["raised"]
+
+
+def test_tail_sampling_keeps_slow_traces(monkeypatch: pytest.MonkeyPatch) -> None:
+    exporter = _tracer(
+        monkeypatch,
+        lambda delegate: tracing.TailSamplingProcessor(
+            delegate, ratio=0, slow_seconds=0
+        ),
+    )
+    with tracing.start_span("slow"):
+        pass
+    assert [span.name for span in exporter.get_finished_spans()] == ["slow"]
+
+
+def test_tail_sampling_ratio(monkeypatch: pytest.MonkeyPatch) -> None:
+    exporter = _tracer(
+        monkeypatch,
+        lambda delegate: tracing.TailSamplingProcessor(
+            delegate, ratio=1, slow_seconds=60
+        ),
+    )
+    with tracing.start_span("sampled", article_id=uuid.uuid4()):
+        pass
+    assert [span.name for span in exporter.get_finished_spans()] == ["sampled"]
+
+
+def test_article_traces_follow_head_sample_ratio(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    head = TraceIdRatioBased(0.5)
+    exporter = _tracer(
+        monkeypatch,
+        sampler=ParentBased(
+            root=head, remote_parent_sampled=head, remote_parent_not_sampled=head
+        ),
+    )
+    rng = random.Random(0)
+    for _ in range(400):
+        article_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        with tracing.start_span("crawl_content", article_id=article_id):
+            pass
+    # uuid4 的变体位会让低 64 位总是大于 2**63，直接作为 trace id 时一条都不会采样
+    assert 150 < len(exporter.get_finished_spans()) < 250
@@ -0,0 +1,32 @@
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.core.metrics import pipeline_stage_duration_seconds
+from app.models import Article
+from app.services import transcode
+
+
+def _stage_count() -> float:
+    for suffix, labels, value in pipeline_stage_duration_seconds.samples():
+        if suffix == "_count" and labels["stage"] == "transcode_audio":
+            return value
+    return 0
+
+
+def test_transcode_audio_records_one_stage_run() -> None:
+    session = MagicMock()
+    session.exec.return_value.all.return_value = []
+    before = _stage_count()
+    with (
+        patch.object(transcode, "Session") as session_factory,
+        patch.object(settings, "AUDIO_TRANSCODE_ENABLED", True),
+        patch("app.services.transcode.shutil.which", return_value="/usr/bin/ffmpeg"),
+    ):
+        session_factory.return_value.__enter__.return_value = session
+        transcode.transcode_audio()
+    # 没有需要转码的文章时也记录一次运行
+    assert _stage_count() == before + 1
+    # 取文件名不是一次阶段运行
+    article = Article(title="a", url="", resoure_id="", audio="/a/x.mp3")
+    assert transcode._audio_filename(article) == "x.mp3"
+    assert _stage_count() == before + 1
@@ -1,9 +1,12 @@
 import random
 import string
+from collections.abc import Iterator
+from contextlib import contextmanager
 
 from fastapi.testclient import TestClient
 
 from app.core.config import settings
+from app.core.queries import QueryStats, track_queries
 
 
 def random_lower_string() -> str:
@@ -24,3 +27,19 @@ def get_superuser_token_headers(client: TestClient) -> dict[str, str]:
     a_token = tokens["access_token"]
     headers = {"Authorization": f"Bearer {a_token}"}
     return headers
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    代码块中执行的 SQL 语句不超过 limit 条，超过时列出执行的语句；
+    需要开启 DB_QUERY_STATS_ENABLED，否则统计不到语句
+    """
+    with track_queries(all_threads=True) as stats:
+        yield stats
+    statements = "\n".join(
+        f"{count} x {statement}" for statement, count in stats.statements.items()
+    )
+    assert stats.count <= limit, (
+        f"expected at most {limit} queries, got {stats.count}:\n{statements}"
+    )
@@ -1,16 +1,17 @@
+import functools
 import logging
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
 
-import emails  # type: ignore
 import jwt
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from jwt.exceptions import InvalidTokenError
 
 from app.core import security
 from app.core.config import settings
+from app.services.email_outbox import OutgoingEmail, email_outbox
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,11 +23,25 @@ class EmailData:
     subject: str
 
 
+@functools.cache
+def email_templates() -> Environment:
+    """
+    模板第一次使用时编译，之后从内存中渲染；编译结果同时写入字节码缓存，
+    其他进程和重启后不用重新编译。EMAIL_TEMPLATES_AUTO_RELOAD 开启时模板文件
+    修改后自动重新加载
+    """
+    cache_dir = settings.EMAIL_TEMPLATES_CACHE_DIR
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(Path(__file__).parent / "email-templates" / "build"),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir or None),
+        auto_reload=settings.EMAIL_TEMPLATES_AUTO_RELOAD,
+    )
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent / "email-templates" / "build" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
+    html_content = email_templates().get_template(template_name).render(context)
     return html_content
 
 
@@ -36,23 +51,13 @@ def send_email(
     subject: str = "",
     html_content: str = "",
 ) -> None:
+    """
+    放进发件队列后立即返回，由后台线程通过 SMTP 发送
+    """
     assert settings.emails_enabled, "no provided configuration for email variables"
-    message = emails.Message(
-        subject=subject,
-        html=html_content,
-        mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
+    email_outbox.enqueue(
+        OutgoingEmail(email_to=email_to, subject=subject, html_content=html_content)
     )
-    smtp_options = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
-    if settings.SMTP_TLS:
-        smtp_options["tls"] = True
-    elif settings.SMTP_SSL:
-        smtp_options["ssl"] = True
-    if settings.SMTP_USER:
-        smtp_options["user"] = settings.SMTP_USER
-    if settings.SMTP_PASSWORD:
-        smtp_options["password"] = settings.SMTP_PASSWORD
-    response = message.send(to=email_to, smtp=smtp_options)
-    logger.info(f"send email result: {response}")
 
 
 def generate_test_email(email_to: str) -> EmailData:
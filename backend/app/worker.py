@@ -0,0 +1,93 @@
+"""
+后台任务进程：运行定时任务和抓取、解析、生成音频等处理流程。
+
+    python -m app.worker
+
+API 进程设置 SCHEDULER_ENABLED=false 后只处理请求，两者可以分别扩容。
+"""
+
+import asyncio
+import logging
+import secrets
+import signal
+
+import sentry_sdk
+
+from app.core.blocking import run_blocking
+from app.core.config import settings
+from app.core.log import setup_logging
+from app.core.metrics import CONTENT_TYPE, REGISTRY
+from app.core.tracing import setup_tracing
+from app.services import task
+
+logger = logging.getLogger(__name__)
+
+
+async def _handle_metrics(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """
+    最小的 HTTP 服务，只提供 GET /metrics
+    """
+    try:
+        request_line = await reader.readline()
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        method, path, *_ = request_line.decode("latin-1").split() or ["", ""]
+        if method != "GET" or path.split("?")[0] != "/metrics":
+            status, body, content_type = "404 Not Found", b"", "text/plain"
+        elif settings.METRICS_TOKEN and not secrets.compare_digest(
+            headers.get("authorization", "").encode("latin-1"),
+            f"Bearer {settings.METRICS_TOKEN}".encode(),
+        ):
+            status, body, content_type = "401 Unauthorized", b"", "text/plain"
+        else:
+            # 部分指标需要查询数据库
+            text = await run_blocking(REGISTRY.render)
+            status, body, content_type = "200 OK", text.encode(), CONTENT_TYPE
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except Exception as err:
+        logger.warning(f"serve metrics error: {err!r}")
+    finally:
+        writer.close()
+
+
+async def main() -> None:
+    task.configure_worker_threads()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await task.startup(run_scheduler=True)
+    server = None
+    if settings.METRICS_ENABLED:
+        server = await asyncio.start_server(
+            _handle_metrics, port=settings.WORKER_METRICS_PORT
+        )
+    logger.info("worker started")
+    try:
+        await stop.wait()
+    finally:
+        logger.info("worker stopping")
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        await task.shutdown()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
+        sentry_sdk.init(
+            dsn=str(settings.SENTRY_DSN),
+            traces_sample_rate=settings.SENTRY_TRACES_SAMPLE_RATE,
+        )
+    setup_tracing("worker")
+    asyncio.run(main())